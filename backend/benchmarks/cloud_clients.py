@@ -0,0 +1,88 @@
+"""
+Per-task cloud client overhead: built per task vs cmp_core.lib.cloud_clients.
+
+"before" builds what a power-op task or reconcile used to build on every
+run: boto3.client("ec2") and, for Azure, a DefaultAzureCredential with a
+compute and a network client. "after" takes them from the registry. By
+default only construction is timed, so no credentials or network are needed.
+With --live each task also makes one cheap read call (EC2
+describe_availability_zones, one page of ARM VMs), which adds credential
+resolution, token requests and TLS handshakes to "before"; that needs real
+credentials. Inside a worker container:
+
+    poetry run python -m benchmarks.cloud_clients --tasks 200
+    poetry run python -m benchmarks.cloud_clients --tasks 20 --live
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import boto3
+from azure.identity import DefaultAzureCredential
+from azure.mgmt.compute import ComputeManagementClient
+from azure.mgmt.network import NetworkManagementClient
+
+from cmp_core.core.config import settings
+from cmp_core.lib import cloud_clients
+
+
+def _use(ec2, compute, live: bool) -> None:
+    if live:
+        ec2.describe_availability_zones()
+        next(iter(compute.virtual_machines.list_all().by_page()), None)
+
+
+def _before(region: str, subscription_id: str, live: bool) -> None:
+    ec2 = boto3.client("ec2", region_name=region)
+    credential = DefaultAzureCredential()
+    compute = ComputeManagementClient(credential, subscription_id)
+    NetworkManagementClient(credential, subscription_id)
+    _use(ec2, compute, live)
+
+
+def _after(region: str, subscription_id: str, live: bool) -> None:
+    ec2 = cloud_clients.ec2(region)
+    cloud_clients.azure_credential()
+    compute = cloud_clients.azure_compute(subscription_id)
+    cloud_clients.azure_network(subscription_id)
+    _use(ec2, compute, live)
+
+
+def _measure(fn, tasks: int, *args) -> list[float]:
+    fn(*args)  # imports, endpoint data and the registry outside the measurement
+    timings = []
+    for _ in range(tasks):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(label: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:6} n={len(timings):4d}  median={statistics.median(timings) * 1000:8.2f}ms"
+        f"  p95={p95 * 1000:8.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-east-1"))
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    scope = (args.region, settings.azure_subscription_id, args.live)
+    try:
+        _report("before", _measure(_before, args.tasks, *scope))
+        _report("after", _measure(_after, args.tasks, *scope))
+    finally:
+        cloud_clients.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Cold vs warm `pulumi up` latency on a no-op inline program.
+
+Cold creates a new workspace per run (what `create_or_select_stack` did on
+every reconcile); warm checks the stack out of cmp_core.lib.pulumi_workspaces.
+Runs against a throwaway file backend, so it needs the Pulumi CLI but no
+cloud credentials. Inside the worker container:
+
+    poetry run python -m benchmarks.pulumi_workspaces --runs 10
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from pulumi.automation import create_or_select_stack
+
+PROJECT = "cmp-bench"
+STACK = "bench-noop"
+
+
+def _noop() -> None:
+    pass
+
+
+def _cold_up() -> None:
+    stack = create_or_select_stack(
+        stack_name=STACK, project_name=PROJECT, program=_noop
+    )
+    stack.up()
+    shutil.rmtree(stack.workspace.work_dir, ignore_errors=True)
+
+
+def _warm_up() -> None:
+    from cmp_core.lib.pulumi_workspaces import checkout
+
+    with checkout(STACK, PROJECT, _noop) as stack:
+        stack.up()
+
+
+def _measure(fn, runs: int) -> list[float]:
+    fn()  # create the stack / fill the pool outside the measurement
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(label: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:5} n={len(timings):3d}  median={statistics.median(timings):6.2f}s"
+        f"  p95={p95:6.2f}s  min={ordered[0]:6.2f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    state_dir = tempfile.mkdtemp(prefix="cmp-bench-state-")
+    os.environ["PULUMI_BACKEND_URL"] = f"file://{state_dir}"
+    os.environ.setdefault("PULUMI_CONFIG_PASSPHRASE", "bench")
+    try:
+        cold = _measure(_cold_up, args.runs)
+        warm = _measure(_warm_up, args.runs)
+    finally:
+        from cmp_core.lib.pulumi_workspaces import clear
+
+        clear()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    _report("cold", cold)
+    _report("warm", warm)
+    saved = statistics.median(cold) - statistics.median(warm)
+    print(f"warm saves {saved:.2f}s per up (median)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Power-operation latency while reconciles saturate the workers.
+
+Starts throwaway Celery workers against the configured broker, floods them
+with simulated reconciles (tasks sleeping --reconcile-seconds) and measures
+the round trip of simulated power operations (tasks sleeping
+--power-seconds) before and during the flood. With --layout split the two
+kinds go to their own queues and workers, sized like cmp_core.celery_app's
+iac and power queues; with --layout shared they share one queue and the same
+number of processes, which is how everything ran before the queues were
+split. The queues are prefixed with "bench." so real tasks are never
+consumed. Inside a worker container:
+
+    poetry run python -m benchmarks.queue_isolation --layout split
+    poetry run python -m benchmarks.queue_isolation --layout shared
+"""
+
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from celery import Celery
+from kombu import Queue
+
+from cmp_core.celery_app import WORKLOADS
+from cmp_core.core.config import settings
+
+bench = Celery("cmp_bench", broker=settings.celery_broker_url, backend="rpc://")
+bench.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    task_queues=[Queue("bench.iac"), Queue("bench.power"), Queue("bench.shared")],
+    task_default_queue="bench.shared",
+    worker_prefetch_multiplier=1,
+)
+
+
+@bench.task(name="bench.reconcile", acks_late=WORKLOADS["iac"].acks_late)
+def simulated_reconcile(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@bench.task(name="bench.power", acks_late=WORKLOADS["power"].acks_late)
+def simulated_power_op(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+def _node_name(queue: str) -> str:
+    return f"{queue}-{os.getpid()}@{socket.gethostname()}"
+
+
+def _start_worker(queue: str, concurrency: int, prefetch: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "celery",
+            "-A",
+            "benchmarks.queue_isolation:bench",
+            "worker",
+            "--loglevel=warning",
+            "-Q",
+            queue,
+            "-n",
+            _node_name(queue),
+            "-c",
+            str(concurrency),
+            "--prefetch-multiplier",
+            str(prefetch),
+        ]
+    )
+
+
+def _wait_for_workers(queues: list[str], timeout: float = 60.0) -> None:
+    # ping only our own workers; real ones listen on the same broker
+    names = [_node_name(queue) for queue in queues]
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if len(bench.control.ping(destination=names, timeout=1.0)) == len(names):
+            return
+    raise SystemExit("workers did not come up")
+
+
+def _sample(queue: str, args, samples: int, interval: float) -> list[float]:
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        simulated_power_op.apply_async((args.power_seconds,), queue=queue).get(
+            timeout=args.reconcile_seconds * (args.reconciles + 1)
+        )
+        timings.append(time.perf_counter() - start)
+        time.sleep(interval)
+    return timings
+
+
+def _report(label: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:9} n={len(timings):3d}  median={statistics.median(timings):6.2f}s"
+        f"  p95={p95:6.2f}s  max={ordered[-1]:6.2f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--layout", choices=("split", "shared"), default="split")
+    parser.add_argument("--iac-concurrency", type=int, default=2)
+    parser.add_argument("--power-concurrency", type=int, default=8)
+    parser.add_argument("--reconciles", type=int, default=20)
+    parser.add_argument("--reconcile-seconds", type=float, default=30.0)
+    parser.add_argument("--power-seconds", type=float, default=0.5)
+    parser.add_argument("--samples", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.layout == "split":
+        iac_queue, power_queue = "bench.iac", "bench.power"
+        workers = {
+            iac_queue: _start_worker(iac_queue, args.iac_concurrency, 1),
+            power_queue: _start_worker(power_queue, args.power_concurrency, 4),
+        }
+    else:
+        iac_queue = power_queue = "bench.shared"
+        concurrency = args.iac_concurrency + args.power_concurrency
+        workers = {iac_queue: _start_worker(iac_queue, concurrency, 1)}
+    try:
+        _wait_for_workers(list(workers))
+        bench.control.purge()  # leftovers of an interrupted run
+        _report("idle", _sample(power_queue, args, args.samples, 0.2))
+
+        for _ in range(args.reconciles):
+            simulated_reconcile.apply_async((args.reconcile_seconds,), queue=iac_queue)
+        time.sleep(1.0)  # let the reconciles take every slot they can
+        _report("saturated", _sample(power_queue, args, args.samples, 0.2))
+    finally:
+        bench.control.purge()
+        # cold shutdown: do not wait for the simulated reconciles to finish
+        for worker in workers.values():
+            worker.send_signal(signal.SIGQUIT)
+        for worker in workers.values():
+            worker.wait()
+
+
+if __name__ == "__main__":
+    main()
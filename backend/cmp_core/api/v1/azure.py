@@ -4,9 +4,12 @@ from typing import List
 
 from cmp_core.core.db import get_db
 from cmp_core.core.deps import require_project_member
+from cmp_core.models.resource import ResourceState
 from cmp_core.models.role import RoleName
-from cmp_core.schemas.azure import AzureCreate, AzureOut, AzureUpdate
+from cmp_core.schemas.azure import AzureBulkCreate, AzureCreate, AzureOut, AzureUpdate
+from cmp_core.schemas.resource import BulkActionOut
 from cmp_core.services.azure_vm import (
+    create_azure_bulk,
     create_azure_nonblocking,
     delete_azure_nonblocking,
     get_azure,
@@ -15,7 +18,8 @@ from cmp_core.services.azure_vm import (
     stop_azure_nonblocking,
     update_azure_nonblocking,
 )
-from fastapi import APIRouter, Body, Depends, Path, status
+from cmp_core.services.resource_wait import wait_for_resource
+from fastapi import APIRouter, Body, Depends, Path, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(
@@ -38,6 +42,25 @@ async def api_create_azure(
     return await create_azure_nonblocking(db, project_id, dto, str(user.id))
 
 
+@router.post(
+    "/{project_id}/bulk",
+    response_model=BulkActionOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def api_create_azure_bulk(
+    project_id: str = Path(..., description="ID of the project"),
+    dto: AzureBulkCreate = Body(..., description="Azure VM parameters, name templated"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_project_member(RoleName.devops)),
+):
+    """
+    Creates one VM per name of `name`, e.g. `worker-{0..39}`, with a single
+    reconcile. Names already taken in the project come back as conflicts;
+    the others are created.
+    """
+    return await create_azure_bulk(db, project_id, dto, str(user.id))
+
+
 @router.get(
     "/{project_id}",
     response_model=List[AzureOut],
@@ -57,10 +80,32 @@ async def api_list_azure(
 async def api_get_azure(
     project_id: str = Path(..., description="ID of the project"),
     name: str = Path(..., description="Name of the VM"),
+    wait_for: ResourceState | None = Query(
+        None, description="Hold the request until the VM reaches this state"
+    ),
+    since_version: int | None = Query(
+        None, ge=0, description="Hold the request until state_version exceeds this"
+    ),
+    timeout: float = Query(
+        30, ge=0, description="Longest wait in seconds (capped server-side)"
+    ),
     db: AsyncSession = Depends(get_db),
     user=Depends(require_project_member()),
 ):
-    return await get_azure(db, project_id, name)
+    """
+    Long poll with `wait_for` or `since_version`: the response is held until
+    the VM reaches the state (or fails) or its state_version moves past
+    `since_version`, at most `timeout` seconds.
+    """
+    return await wait_for_resource(
+        db,
+        project_id,
+        name,
+        lambda: get_azure(db, project_id, name),
+        wait_for=wait_for,
+        since_version=since_version,
+        timeout=timeout,
+    )
 
 
 @router.patch(
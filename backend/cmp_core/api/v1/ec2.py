@@ -4,9 +4,12 @@ from typing import List
 
 from cmp_core.core.db import get_db
 from cmp_core.core.deps import require_project_member
+from cmp_core.models.resource import ResourceState
 from cmp_core.models.role import RoleName
-from cmp_core.schemas.ec2 import Ec2Create, Ec2Out, Ec2Update
+from cmp_core.schemas.ec2 import Ec2BulkCreate, Ec2Create, Ec2Out, Ec2Update
+from cmp_core.schemas.resource import BulkActionOut
 from cmp_core.services.ec2 import (
+    create_ec2_bulk,
     create_ec2_nonblocking,
     delete_ec2_nonblocking,
     get_ec2,
@@ -15,7 +18,8 @@ from cmp_core.services.ec2 import (
     stop_ec2_nonblocking,
     update_ec2_nonblocking,
 )
-from fastapi import APIRouter, Body, Depends, Path, status
+from cmp_core.services.resource_wait import wait_for_resource
+from fastapi import APIRouter, Body, Depends, Path, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(
@@ -38,6 +42,25 @@ async def api_create_ec2(
     return await create_ec2_nonblocking(db, project_id, dto, str(user.id))
 
 
+@router.post(
+    "/{project_id}/bulk",
+    response_model=BulkActionOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def api_create_ec2_bulk(
+    project_id: str = Path(..., description="ID of the project"),
+    dto: Ec2BulkCreate = Body(..., description="EC2 parameters, name templated"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_project_member(RoleName.devops)),
+):
+    """
+    Creates one instance per name of `name`, e.g. `worker-{0..39}`, with a
+    single reconcile. Names already taken in the project come back as
+    conflicts; the others are created.
+    """
+    return await create_ec2_bulk(db, project_id, dto, str(user.id))
+
+
 @router.get(
     "/{project_id}",
     response_model=List[Ec2Out],
@@ -60,13 +83,34 @@ async def api_list_ec2(
 async def api_get_ec2(
     project_id: str = Path(..., description="ID проєкту"),
     name: str = Path(..., description="Name EC2 інстансу"),
+    wait_for: ResourceState | None = Query(
+        None, description="Hold the request until the VM reaches this state"
+    ),
+    since_version: int | None = Query(
+        None, ge=0, description="Hold the request until state_version exceeds this"
+    ),
+    timeout: float = Query(
+        30, ge=0, description="Longest wait in seconds (capped server-side)"
+    ),
     db: AsyncSession = Depends(get_db),
     user=Depends(require_project_member()),
 ):
     """
     Детальна інформація по EC2 інстансу. Достатньо бути членом проєкту.
+
+    With `wait_for` or `since_version` this is a long poll: the response is
+    held until the instance reaches the state (or fails) or its state_version
+    moves past `since_version`, at most `timeout` seconds.
     """
-    return await get_ec2(db, project_id, name)
+    return await wait_for_resource(
+        db,
+        project_id,
+        name,
+        lambda: get_ec2(db, project_id, name),
+        wait_for=wait_for,
+        since_version=since_version,
+        timeout=timeout,
+    )
 
 
 @router.patch(
@@ -0,0 +1,17 @@
+# cmp_core/api/v1/metrics.py
+
+from cmp_core.core.deps import require_role
+from cmp_core.lib.metrics import snapshot
+from cmp_core.models.role import RoleName
+from fastapi import APIRouter
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", summary="Worker and reconcile metrics")
+def api_metrics(_=require_role(RoleName.admin)):
+    """
+    Counters, gauges and observations recorded by the API and Celery workers
+    (lock contention, wait times, ...). Only for admins.
+    """
+    return snapshot()
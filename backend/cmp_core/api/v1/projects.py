@@ -2,16 +2,35 @@ from typing import List
 from uuid import UUID
 
 from cmp_core.core.db import get_db
-from cmp_core.core.deps import get_current_user, require_role
+from cmp_core.core.deps import (
+    get_current_user,
+    get_stream_user,
+    require_project_member,
+    require_role,
+)
+from cmp_core.lib.reconcile_events import hub
+from cmp_core.models.role import RoleName
 from cmp_core.schemas.project import ProjectCreate, ProjectOut, ProjectUpdate
+from cmp_core.schemas.pulumi_run import (
+    PulumiRunOut,
+    PulumiRunStepOut,
+    ResourceTypeDurationOut,
+)
+from cmp_core.schemas.resource import BulkActionOut, BulkActionRequest
 from cmp_core.services.project import (
     create_project,
     delete_project,
     get_project_by_id,
+    get_pulumi_run_steps,
     list_projects_with_count,
+    list_pulumi_runs,
+    reconcile_event_stream,
+    resource_type_durations,
     update_project,
 )
-from fastapi import APIRouter, Depends, status
+from cmp_core.services.resource_bulk import bulk_resource_action
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/projects", tags=["projects"])
@@ -74,3 +93,93 @@ async def remove_project(
     db: AsyncSession = Depends(get_db),
 ):
     await delete_project(db, project_id, user.id)
+
+
+@router.get(
+    "/{project_id}/pulumi-runs",
+    response_model=List[PulumiRunOut],
+    dependencies=[Depends(require_project_member())],
+)
+async def read_pulumi_runs(
+    project_id: UUID,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    """Recent Pulumi runs with refresh/up timings, to see what each phase costs."""
+    return await list_pulumi_runs(db, project_id, limit)
+
+
+@router.get(
+    "/{project_id}/pulumi-runs/resource-types",
+    response_model=List[ResourceTypeDurationOut],
+    dependencies=[Depends(require_project_member())],
+)
+async def read_resource_type_durations(
+    project_id: UUID,
+    runs: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+):
+    """Which Pulumi resource types dominate deploy time over the last `runs` runs."""
+    return await resource_type_durations(db, project_id, runs)
+
+
+@router.get(
+    "/{project_id}/pulumi-runs/{run_id}/steps",
+    response_model=List[PulumiRunStepOut],
+    dependencies=[Depends(require_project_member())],
+)
+async def read_pulumi_run_steps(
+    project_id: UUID,
+    run_id: UUID,
+    db: AsyncSession = Depends(get_db),
+):
+    """Per-resource steps of one run, slowest first."""
+    return await get_pulumi_run_steps(db, project_id, run_id)
+
+
+@router.get(
+    "/{project_id}/reconcile/stream",
+    dependencies=[Depends(require_project_member(current_user=get_stream_user))],
+)
+async def stream_reconcile_events(
+    project_id: UUID,
+    last_event_id: int | None = Query(None, ge=0),
+    last_event_id_header: int | None = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Live reconcile progress as server-sent events: `reconcile` (run started /
+    finished), `stack`, `step` (per-resource Pulumi engine steps) and `state`
+    (resource state transitions). Reconnecting clients resume after
+    Last-Event-ID (header or query) from a bounded replay buffer. The access
+    token goes in the Authorization header or, for EventSource, in `token`.
+    """
+    if not hub.available:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Reconcile streaming needs REDIS_CACHE_URL",
+        )
+    resume_from = last_event_id_header if last_event_id is None else last_event_id
+    return StreamingResponse(
+        reconcile_event_stream(project_id, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/{project_id}/resources:bulk-action",
+    response_model=BulkActionOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def bulk_action(
+    project_id: UUID,
+    dto: BulkActionRequest,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_project_member(RoleName.devops)),
+):
+    """
+    Start, stop, delete or resize many VMs, picked by `names` or by a
+    `selector` (labels, provider, region), at most 500 either way. Every item
+    gets its own result; items that are not accepted are left as they were.
+    """
+    return await bulk_resource_action(db, project_id, dto, str(user.id))
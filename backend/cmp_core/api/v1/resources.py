@@ -0,0 +1,92 @@
+# cmp_core/api/v1/resources.py
+
+import asyncio
+from typing import List
+from uuid import UUID
+
+from cmp_core.core.config import settings
+from cmp_core.core.db import AsyncSession
+from cmp_core.core.deps import user_from_token
+from cmp_core.lib.resource_feed import feed
+from cmp_core.services.project import member_project_ids
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+
+router = APIRouter(prefix="/resources", tags=["resources"])
+
+
+@router.websocket("/feed")
+async def resource_state_feed(
+    websocket: WebSocket,
+    token: str = Query(..., description="Access token"),
+    project_id: List[UUID] | None = Query(None),
+):
+    """
+    Committed resource state changes, pushed as JSON messages:
+    `{"type": "state", "id", "project_id", "name", "provider", "state", "version"}`,
+    or `{"type": "resync"}` when changes were dropped and the client should
+    re-list. Without `project_id` every project of the user is watched.
+    Memberships are re-checked periodically; projects the user has left stop
+    being delivered, and the socket is closed when none are left.
+    """
+    requested = {str(pid) for pid in project_id or []}
+    try:
+        async with AsyncSession() as db:
+            user = await user_from_token(db, token)
+            allowed = await member_project_ids(db, user.id)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if requested - allowed:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    sub = feed.subscribe(requested or allowed)
+    receiver = asyncio.create_task(_drain(websocket))
+    loop = asyncio.get_running_loop()
+    next_check = loop.time() + settings.resource_feed_membership_check_seconds
+    try:
+        while True:
+            if loop.time() >= next_check:
+                async with AsyncSession() as db:
+                    allowed = await member_project_ids(db, user.id)
+                sub.project_ids = (requested & allowed) if requested else allowed
+                if not sub.project_ids:
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                    break
+                next_check = (
+                    loop.time() + settings.resource_feed_membership_check_seconds
+                )
+            getter = asyncio.ensure_future(sub.queue.get())
+            await asyncio.wait(
+                {getter, receiver},
+                timeout=next_check - loop.time(),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not getter.done():
+                getter.cancel()
+                if receiver.done():
+                    break  # client went away
+                continue
+            await websocket.send_json(getter.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        feed.unsubscribe(sub)
+        receiver.cancel()
+
+
+async def _drain(websocket: WebSocket) -> None:
+    """Reads (and ignores) client messages, so a disconnect is noticed."""
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
@@ -1,8 +1,12 @@
 import logging
+from typing import NamedTuple
 
 from celery import Celery
-from celery.schedules import crontab
+from celery.signals import worker_init, worker_process_shutdown
 from cmp_core.core.config import settings
+from kombu import Queue
+
+logger = logging.getLogger(__name__)
 
 logging.getLogger("azure.identity").setLevel(logging.WARNING)
 logging.getLogger("azure.core.pipeline.policies.http_logging_policy").setLevel(
@@ -17,6 +21,7 @@ celery_app = Celery(
         "cmp_core.tasks.pulumi",
         "cmp_core.tasks.azure",
         "cmp_core.tasks.ec2",
+        "cmp_core.tasks.power",
     ],
 )
 
@@ -28,10 +33,133 @@ celery_app.conf.update(
     timezone="UTC",
 )
 
+
+class Workload(NamedTuple):
+    """Task settings of one queue; concurrency and prefetch belong to its workers."""
+
+    tasks: tuple[str, ...]
+    soft_time_limit: int
+    time_limit: int
+    # ack after the run, so a task lost with its worker is delivered again
+    acks_late: bool
+
+
+# queue -> workload; see "Worker queues" in the README for how each is sized
+WORKLOADS = {
+    # Pulumi runs: minutes long, memory heavy. Not acked late: a run cut off
+    # mid-way is retried by the next scheduled reconcile, and RabbitMQ drops
+    # consumers holding an unacked message past its consumer_timeout.
+    "iac": Workload(
+        (
+            "cmp_core.tasks.reconcile_project",
+            "cmp_core.tasks.destroy_project",
+        ),
+        # up to 5 minutes before the hard limit to clean up, less for short TTLs
+        soft_time_limit=max(
+            settings.reconcile_running_ttl_seconds - 300,
+            settings.reconcile_running_ttl_seconds * 3 // 4,
+        ),
+        time_limit=settings.reconcile_running_ttl_seconds,
+        acks_late=False,
+    ),
+    # one start/stop request per VM or batch; the cloud call returns at once
+    "power": Workload(
+        (
+            "cmp_core.tasks.start_ec2_task",
+            "cmp_core.tasks.stop_ec2_task",
+            "cmp_core.tasks.start_azure_vm",
+            "cmp_core.tasks.stop_azure_vm",
+            "cmp_core.tasks.bulk_power_op",
+        ),
+        soft_time_limit=90,
+        time_limit=120,
+        acks_late=True,
+    ),
+    # polls live VM state for in-flight power operations
+    "sync": Workload(
+        ("cmp_core.tasks.confirm_power_ops",),
+        soft_time_limit=45,
+        time_limit=60,
+        acks_late=True,
+    ),
+    # periodic fan-out; only enqueues
+    "scheduler": Workload(
+        ("cmp_core.tasks.reconcile_all_projects",),
+        soft_time_limit=90,
+        time_limit=110,
+        acks_late=False,
+    ),
+}
+
+celery_app.conf.update(
+    task_queues=[Queue(name) for name in WORKLOADS],
+    # a task missing from WORKLOADS is treated as the heaviest kind
+    task_default_queue="iac",
+    task_routes={
+        task: {"queue": queue}
+        for queue, workload in WORKLOADS.items()
+        for task in workload.tasks
+    },
+    task_annotations={
+        task: {
+            "soft_time_limit": workload.soft_time_limit,
+            "time_limit": workload.time_limit,
+            "acks_late": workload.acks_late,
+            "reject_on_worker_lost": workload.acks_late,
+        }
+        for workload in WORKLOADS.values()
+        for task in workload.tasks
+    },
+    # reserve one message per process unless a worker asks for more
+    # (--prefetch-multiplier), so long runs never sit behind a busy process
+    worker_prefetch_multiplier=1,
+)
+
 celery_app.conf.beat_schedule = {
-    # run reconciliation for all projects every 5 minutes
-    "reconcile-all-projects-every-2min": {
+    # periodic reconcile cycle (see cmp_core.lib.reconcile_schedule)
+    "reconcile-all-projects": {
         "task": "cmp_core.tasks.reconcile_all_projects",
-        "schedule": crontab(minute="*/2"),
+        "schedule": float(settings.reconcile_schedule_interval_seconds),
+        # a fan-out nobody picked up before the next one is redundant
+        "options": {
+            "expires": max(
+                settings.reconcile_schedule_interval_seconds - 10,
+                settings.reconcile_schedule_interval_seconds / 2,
+            )
+        },
+    },
+    # confirm in-flight VM start/stop operations (see cmp_core.tasks.power)
+    "confirm-power-ops-every-15s": {
+        "task": "cmp_core.tasks.confirm_power_ops",
+        "schedule": 15.0,
+        "options": {"expires": 15},
     },
 }
+
+
+@worker_init.connect
+def preload_pulumi_plugins(sender=None, **kwargs):
+    # plugins live on disk, so installing once before the pool forks is enough;
+    # only workers consuming the iac queue run Pulumi
+    if sender is not None and "iac" not in sender.app.amqp.queues.consume_from:
+        return
+    from cmp_core.lib.pulumi_workspaces import preload_plugins
+
+    try:
+        preload_plugins()
+    except Exception as e:
+        logger.warning(f"Could not preload Pulumi plugins: {e}")
+
+
+@worker_process_shutdown.connect
+def drop_pulumi_workspaces(**kwargs):
+    from cmp_core.lib.pulumi_workspaces import clear
+
+    clear()
+
+
+@worker_process_shutdown.connect
+def drop_cloud_clients(**kwargs):
+    from cmp_core.lib import cloud_clients
+
+    cloud_clients.clear()
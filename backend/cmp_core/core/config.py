@@ -23,11 +23,133 @@ class Settings(BaseSettings):
 
     # redis cache
     redis_cache_url: str | None = Field(None, validation_alias="REDIS_CACHE_URL")
+    # reconcile coalescing: how long a queued / running marker may live before
+    # it is considered lost (crashed worker, dropped message)
+    reconcile_pending_ttl_seconds: int = Field(
+        900, validation_alias="RECONCILE_PENDING_TTL_SECONDS"
+    )
+    reconcile_running_ttl_seconds: int = Field(
+        3600, gt=0, validation_alias="RECONCILE_RUNNING_TTL_SECONDS"
+    )
+    # per-project reconcile lease: renewed every ttl/3 while a run is alive;
+    # a run that finds it held is retried after the wait
+    reconcile_lock_ttl_seconds: int = Field(
+        60, validation_alias="RECONCILE_LOCK_TTL_SECONDS"
+    )
+    reconcile_lock_wait_seconds: int = Field(
+        30, validation_alias="RECONCILE_LOCK_WAIT_SECONDS"
+    )
+
+    # live reconcile progress (SSE): events kept per project for reconnecting
+    # clients, how long they are kept, and events buffered per slow client
+    reconcile_stream_history_size: int = Field(
+        500, validation_alias="RECONCILE_STREAM_HISTORY_SIZE"
+    )
+    reconcile_stream_history_ttl_seconds: int = Field(
+        3600, validation_alias="RECONCILE_STREAM_HISTORY_TTL_SECONDS"
+    )
+    reconcile_stream_queue_size: int = Field(
+        256, validation_alias="RECONCILE_STREAM_QUEUE_SIZE"
+    )
+
+    # resource state feed (WebSocket): changes buffered per slow subscriber
+    # before it is told to resync, and how often its memberships are re-checked
+    resource_feed_queue_size: int = Field(
+        256, validation_alias="RESOURCE_FEED_QUEUE_SIZE"
+    )
+    resource_feed_membership_check_seconds: int = Field(
+        60, validation_alias="RESOURCE_FEED_MEMBERSHIP_CHECK_SECONDS"
+    )
+    # longest a GET with wait_for / since_version may be parked
+    resource_wait_max_seconds: int = Field(
+        120, validation_alias="RESOURCE_WAIT_MAX_SECONDS"
+    )
+
+    # periodic reconcile cycle (reconcile_all_projects): beat interval, and how
+    # far a queue lag may stretch it (a multiple of the interval)
+    reconcile_schedule_interval_seconds: int = Field(
+        120, gt=0, validation_alias="RECONCILE_SCHEDULE_INTERVAL_SECONDS"
+    )
+    reconcile_schedule_max_stretch: float = Field(
+        5.0, validation_alias="RECONCILE_SCHEDULE_MAX_STRETCH"
+    )
+
+    # reconcile: live-state fetch pool and per-provider concurrency caps
+    reconcile_max_threads: int = Field(10, validation_alias="RECONCILE_MAX_THREADS")
+    reconcile_aws_concurrency: int = Field(
+        4, validation_alias="RECONCILE_AWS_CONCURRENCY"
+    )
+    reconcile_azure_concurrency: int = Field(
+        4, validation_alias="RECONCILE_AZURE_CONCURRENCY"
+    )
+    # run Pulumi at least this often even without pending changes, to catch drift
+    reconcile_drift_check_interval_minutes: int = Field(
+        30, validation_alias="RECONCILE_DRIFT_CHECK_INTERVAL_MINUTES"
+    )
+
+    # VM start/stop confirmation: first check after the request, backoff cap,
+    # and how long the VM may take to reach the target state
+    power_op_initial_delay_seconds: int = Field(
+        5, validation_alias="POWER_OP_INITIAL_DELAY_SECONDS"
+    )
+    power_op_max_delay_seconds: int = Field(
+        30, validation_alias="POWER_OP_MAX_DELAY_SECONDS"
+    )
+    power_op_timeout_seconds: int = Field(
+        600, validation_alias="POWER_OP_TIMEOUT_SECONDS"
+    )
+    # parallel Azure calls (power requests, operation-status GETs) per run
+    power_op_azure_concurrency: int = Field(
+        8, validation_alias="POWER_OP_AZURE_CONCURRENCY"
+    )
+
+    # cloud API token buckets shared by all workers (see lib/rate_limit.py):
+    # "<provider>.<read|write>" -> [requests per second, burst] per account /
+    # subscription and region. About half of what EC2 and ARM allow, leaving
+    # room for Pulumi, consoles and other tools on the same account.
+    cloud_rate_limits: Mapping[str, tuple[float, float]] = Field(
+        default_factory=lambda: {
+            "aws.read": (10.0, 50.0),
+            "aws.write": (2.5, 100.0),
+            "azure.read": (12.0, 125.0),
+            "azure.write": (5.0, 100.0),
+        },
+        validation_alias="CLOUD_RATE_LIMITS",
+    )
+    cloud_rate_limit_max_wait_seconds: float = Field(
+        30.0, validation_alias="CLOUD_RATE_LIMIT_MAX_WAIT_SECONDS"
+    )
+    # retries of a throttled cloud call, with exponential backoff
+    cloud_throttle_retries: int = Field(4, validation_alias="CLOUD_THROTTLE_RETRIES")
+
+    # task outbox relay: rows published per pass, and the longest sleep when
+    # no NOTIFY arrives
+    outbox_batch_size: int = Field(200, validation_alias="OUTBOX_BATCH_SIZE")
+    outbox_poll_seconds: float = Field(5.0, validation_alias="OUTBOX_POLL_SECONDS")
 
     # pulumi (optional)
     pulumi_config_passphrase: str | None = Field(
         None, validation_alias="PULUMI_CONFIG_PASSPHRASE"
     )
+    # one stack per (project, provider, region) instead of one per project;
+    # dirty partitions are updated concurrently, at most this many at a time
+    pulumi_stack_partitioning: bool = Field(
+        False, validation_alias="PULUMI_STACK_PARTITIONING"
+    )
+    pulumi_max_parallel_stacks: int = Field(
+        4, validation_alias="PULUMI_MAX_PARALLEL_STACKS"
+    )
+    # between drift checks, refresh/up only the URNs of resources with pending changes
+    pulumi_targeted_updates: bool = Field(
+        True, validation_alias="PULUMI_TARGETED_UPDATES"
+    )
+    # warm workspaces kept per worker process, and how long one may sit idle
+    pulumi_workspace_pool_size: int = Field(
+        16, validation_alias="PULUMI_WORKSPACE_POOL_SIZE"
+    )
+    pulumi_workspace_max_idle_seconds: int = Field(
+        1800, validation_alias="PULUMI_WORKSPACE_MAX_IDLE_SECONDS"
+    )
 
     # initial admin
     initial_admin_email: str | None = Field(
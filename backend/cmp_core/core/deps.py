@@ -5,19 +5,43 @@ from cmp_core.core.security import decode_token
 from cmp_core.models.project_member import ProjectMember
 from cmp_core.models.role import RoleName
 from cmp_core.services.auth import get_user_by_id
-from fastapi import Depends, HTTPException, Path, status
+from fastapi import Depends, HTTPException, Path, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
 
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db),
 ):
+    return await user_from_token(db, token)
+
+
+async def get_stream_user(
+    bearer: str | None = Depends(optional_oauth2_scheme),
+    token: str | None = Query(None, description="Access token"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    The user of a streaming route: browser EventSource sends no headers, so
+    the access token may come as `?token=`, as for the WebSocket feed.
+    """
+    if not (bearer or token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await user_from_token(db, bearer or token)
+
+
+async def user_from_token(db: AsyncSession, token: str):
+    """The user of an access token; WebSocket routes, which get no bearer header, call it directly."""
     try:
         payload = decode_token(token)
         if payload.get("type") != "access":
@@ -44,9 +68,11 @@ def require_role(role: RoleName):
     return Depends(checker)
 
 
-def require_project_member(min_role: RoleName | None = None):
+def require_project_member(
+    min_role: RoleName | None = None, current_user=get_current_user
+):
     async def checker(
-        user=Depends(get_current_user),
+        user=Depends(current_user),
         project_id: str = Path(..., description="ID проєкту"),
         db: AsyncSession = Depends(get_db),
     ):
@@ -0,0 +1,18 @@
+# cmp_core/core/redis.py
+
+from functools import lru_cache
+
+import redis
+from cmp_core.core.config import settings
+
+
+@lru_cache
+def get_redis() -> redis.Redis | None:
+    """
+    Shared synchronous Redis client for REDIS_CACHE_URL, or None when no cache
+    is configured. redis-py resets its connection pool after a fork, so the
+    client is safe to share with prefork Celery workers.
+    """
+    if not settings.redis_cache_url:
+        return None
+    return redis.Redis.from_url(settings.redis_cache_url, decode_responses=True)
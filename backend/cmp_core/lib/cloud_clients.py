@@ -0,0 +1,167 @@
+# cmp_core/lib/cloud_clients.py
+"""
+Per-process registry of cloud SDK clients and credentials.
+
+Building a client is not free: boto3 resolves credentials and loads endpoint
+and service model data, and every Azure management client gets its own
+pipeline and HTTP session, so the first call of each pays a TLS handshake
+and, through a new DefaultAzureCredential, a token request. The registry
+builds each client once per process, keyed by (provider, service, region or
+subscription, credential identity), and hands the same instance to every
+task and thread:
+
+  * AWS clients come from one boto3 Session (creating clients from a shared
+    session is not thread-safe, so that happens under the lock; the clients
+    themselves are). Their urllib3 pool holds POOL_CONNECTIONS connections.
+  * Azure clients share one DefaultAzureCredential, which caches its tokens
+    until shortly before they expire, and one requests Session, so
+    connections to ARM are reused across clients and subscriptions.
+
+The registry is emptied in a forked child (os.register_at_fork), since
+sockets, locks and token caches must not be shared with the parent, and by
+clear() when a worker process shuts down.
+"""
+
+import logging
+import os
+import threading
+from typing import Callable, TypeVar
+
+import boto3
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from azure.identity import DefaultAzureCredential
+from azure.mgmt.compute import ComputeManagementClient
+from azure.mgmt.network import NetworkManagementClient
+from botocore.config import Config
+from cmp_core.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# connections kept per client (boto3) or per host (Azure); above the thread
+# counts of the reconcile and power-op pools
+POOL_CONNECTIONS = 32
+
+# reentrant: builders called under it take it again for the shared pieces
+_lock = threading.RLock()
+# (provider, service, region / subscription, credential identity) -> client
+_clients: dict[tuple[str, str, str, str], object] = {}
+_aws_session: boto3.session.Session | None = None
+_azure_credential: DefaultAzureCredential | None = None
+_azure_http: requests.Session | None = None
+
+
+def _reset_after_fork() -> None:
+    global _lock, _aws_session, _azure_credential, _azure_http
+    # the parent still uses these; only drop the references
+    _lock = threading.RLock()
+    _clients.clear()
+    _aws_session = None
+    _azure_credential = None
+    _azure_http = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _session() -> boto3.session.Session:
+    global _aws_session
+    if _aws_session is None:
+        _aws_session = boto3.session.Session()
+    return _aws_session
+
+
+def aws_identity() -> str:
+    """Access key id of the process's AWS credentials; one key is one account."""
+    with _lock:
+        try:
+            credentials = _session().get_credentials()
+        except Exception:
+            credentials = None
+    return credentials.access_key if credentials else "default"
+
+
+def azure_identity() -> str:
+    return f"{settings.azure_tenant_id}/{settings.azure_client_id}"
+
+
+def _cached(key: tuple[str, str, str, str], build: Callable[[], T]) -> T:
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = build()
+    return client
+
+
+def ec2(region: str):
+    """The process's EC2 client for `region`."""
+    return _cached(
+        ("aws", "ec2", region, aws_identity()),
+        lambda: _session().client(
+            "ec2",
+            region_name=region,
+            config=Config(max_pool_connections=POOL_CONNECTIONS),
+        ),
+    )
+
+
+def azure_credential() -> DefaultAzureCredential:
+    """The process's Azure credential; its tokens are cached until near expiry."""
+    global _azure_credential
+    if _azure_credential is None:
+        with _lock:
+            if _azure_credential is None:
+                _azure_credential = DefaultAzureCredential()
+    return _azure_credential
+
+
+def _azure_transport() -> RequestsTransport:
+    global _azure_http
+    with _lock:
+        if _azure_http is None:
+            _azure_http = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=POOL_CONNECTIONS)
+            _azure_http.mount("https://", adapter)
+        # session_owner=False: closing one client must not close the session
+        return RequestsTransport(session=_azure_http, session_owner=False)
+
+
+def azure_compute(subscription_id: str) -> ComputeManagementClient:
+    """The process's compute client for `subscription_id`."""
+    return _cached(
+        ("azure", "compute", subscription_id, azure_identity()),
+        lambda: ComputeManagementClient(
+            azure_credential(), subscription_id, transport=_azure_transport()
+        ),
+    )
+
+
+def azure_network(subscription_id: str) -> NetworkManagementClient:
+    """The process's network client for `subscription_id`."""
+    return _cached(
+        ("azure", "network", subscription_id, azure_identity()),
+        lambda: NetworkManagementClient(
+            azure_credential(), subscription_id, transport=_azure_transport()
+        ),
+    )
+
+
+def clear() -> None:
+    """Closes every client and drops the credential (worker process shutdown)."""
+    global _aws_session, _azure_credential, _azure_http
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        credential, http = _azure_credential, _azure_http
+        _aws_session = _azure_credential = _azure_http = None
+    for resource in [*clients, credential, http]:
+        if resource is None:
+            continue
+        try:
+            resource.close()
+        except Exception as e:
+            logger.debug(f"Closing {type(resource).__name__} failed: {e}")
@@ -0,0 +1,92 @@
+# cmp_core/lib/metrics.py
+"""
+Tiny Redis-backed metrics shared by the API and every Celery worker.
+
+Each metric is a Redis hash `cmp:metrics:{name}` whose fields are label sets
+(e.g. "provider=aws,region=eu-central-1"). Counters and gauges store a single
+number per field. Observations (durations, lags) store `count`, `sum` and `max`
+per label set. `snapshot()` returns all of them; GET /api/v1/metrics serves it.
+
+Metrics are best effort: without REDIS_CACHE_URL, or if Redis fails, they are
+only logged at debug level.
+"""
+
+import logging
+
+from cmp_core.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+_NAMES_KEY = "cmp:metrics:names"
+
+# KEYS: metric hash | ARGV: label field, value
+_OBSERVE = """
+redis.call('HINCRBY', KEYS[1], ARGV[1] .. '|count', 1)
+redis.call('HINCRBYFLOAT', KEYS[1], ARGV[1] .. '|sum', ARGV[2])
+local current = redis.call('HGET', KEYS[1], ARGV[1] .. '|max')
+if not current or tonumber(ARGV[2]) > tonumber(current) then
+    redis.call('HSET', KEYS[1], ARGV[1] .. '|max', ARGV[2])
+end
+return 1
+"""
+
+
+def _labels(labels: dict) -> str:
+    return ",".join(f"{k}={labels[k]}" for k in sorted(labels)) or "_"
+
+
+def _key(name: str) -> str:
+    return f"cmp:metrics:{name}"
+
+
+def incr(name: str, amount: float = 1, **labels) -> None:
+    """Adds `amount` to a counter (use a negative amount for up/down gauges)."""
+    logger.debug(f"metric {name}{labels} += {amount}")
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        pipe = r.pipeline()
+        pipe.sadd(_NAMES_KEY, name)
+        pipe.hincrbyfloat(_key(name), _labels(labels), amount)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"metric {name} not recorded: {e}")
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    logger.debug(f"metric {name}{labels} = {value}")
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        pipe = r.pipeline()
+        pipe.sadd(_NAMES_KEY, name)
+        pipe.hset(_key(name), _labels(labels), value)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"metric {name} not recorded: {e}")
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Records one observation (count / sum / max) of e.g. a duration in seconds."""
+    logger.debug(f"metric {name}{labels} observed {value}")
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        r.sadd(_NAMES_KEY, name)
+        r.eval(_OBSERVE, 1, _key(name), _labels(labels), value)
+    except Exception as e:
+        logger.debug(f"metric {name} not recorded: {e}")
+
+
+def snapshot() -> dict[str, dict[str, float]]:
+    """Returns {metric name: {label set or "label set|stat": value}}."""
+    r = get_redis()
+    if r is None:
+        return {}
+    return {
+        name: {field: float(value) for field, value in r.hgetall(_key(name)).items()}
+        for name in sorted(r.smembers(_NAMES_KEY))
+    }
@@ -0,0 +1,27 @@
+# cmp_core/lib/outbox.py
+"""
+Transactional outbox for dispatching Celery tasks from request handlers.
+
+`enqueue(db, task, *args)` adds a task_outbox row to the caller's session
+instead of publishing to the broker, so the task is committed together with
+the change that needs it, or not at all, and the request does no blocking
+broker round trip. cmp_core.outbox_relay publishes the rows after commit.
+
+Delivery is at least once: a relay that dies between publishing a batch and
+deleting its rows publishes that batch again. The tasks dispatched this way
+(reconcile, VM power ops, project destroy) already tolerate repeats.
+"""
+
+from typing import Any
+
+from cmp_core.models.outbox import OutboxMessage
+
+
+def enqueue(session, task, *args: Any, **kwargs: Any) -> None:
+    """
+    Queues `task` (a Celery task or its name) with JSON-serialisable
+    arguments in the session's transaction; works with sync and async
+    sessions alike. Nothing is sent if the transaction rolls back.
+    """
+    name = task if isinstance(task, str) else task.name
+    session.add(OutboxMessage(task=name, args=list(args), kwargs=kwargs))
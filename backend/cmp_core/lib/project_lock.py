@@ -0,0 +1,215 @@
+# cmp_core/lib/project_lock.py
+"""
+Distributed per-project reconcile lock.
+
+A lease is a Redis key holding a fencing token. The token comes from a
+per-project counter, so it grows with every acquisition. A heartbeat thread
+renews the lease while a long `stack.up()` runs. Before a reconcile commits,
+`fence()` stores the token on the project row in the same transaction, and
+fails if a newer holder has already written a larger token. A worker whose
+lease expired therefore cannot overwrite the results of its successor.
+
+Held leases are also kept in the sorted set `cmp:reconcile:leases`, scored
+by expiry, and the reconcile_lock_held gauge is set from it on every
+acquire, renewal and release: a worker that dies holding a lease drops out
+once its lease expires instead of leaving the gauge off for good.
+"""
+
+import logging
+import threading
+import time
+
+from cmp_core.core.config import settings
+from cmp_core.core.redis import get_redis
+from cmp_core.lib import metrics
+from cmp_core.models.project import Project
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# KEYS: lock | ARGV: token, ttl ms
+_RENEW = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_LEASES_KEY = "cmp:reconcile:leases"
+
+# KEYS: lease set | ARGV: now, project id, expiry (empty to remove)
+# -> number of leases still held
+_HELD = """
+if ARGV[3] == '' then
+    redis.call('ZREM', KEYS[1], ARGV[2])
+else
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+return redis.call('ZCARD', KEYS[1])
+"""
+
+# KEYS: lock | ARGV: token
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaseLost(Exception):
+    """The lease expired or was taken over; the holder must not commit."""
+
+
+class ProjectLease:
+    def __init__(self, project_id: str, on_renew=None):
+        self.project_id = project_id
+        self.token: int | None = None
+        self.lost = False
+        self._ttl = settings.reconcile_lock_ttl_seconds
+        self._key = f"cmp:reconcile:{project_id}:lock"
+        self._fence_key = f"cmp:reconcile:{project_id}:fence"
+        self._on_renew = on_renew
+        self._stop = threading.Event()
+        self._heartbeat: threading.Thread | None = None
+        self._acquired_at: float | None = None
+
+    def acquire(self, wait_seconds: float | None = None) -> bool:
+        """
+        Waits up to `wait_seconds` for the lease. Without Redis, or if Redis
+        fails, it succeeds without a lease (no heartbeat, fence() is a no-op).
+        """
+        r = get_redis()
+        if r is None:
+            return True
+        if wait_seconds is None:
+            wait_seconds = settings.reconcile_lock_wait_seconds
+
+        started = time.monotonic()
+        contended = False
+        try:
+            token = r.incr(self._fence_key)
+            while True:
+                if r.set(self._key, token, nx=True, px=int(self._ttl * 1000)):
+                    break
+                if not contended:
+                    contended = True
+                    metrics.incr("reconcile_lock_contended_total")
+                if time.monotonic() - started >= wait_seconds:
+                    metrics.incr("reconcile_lock_timeouts_total")
+                    metrics.observe(
+                        "reconcile_lock_wait_seconds", time.monotonic() - started
+                    )
+                    return False
+                time.sleep(0.5)
+        except Exception as e:
+            # like the reconcile queue: a Redis outage must not stop reconciles
+            logger.warning(
+                f"Reconcile lease for project {self.project_id} unavailable ({e}); running without it."
+            )
+            metrics.incr("reconcile_lock_unavailable_total")
+            return True
+
+        waited = time.monotonic() - started
+        metrics.observe("reconcile_lock_wait_seconds", waited)
+        self._record_held(held=True)
+        self.token = token
+        self._acquired_at = time.monotonic()
+        self._heartbeat = threading.Thread(
+            target=self._renew_loop,
+            name=f"lease-{self.project_id}",
+            daemon=True,
+        )
+        self._heartbeat.start()
+        logger.info(
+            f"Acquired reconcile lease for project {self.project_id} (token {token}, waited {waited:.1f}s)."
+        )
+        return True
+
+    def _renew_loop(self) -> None:
+        r = get_redis()
+        interval = max(self._ttl / 3, 1)
+        while not self._stop.wait(interval):
+            try:
+                renewed = r.eval(
+                    _RENEW, 1, self._key, self.token, int(self._ttl * 1000)
+                )
+            except Exception as e:
+                # a transient Redis error is not a lost lease; the next beat may succeed
+                logger.warning(f"Lease renewal for {self.project_id} failed: {e}")
+                continue
+            if not renewed:
+                self.lost = True
+                metrics.incr("reconcile_lock_lost_total")
+                logger.error(
+                    f"Reconcile lease for project {self.project_id} was lost (token {self.token})."
+                )
+                return
+            self._record_held(held=True)
+            if self._on_renew:
+                self._on_renew()
+
+    def _record_held(self, held: bool) -> None:
+        """Updates this lease's entry in the lease set and the held gauge."""
+        now = time.time()
+        try:
+            count = get_redis().eval(
+                _HELD,
+                1,
+                _LEASES_KEY,
+                now,
+                self.project_id,
+                now + self._ttl if held else "",
+            )
+        except Exception as e:
+            logger.debug(f"reconcile_lock_held not recorded: {e}")
+            return
+        metrics.set_gauge("reconcile_lock_held", count)
+
+    def fence(self, session: Session) -> None:
+        """
+        Call right before committing. Records this lease's token on the project
+        row in the current transaction, and raises LeaseLost if the lease is
+        gone or a newer holder has already committed.
+        """
+        if self.token is None:
+            return
+        if self.lost:
+            raise LeaseLost(f"lease for project {self.project_id} expired")
+        result = session.execute(
+            update(Project)
+            .where(Project.id == self.project_id)
+            .where(Project.reconcile_fence <= self.token)
+            .values(reconcile_fence=self.token)
+        )
+        if result.rowcount == 0:
+            metrics.incr("reconcile_lock_fenced_total")
+            raise LeaseLost(
+                f"stale fencing token {self.token} for project {self.project_id}"
+            )
+
+    def release(self) -> None:
+        self._stop.set()
+        if self._heartbeat:
+            self._heartbeat.join(timeout=5)
+        if self.token is None:
+            return
+        r = get_redis()
+        try:
+            r.eval(_RELEASE, 1, self._key, self.token)
+        except Exception as e:
+            logger.warning(f"Releasing lease for {self.project_id} failed: {e}")
+        self._record_held(held=False)
+        metrics.observe(
+            "reconcile_lock_held_seconds", time.monotonic() - self._acquired_at
+        )
+        self.token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
@@ -6,7 +6,16 @@ from cmp_core.models.resource import ResourceState
 from pulumi import ResourceOptions
 
 
-@register_provider("aws")
+@register_provider(
+    "aws",
+    # desired state only: aws_id is written back by the first up and only
+    # matters for adopting an existing instance
+    spec_keys=("ami", "instance_type"),
+    pulumi_resources=(
+        ("pulumi:providers:aws", "aws-p-{region}"),
+        ("aws:ec2/instance:Instance", "{name}"),
+    ),
+)
 def aws_handler(resources, pulumi_providers):
     # bucket specs by region
     regions: dict[str, list] = {}
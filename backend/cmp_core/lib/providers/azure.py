@@ -5,7 +5,28 @@ from pulumi import ResourceOptions
 from pulumi_azure_native import compute, network, resources
 
 
-@register_provider("azure")
+@register_provider(
+    "azure",
+    spec_keys=(
+        "location",
+        "vnet_address_prefix",
+        "subnet_prefix",
+        "public_ip_allocation_method",
+        "vm_size",
+        "image_reference",
+        "admin_username",
+        "admin_password",
+        # not azure_id: it is an output of the first up, read only for adoption
+    ),
+    pulumi_resources=(
+        ("azure-native:resources:ResourceGroup", "{name}-rg"),
+        ("azure-native:network:VirtualNetwork", "{name}-vnet"),
+        ("azure-native:network:Subnet", "{name}-subnet"),
+        ("azure-native:network:PublicIPAddress", "{name}-pip"),
+        ("azure-native:network:NetworkInterface", "{name}-nic"),
+        ("azure-native:compute:VirtualMachine", "{name}"),
+    ),
+)
 def azure_handler(specs, pulumi_providers):
     for spec in specs:
         # 1) Resource Group
@@ -1,5 +1,5 @@
 # cmp_core/lib/pulumi_adapter.py
-from typing import Any, Callable, Dict, List, Protocol
+from typing import Any, Callable, Dict, Iterable, List, Protocol
 
 
 # A simple Protocol so handlers know what shape they get:
@@ -16,10 +16,25 @@ Handler = Callable[[List[ResourceSpec], Dict[str, Any]], None]
 
 _registry: Dict[str, Handler] = {}
 
+# Meta keys each handler actually reads; only these feed the desired-state
+# fingerprint, so bookkeeping keys (public_ip, power_state, ...) don't count.
+_spec_keys: Dict[str, tuple[str, ...]] = {}
 
-def register_provider(provider_name: str):
+# (Pulumi type token, resource name template) for every resource a handler
+# declares per spec (including shared ones, like a per-region provider);
+# templates are formatted with the spec's name and region.
+_pulumi_resources: Dict[str, tuple[tuple[str, str], ...]] = {}
+
+
+def register_provider(
+    provider_name: str,
+    spec_keys: Iterable[str] = (),
+    pulumi_resources: Iterable[tuple[str, str]] = (),
+):
     def deco(fn: Handler):
         _registry[provider_name] = fn
+        _spec_keys[provider_name] = tuple(spec_keys)
+        _pulumi_resources[provider_name] = tuple(pulumi_resources)
         return fn
 
     return deco
@@ -27,3 +42,18 @@ def register_provider(provider_name: str):
 
 def all_handlers() -> Dict[str, Handler]:
     return _registry
+
+
+def spec_keys(provider_name: str) -> tuple[str, ...] | None:
+    """Meta keys relevant to a provider's handler, or None if it declared none."""
+    return _spec_keys.get(provider_name) or None
+
+
+def pulumi_resources(
+    provider_name: str, name: str, region: str
+) -> List[tuple[str, str]]:
+    """(type, name) of each Pulumi resource the handler creates for one spec."""
+    return [
+        (type_, template.format(name=name, region=region))
+        for type_, template in _pulumi_resources.get(provider_name, ())
+    ]
@@ -5,6 +5,7 @@ from typing import Any, Dict
 
 import pulumi
 import pulumi_aws as aws
+from cmp_core.lib.pulumi_events import EventRecorder, log_summary
 from pulumi.automation import ConfigValue, UpResult, create_or_select_stack
 
 _PROJECT_NAME = "cmp-aws-ec2"
@@ -46,7 +47,11 @@ def up_instance(project_id: str, config: Dict[str, Any]) -> Dict[str, Any]:
     # tell Pulumi which region to use
     stack.set_config("aws:region", ConfigValue(value=config["region"]))
 
-    result: UpResult = stack.up(on_output=print)
+    recorder = EventRecorder(_stack_name(project_id))
+    try:
+        result: UpResult = stack.up(on_event=recorder.on("up"))
+    finally:
+        log_summary(recorder)
     return {k: out.value for k, out in result.outputs.items()}
 
 
@@ -61,4 +66,8 @@ def destroy_instance(project_id: str) -> None:
         project_name=_PROJECT_NAME,
         program=lambda: None,
     )
-    stack.destroy(on_output=print)
+    recorder = EventRecorder(_stack_name(project_id))
+    try:
+        stack.destroy(on_event=recorder.on("destroy"))
+    finally:
+        log_summary(recorder)
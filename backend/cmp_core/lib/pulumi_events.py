@@ -0,0 +1,132 @@
+# cmp_core/lib/pulumi_events.py
+"""
+Compact capture of Pulumi engine events.
+
+`EventRecorder.on(phase)` is passed as `on_event=` to refresh/up/destroy in
+place of `on_output=print`. It keeps one record per resource step, with the
+URN, type, operation, start offset, duration, status and error, and counts
+unchanged ("same") steps instead of storing them. Failures are logged;
+everything else stays out of the worker log. `summary()` is what gets
+persisted on the PulumiRun row. An optional `on_step` callback sees each
+step as it starts and as it finishes, for live progress.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from pulumi.automation import EngineEvent, OpType
+
+logger = logging.getLogger(__name__)
+
+# engine diagnostics can carry whole provider responses
+MAX_ERROR_LENGTH = 1000
+
+
+class EventRecorder:
+    def __init__(
+        self,
+        stack_name: str,
+        on_step: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> None:
+        self.stack_name = stack_name
+        self.on_step = on_step
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+        self._open: Dict[tuple[str, str], Dict[str, Any]] = {}
+        self.steps: List[Dict[str, Any]] = []
+        self.unchanged = 0
+        self.errors: List[str] = []
+
+    def on(self, phase: str) -> Callable[[EngineEvent], None]:
+        """An on_event callback that files steps under `phase` (refresh, up, ...)."""
+        return lambda event: self.handle(phase, event)
+
+    def handle(self, phase: str, event: EngineEvent) -> None:
+        now = time.monotonic() - self._t0
+        step = None
+        with self._lock:
+            if event.resource_pre_event and not event.resource_pre_event.planning:
+                md = event.resource_pre_event.metadata
+                if md.op == OpType.SAME:
+                    self.unchanged += 1
+                    return
+                step = self._open[(phase, md.urn)] = {
+                    "urn": md.urn,
+                    "type": md.type,
+                    "name": md.urn.rsplit("::", 1)[-1],
+                    "op": md.op.value,
+                    "phase": phase,
+                    "start": round(now, 3),
+                    "status": "running",
+                    "error": None,
+                }
+            elif event.res_outputs_event and not event.res_outputs_event.planning:
+                step = self._close(
+                    phase, event.res_outputs_event.metadata.urn, now, "ok"
+                )
+            elif event.res_op_failed_event:
+                step = self._close(
+                    phase, event.res_op_failed_event.metadata.urn, now, "failed"
+                )
+            elif event.diagnostic_event and event.diagnostic_event.severity == "error":
+                diag = event.diagnostic_event
+                message = diag.message.strip()[:MAX_ERROR_LENGTH]
+                failing = self._open.get((phase, diag.urn)) if diag.urn else None
+                if failing is not None:
+                    failing["error"] = message
+                else:
+                    self.errors.append(message)
+                logger.warning(f"[{self.stack_name}] {phase}: {message}")
+            if step is not None:
+                step = dict(step)
+        if step is not None and self.on_step is not None:
+            try:
+                self.on_step(step)
+            except Exception as e:
+                logger.debug(f"[{self.stack_name}] on_step failed: {e}")
+
+    def _close(
+        self, phase: str, urn: str, now: float, status: str
+    ) -> Optional[Dict[str, Any]]:
+        step = self._open.pop((phase, urn), None)
+        if step is None:
+            return None
+        step["duration"] = round(max(now - step["start"], 0.0), 3)
+        step["status"] = status
+        self.steps.append(step)
+        if status == "failed":
+            logger.warning(
+                f"[{self.stack_name}] {step['op']} {step['name']} failed after {step['duration']}s: {step['error']}"
+            )
+        return step
+
+    def summary(self) -> Dict[str, Any]:
+        """Finished steps slowest first; steps still open are reported as incomplete."""
+        now = time.monotonic() - self._t0
+        with self._lock:
+            steps = list(self.steps)
+            for step in self._open.values():
+                steps.append(
+                    {
+                        **step,
+                        "duration": round(max(now - step["start"], 0.0), 3),
+                        "status": "incomplete",
+                    }
+                )
+            return {
+                "steps": sorted(steps, key=lambda s: s["duration"], reverse=True),
+                "unchanged": self.unchanged,
+                "errors": list(self.errors),
+            }
+
+
+def log_summary(recorder: EventRecorder) -> None:
+    summary = recorder.summary()
+    slowest = ", ".join(
+        f"{s['op']} {s['name']} {s['duration']}s" for s in summary["steps"][:5]
+    )
+    logger.info(
+        f"[{recorder.stack_name}] {len(summary['steps'])} steps, "
+        f"{summary['unchanged']} unchanged; slowest: {slowest or '-'}"
+    )
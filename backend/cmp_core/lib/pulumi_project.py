@@ -1,10 +1,14 @@
 # cmp_core/lib/pulumi_project.py
 
+import hashlib
 import importlib
+import json
 import os
 import pkgutil
+import time
+from contextlib import contextmanager
 from types import SimpleNamespace
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterator, List
 
 # ──────────────────────────────────────────────────────────────────────────────
 # ensure every provider module under cmp_core.lib.providers is loaded,
@@ -12,29 +16,50 @@ from typing import Any, Dict, List
 import cmp_core.lib.providers  # the package
 import pulumi
 from cmp_core.core.config import settings
-from cmp_core.lib.pulumi_adapter import all_handlers
+from cmp_core.lib.pulumi_adapter import all_handlers, pulumi_resources, spec_keys
+from cmp_core.lib.pulumi_events import EventRecorder, log_summary
+from cmp_core.lib.pulumi_workspaces import checkout, evict, workspace
+from cmp_core.models.project import ReconcileMode
 from cmp_core.models.resource import ResourceState
-from pulumi.automation import UpResult, create_or_select_stack
+from pulumi.automation import Deployment, Stack, UpResult
 
 for _, modname, _ in pkgutil.iter_modules(cmp_core.lib.providers.__path__):
     importlib.import_module(f"cmp_core.lib.providers.{modname}")
 # ──────────────────────────────────────────────────────────────────────────────
 
 
-def _stack_name(project_id: str) -> str:
+def project_stack_name(project_id: str) -> str:
     return f"cmp-cloud-project-{project_id}-stack"
 
 
+def partition_stack_name(project_id: str, provider: str, region: str) -> str:
+    return f"cmp-cloud-project-{project_id}-{provider}-{region or 'global'}-stack"
+
+
 def _project_name() -> str:
     return "cmp-cloud-project"
 
 
-def _inline_program(resources: List[Any]) -> None:
+def stack_groups(project_id: str, resources: List[Any]) -> Dict[str, List[Any]]:
     """
-    This gets run _inside_ Pulumi.  We group your SQLAlchemy Resource
-    objects by provider, wrap them in a simple spec, then call each handler.
+    Maps each stack name to the resources it manages: the single project
+    stack, or one stack per (provider, region) when partitioning is enabled.
+    """
+    if not settings.pulumi_stack_partitioning:
+        return {project_stack_name(project_id): list(resources)}
+    groups: Dict[str, List[Any]] = {}
+    for r in resources:
+        provider = getattr(r.provider, "value", r.provider)
+        name = partition_stack_name(project_id, provider, r.region or "")
+        groups.setdefault(name, []).append(r)
+    return groups
+
+
+def _build_specs(resources: List[Any]) -> Dict[str, List[SimpleNamespace]]:
+    """
+    Wraps your SQLAlchemy Resource objects in simple specs grouped by provider,
+    leaving out everything the Pulumi program should not manage.
     """
-    pulumi_providers: Dict[str, Any] = {}
     specs_by_provider: Dict[str, List[SimpleNamespace]] = {}
 
     # turn each Resource into a tiny ResourceSpec-like object
@@ -68,6 +93,43 @@ def _inline_program(resources: List[Any]) -> None:
         )
         specs_by_provider.setdefault(provider, []).append(spec)
 
+    return specs_by_provider
+
+
+def desired_fingerprint(resources: List[Any]) -> str:
+    """
+    Stable hash of the desired state the Pulumi program is built from:
+    provider, name, region and the meta keys each handler reads.
+    """
+    desired = []
+    for provider, specs in sorted(_build_specs(resources).items()):
+        keys = spec_keys(provider)
+        for spec in sorted(specs, key=lambda sp: sp.name):
+            meta = (
+                {k: spec.meta.get(k) for k in keys}
+                if keys is not None
+                else dict(spec.meta)
+            )
+            desired.append(
+                {
+                    "provider": provider,
+                    "name": spec.name,
+                    "region": spec.region,
+                    "meta": meta,
+                }
+            )
+    payload = json.dumps(desired, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _inline_program(resources: List[Any]) -> None:
+    """
+    This gets run _inside_ Pulumi.  We group your SQLAlchemy Resource
+    objects by provider, wrap them in a simple spec, then call each handler.
+    """
+    pulumi_providers: Dict[str, Any] = {}
+    specs_by_provider = _build_specs(resources)
+
     # dispatch to each handler
     for provider_name, specs in specs_by_provider.items():
         handler = all_handlers().get(provider_name)
@@ -80,7 +142,7 @@ def _inline_program(resources: List[Any]) -> None:
         handler(specs, pulumi_providers)
 
 
-def up_project(project_id: str, resources: List[Any]) -> Dict[str, Any]:
+def _ensure_cloud_env() -> None:
     # ensure AWS creds in env
     os.environ.setdefault("AWS_ACCESS_KEY_ID", os.getenv("AWS_ACCESS_KEY_ID", ""))
     os.environ.setdefault(
@@ -93,43 +155,352 @@ def up_project(project_id: str, resources: List[Any]) -> Dict[str, Any]:
     os.environ.setdefault("ARM_TENANT_ID", settings.azure_tenant_id)
     os.environ.setdefault("ARM_SUBSCRIPTION_ID", settings.azure_subscription_id)
 
-    stack = create_or_select_stack(
-        stack_name=_stack_name(project_id),
-        project_name=_project_name(),
-        program=lambda: _inline_program(resources),
-    )
 
-    # run a refresh so that any manually‐deleted resources get pruned
+def resource_urns(stack_name: str, resources: List[Any]) -> List[str]:
+    """URNs of the Pulumi resources the handlers declare for `resources` in a stack."""
+    urns: Dict[str, None] = {}
+    for r in resources:
+        provider = getattr(r.provider, "value", r.provider)
+        for type_, name in pulumi_resources(provider, r.name, r.region or ""):
+            urns[f"urn:pulumi:{stack_name}::{_project_name()}::{type_}::{name}"] = None
+    return list(urns)
+
+
+@contextmanager
+def _timed(stats: Dict[str, Any], phase: str) -> Iterator[None]:
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        stats[f"{phase}_seconds"] = time.monotonic() - start
+
+
+def _outputs(stack: Stack) -> Dict[str, Any]:
+    return {k: out.value for k, out in stack.outputs().items()}
+
+
+def _refresh(
+    stack: Stack,
+    stack_name: str,
+    stats: Dict[str, Any],
+    recorder: EventRecorder,
+    target: List[str] | None = None,
+) -> bool:
+    """Runs a refresh and reports whether it found drift (a failed refresh counts)."""
     try:
-        print("⟳ refreshing Pulumi state to match real cloud")
-        stack.refresh(on_output=print)
+        print(f"⟳ refreshing Pulumi state of {stack_name} to match real cloud")
+        with _timed(stats, "refresh"):
+            refresh = stack.refresh(target=target, on_event=recorder.on("refresh"))
+        changes = refresh.summary.resource_changes or {}
+        return any(n for op, n in changes.items() if op != "same")
     except Exception as e:
-        print("⚠️  pulumi refresh failed:", e)
+        print(f"⚠️  pulumi refresh of {stack_name} failed:", e)
+        return True
+
 
-    result: UpResult = stack.up(on_output=print)
+def _up(
+    stack: Stack,
+    stats: Dict[str, Any],
+    recorder: EventRecorder,
+    target: List[str] | None = None,
+    refresh: bool = False,
+) -> Dict[str, Any]:
+    with _timed(stats, "up"):
+        result: UpResult = stack.up(
+            target=target, refresh=refresh, on_event=recorder.on("up")
+        )
     return {k: out.value for k, out in result.outputs.items()}
 
 
-def destroy_project(project_id: str) -> None:
-    """
-    Tear down ALL resources in the stack for this project.
-    """
+def _up_targeted(
+    stack: Stack,
+    stack_name: str,
+    resources: List[Any],
+    targets: List[Any],
+    mode: str,
+    stats: Dict[str, Any],
+    recorder: EventRecorder,
+) -> Dict[str, Any]:
+    # the engine rejects targets that are neither in the state nor registered
+    # by the program, and a refresh has no program at all
+    state = stack.export_stack().deployment or {}
+    existing = {res["urn"] for res in state.get("resources") or []}
+    declared = set(
+        resource_urns(
+            stack_name,
+            [sp for specs in _build_specs(resources).values() for sp in specs],
+        )
+    )
+    urns = resource_urns(stack_name, targets)
+    refresh_targets = [urn for urn in urns if urn in existing]
+    up_targets = [urn for urn in urns if urn in existing or urn in declared]
 
-    # ensure AWS creds in env
-    os.environ.setdefault("AWS_ACCESS_KEY_ID", os.getenv("AWS_ACCESS_KEY_ID", ""))
-    os.environ.setdefault(
-        "AWS_SECRET_ACCESS_KEY", os.getenv("AWS_SECRET_ACCESS_KEY", "")
+    if mode == ReconcileMode.refresh_then_up and refresh_targets:
+        _refresh(stack, stack_name, stats, recorder, target=refresh_targets)
+    if not up_targets:
+        stats["up_skipped"] = True
+        return _outputs(stack)
+    return _up(
+        stack,
+        stats,
+        recorder,
+        target=up_targets,
+        refresh=mode == ReconcileMode.up_with_refresh,
     )
 
-    # ensure Azure creds in env for Pulumi (DefaultAzureCredential)
-    os.environ.setdefault("ARM_CLIENT_ID", settings.azure_client_id)
-    os.environ.setdefault("ARM_CLIENT_SECRET", settings.azure_client_secret)
-    os.environ.setdefault("ARM_TENANT_ID", settings.azure_tenant_id)
-    os.environ.setdefault("ARM_SUBSCRIPTION_ID", settings.azure_subscription_id)
 
-    stack = create_or_select_stack(
-        stack_name=_stack_name(project_id),
-        project_name=_project_name(),
-        program=lambda: None,  # no‐op program for destroy
+def _up_full(
+    stack: Stack,
+    stack_name: str,
+    resources: List[Any],
+    last_fingerprint: str | None,
+    mode: str,
+    drift_check: bool,
+    stats: Dict[str, Any],
+    recorder: EventRecorder,
+) -> Dict[str, Any]:
+    unchanged = (
+        last_fingerprint is not None
+        and last_fingerprint == desired_fingerprint(resources)
     )
-    stack.destroy(on_output=print)
+
+    if mode == ReconcileMode.up_with_refresh:
+        # one engine run that refreshes each resource before diffing it
+        return _up(stack, stats, recorder, refresh=True)
+
+    if mode == ReconcileMode.scheduled_refresh:
+        if not drift_check:
+            # desired changes between drift checks: trust the state, no refresh
+            if unchanged:
+                stats["up_skipped"] = True
+                return _outputs(stack)
+            return _up(stack, stats, recorder)
+        if not unchanged:
+            return _up(stack, stats, recorder, refresh=True)
+        # drift check with nothing to change: refresh only, converge on drift
+        if not _refresh(stack, stack_name, stats, recorder):
+            print(f"✓ {stack_name}: no drift; refresh-only pass")
+            stats["up_skipped"] = True
+            return _outputs(stack)
+        return _up(stack, stats, recorder)
+
+    # refresh_then_up: run a refresh so that any manually‐deleted resources get pruned
+    drift_detected = _refresh(stack, stack_name, stats, recorder)
+    if unchanged and not drift_detected:
+        print(f"✓ {stack_name}: desired state unchanged and no drift; skipping up")
+        stats["up_skipped"] = True
+        return _outputs(stack)
+    return _up(stack, stats, recorder)
+
+
+def up_stack(
+    stack_name: str,
+    resources: List[Any],
+    last_fingerprint: str | None = None,
+    targets: List[Any] | None = None,
+    mode: str = ReconcileMode.refresh_then_up,
+    drift_check: bool = True,
+    stats: Dict[str, Any] | None = None,
+    on_step: Callable[[Dict[str, Any]], None] | None = None,
+) -> Dict[str, Any]:
+    """
+    Refreshes and updates one stack, returning its outputs.
+
+    `mode` (a ReconcileMode) decides how refresh and up are combined:
+    refresh_then_up runs a separate refresh before the up and skips the up if
+    `last_fingerprint` (of the last successful up) still matches and nothing
+    drifted; up_with_refresh runs a single up that refreshes as it goes;
+    scheduled_refresh refreshes only when `drift_check` is set, as a
+    refresh-only pass if the desired state is unchanged.
+    With `targets`, only the Pulumi resources declared for those Resources
+    are refreshed and updated; the fingerprint is not consulted.
+    Phase durations (refresh_seconds, up_seconds), up_skipped and the engine
+    event summary (`events`, see EventRecorder) go to `stats`; `on_step`
+    receives each engine step as it starts and finishes.
+    """
+    _ensure_cloud_env()
+    stats = {} if stats is None else stats
+    stats.setdefault("up_skipped", False)
+    recorder = EventRecorder(stack_name, on_step=on_step)
+
+    try:
+        with checkout(
+            stack_name, _project_name(), lambda: _inline_program(resources)
+        ) as stack:
+            if targets is not None:
+                return _up_targeted(
+                    stack, stack_name, resources, targets, mode, stats, recorder
+                )
+            return _up_full(
+                stack,
+                stack_name,
+                resources,
+                last_fingerprint,
+                mode,
+                drift_check,
+                stats,
+                recorder,
+            )
+    finally:
+        stats["events"] = recorder.summary()
+        log_summary(recorder)
+
+
+def up_project(
+    project_id: str, resources: List[Any], last_fingerprint: str | None = None
+) -> Dict[str, Any]:
+    """Refreshes and updates the project's monolithic stack."""
+    return up_stack(project_stack_name(project_id), resources, last_fingerprint)
+
+
+def project_stacks(project_id: str) -> List[str]:
+    """Names of every existing stack of the project, monolithic or partitioned."""
+    prefix = f"cmp-cloud-project-{project_id}-"
+    return [
+        s.name
+        for s in workspace(_project_name()).list_stacks()
+        if s.name.startswith(prefix) and s.name.endswith("-stack")
+    ]
+
+
+def _urn_type_and_name(urn: str) -> tuple[str, str]:
+    # urn:pulumi:<stack>::<project>::<parent$type>::<name>
+    parts = urn.split("::")
+    return parts[2].split("$")[-1], parts[3]
+
+
+def _move_urn(urn: str, old_name: str, new_name: str) -> str:
+    """The URN a resource of stack `old_name` gets in stack `new_name`."""
+    prefix = f"urn:pulumi:{old_name}::"
+    if not urn.startswith(prefix):
+        return urn
+    urn = f"urn:pulumi:{new_name}::{urn[len(prefix):]}"
+    # the root stack resource is named "<project>-<stack>" as well
+    root = f"::pulumi:pulumi:Stack::{_project_name()}-"
+    if urn.endswith(f"{root}{old_name}"):
+        urn = urn[: -len(f"{root}{old_name}")] + f"{root}{new_name}"
+    return urn
+
+
+def _move_resource(res: Dict[str, Any], old_name: str, new_name: str) -> Dict[str, Any]:
+    """
+    Copy of an exported resource with the URNs it holds moved to another
+    stack. Only the fields that reference resources are rewritten; inputs
+    and outputs are left exactly as exported.
+    """
+    moved = dict(res)
+    for field in ("urn", "parent", "deletedWith"):
+        if moved.get(field):
+            moved[field] = _move_urn(moved[field], old_name, new_name)
+    if moved.get("provider"):
+        # "<provider urn>::<provider id>"
+        urn, sep, id_ = moved["provider"].rpartition("::")
+        moved["provider"] = f"{_move_urn(urn, old_name, new_name)}{sep}{id_}"
+    if moved.get("dependencies"):
+        moved["dependencies"] = [
+            _move_urn(urn, old_name, new_name) for urn in moved["dependencies"]
+        ]
+    if moved.get("propertyDependencies"):
+        moved["propertyDependencies"] = {
+            prop: [_move_urn(urn, old_name, new_name) for urn in urns]
+            for prop, urns in moved["propertyDependencies"].items()
+        }
+    return moved
+
+
+def migrate_to_partitioned_stacks(project_id: str, resources: List[Any]) -> List[str]:
+    """
+    Moves the state of the project's monolithic stack into its
+    (provider, region) partition stacks, then removes the monolithic stack.
+
+    Each resource in the exported state is assigned to the partition of the
+    Resource that declared it (see `register_provider(pulumi_resources=...)`);
+    provider resources are copied into every partition that references them.
+    Nothing is touched if any resource can't be assigned, so the old stack
+    stays usable. The old stack is removed only after every partition has
+    been imported; until then it stays authoritative, so an interrupted move
+    is simply redone by the next call. Returns the names of the partition
+    stacks written.
+    """
+    old_name = project_stack_name(project_id)
+    ws = workspace(_project_name())
+    if old_name not in {s.name for s in ws.list_stacks()}:
+        return []
+
+    _ensure_cloud_env()
+    exported = ws.export_stack(old_name)
+    deployment = dict(exported.deployment or {})
+    if deployment.get("pending_operations"):
+        raise RuntimeError(f"stack {old_name} has pending operations; not migrating")
+
+    owner: Dict[tuple[str, str], str] = {}
+    for r in resources:
+        provider = getattr(r.provider, "value", r.provider)
+        target = partition_stack_name(project_id, provider, r.region or "")
+        for key in pulumi_resources(provider, r.name, r.region or ""):
+            owner[key] = target
+
+    roots, providers, unowned = [], {}, []
+    partitions: Dict[str, List[Dict[str, Any]]] = {}
+    for res in deployment.get("resources") or []:
+        type_, name = _urn_type_and_name(res["urn"])
+        if type_ == "pulumi:pulumi:Stack":
+            roots.append(res)
+        elif type_.startswith("pulumi:providers:"):
+            providers[f"{res['urn']}::{res.get('id')}"] = res
+        elif (type_, name) in owner:
+            partitions.setdefault(owner[(type_, name)], []).append(res)
+        else:
+            unowned.append(res["urn"])
+    if unowned:
+        raise RuntimeError(
+            f"stack {old_name} holds resources no partition claims: {unowned}"
+        )
+
+    for new_name, members in partitions.items():
+        used = [
+            providers[ref]
+            for ref in {m.get("provider") for m in members}
+            if ref in providers
+        ]
+        with checkout(new_name, _project_name(), lambda: None) as new_stack:
+            # keep the target stack's own secrets provider; exported secrets
+            # are plaintext and get re-encrypted on import. Importing
+            # replaces whatever an interrupted earlier move left there.
+            current = dict(new_stack.export_stack().deployment or {})
+            moved = {
+                **deployment,
+                "resources": [
+                    _move_resource(res, old_name, new_name)
+                    for res in roots + used + members
+                ],
+            }
+            moved.pop("secrets_providers", None)
+            if current.get("secrets_providers"):
+                moved["secrets_providers"] = current["secrets_providers"]
+            new_stack.import_stack(
+                Deployment(version=exported.version, deployment=moved)
+            )
+        print(f"⇢ moved {len(members)} resources from {old_name} to {new_name}")
+
+    # every partition holds its resources now; --force drops the old stack's
+    # state without deleting the cloud resources it still lists
+    ws.remove_stack(old_name, force=True)
+    evict(old_name)
+    return list(partitions)
+
+
+def destroy_project(project_id: str) -> None:
+    """
+    Tear down ALL resources in every stack of this project.
+    """
+    _ensure_cloud_env()
+
+    for stack_name in project_stacks(project_id) or [project_stack_name(project_id)]:
+        # no‐op program for destroy
+        recorder = EventRecorder(stack_name)
+        try:
+            with checkout(stack_name, _project_name(), lambda: None) as stack:
+                stack.destroy(on_event=recorder.on("destroy"))
+        finally:
+            log_summary(recorder)
@@ -0,0 +1,150 @@
+# cmp_core/lib/pulumi_workspaces.py
+"""
+Per-process pool of warm Pulumi stacks.
+
+`create_or_select_stack` builds a new LocalWorkspace on every call: a temp
+work dir with Pulumi.yaml, a `pulumi version` check and a `stack select`.
+The pool keeps each selected Stack, with its workspace, keyed by stack name,
+so repeated reconciles of a project only pay for the engine run itself.
+
+A stack is checked out exclusively, so two threads never drive the same
+workspace. If an operation raises, the stack is dropped instead of being
+returned. Idle stacks are evicted least-recently-used beyond
+PULUMI_WORKSPACE_POOL_SIZE and are health-checked before reuse.
+"""
+import importlib.metadata
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from cmp_core.core.config import settings
+from pulumi.automation import (
+    LocalWorkspace,
+    LocalWorkspaceOptions,
+    ProjectSettings,
+    PulumiCommand,
+    Stack,
+    create_or_select_stack,
+)
+
+logger = logging.getLogger(__name__)
+
+# Python packages whose resource plugins reconciles need, by plugin name
+PROVIDER_PACKAGES = {"aws": "pulumi-aws", "azure-native": "pulumi-azure-native"}
+
+_lock = threading.Lock()
+# stack name -> (stack, last returned at)
+_idle: "OrderedDict[str, tuple[Stack, float]]" = OrderedDict()
+_command: Optional[PulumiCommand] = None
+
+
+def pulumi_command() -> PulumiCommand:
+    """One PulumiCommand per process, so the CLI version check runs once."""
+    global _command
+    with _lock:
+        if _command is None:
+            _command = PulumiCommand()
+        return _command
+
+
+def workspace(project_name: str) -> LocalWorkspace:
+    """A bare workspace for project-level operations (listing, import/export)."""
+    return LocalWorkspace(
+        project_settings=ProjectSettings(name=project_name, runtime="python"),
+        pulumi_command=pulumi_command(),
+    )
+
+
+def _discard(stack: Stack) -> None:
+    shutil.rmtree(stack.workspace.work_dir, ignore_errors=True)
+
+
+def _healthy(stack: Stack, returned_at: float) -> bool:
+    if time.monotonic() - returned_at > settings.pulumi_workspace_max_idle_seconds:
+        return False
+    work_dir = stack.workspace.work_dir
+    return os.path.isfile(os.path.join(work_dir, "Pulumi.yaml"))
+
+
+@contextmanager
+def checkout(
+    stack_name: str, project_name: str, program: Callable[[], None]
+) -> Iterator[Stack]:
+    """
+    Yields a warm stack for `stack_name` that runs `program`, creating one if
+    the pool has none. The stack goes back to the pool when the block exits
+    cleanly and is discarded if it raises.
+    """
+    stack = None
+    with _lock:
+        entry = _idle.pop(stack_name, None)
+    if entry is not None:
+        if _healthy(*entry):
+            stack = entry[0]
+        else:
+            logger.info(f"Dropping stale Pulumi workspace for {stack_name}")
+            _discard(entry[0])
+    if stack is None:
+        stack = create_or_select_stack(
+            stack_name=stack_name,
+            project_name=project_name,
+            program=program,
+            opts=LocalWorkspaceOptions(pulumi_command=pulumi_command()),
+        )
+    stack.workspace.program = program
+
+    try:
+        yield stack
+    except BaseException:
+        _discard(stack)
+        raise
+
+    evicted = []
+    with _lock:
+        previous = _idle.pop(stack_name, None)
+        _idle[stack_name] = (stack, time.monotonic())
+        while len(_idle) > settings.pulumi_workspace_pool_size:
+            evicted.append(_idle.popitem(last=False)[1][0])
+    if previous is not None:
+        evicted.append(previous[0])
+    for old in evicted:
+        _discard(old)
+
+
+def evict(stack_name: str) -> None:
+    """Drops the pooled workspace of a stack, e.g. after the stack was removed."""
+    with _lock:
+        entry = _idle.pop(stack_name, None)
+    if entry is not None:
+        _discard(entry[0])
+
+
+def clear() -> None:
+    with _lock:
+        entries = list(_idle.values())
+        _idle.clear()
+    for stack, _ in entries:
+        _discard(stack)
+
+
+def preload_plugins() -> None:
+    """
+    Installs the resource plugins matching the installed provider packages,
+    so the first reconcile on a fresh worker doesn't download them mid-run.
+    """
+    ws = LocalWorkspace(pulumi_command=pulumi_command())
+    try:
+        for plugin, package in PROVIDER_PACKAGES.items():
+            try:
+                version = importlib.metadata.version(package)
+            except importlib.metadata.PackageNotFoundError:
+                continue
+            ws.install_plugin(plugin, f"v{version}")
+            logger.info(f"Pulumi plugin {plugin} v{version} ready")
+    finally:
+        shutil.rmtree(ws.work_dir, ignore_errors=True)
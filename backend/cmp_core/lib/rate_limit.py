@@ -0,0 +1,211 @@
+# cmp_core/lib/rate_limit.py
+"""
+Cloud API token buckets shared by the API and every Celery worker.
+
+One bucket per (provider, account or subscription, region, API family),
+kept as a Redis hash `cmp:ratelimit:{provider}:{account}:{region}:{family}`
+and refilled at the rate CLOUD_RATE_LIMITS gives its provider and family.
+`call()` takes a token before each cloud call. A caller short of a token
+reserves the next one and sleeps until it is due, so waiting callers are
+served in order without polling Redis. A wait longer than
+CLOUD_RATE_LIMIT_MAX_WAIT_SECONDS is not reserved: the caller sleeps that
+long and goes ahead anyway.
+
+Throttle responses (AWS RequestLimitExceeded and friends, ARM 429) halve the
+bucket's rate for everyone (down to 1/16) and empty it; the rate then
+recovers linearly to full over RECOVERY_SECONDS. The throttled call is
+retried after an exponential, jittered backoff (at least the Retry-After ARM
+sent), up to CLOUD_THROTTLE_RETRIES times, so that a burst of throttling
+does not surface as an ERROR_* state.
+
+ARM limits apply per subscription, so Azure buckets use region "global".
+Pulumi's own calls go through its provider plugins and are not limited here.
+
+Without REDIS_CACHE_URL (or if Redis fails) calls are not limited; throttled
+calls are still retried.
+"""
+
+import logging
+import random
+import time
+from typing import Callable, NamedTuple, TypeVar
+
+from azure.core.exceptions import HttpResponseError
+from botocore.exceptions import ClientError
+from cmp_core.core.config import settings
+from cmp_core.core.redis import get_redis
+from cmp_core.lib import cloud_clients, metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+READ = "read"
+WRITE = "write"
+
+# seconds for a halved rate to climb back to full
+RECOVERY_SECONDS = 60
+MIN_FACTOR = 1 / 16
+MAX_BACKOFF_SECONDS = 30.0
+
+AWS_THROTTLE_CODES = {
+    "RequestLimitExceeded",
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "RequestThrottled",
+    "RequestThrottledException",
+}
+
+# KEYS: bucket | ARGV: now, rate, burst, max wait, recovery seconds
+# -> seconds to wait before the call; 0 if a token was free, -wait if the
+#    wait is over the limit and nothing was reserved
+_ACQUIRE = """
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'factor')
+local now, rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+local factor = tonumber(b[3]) or 1
+local elapsed = math.max(0, now - ts)
+factor = math.min(1, factor + elapsed / tonumber(ARGV[5]))
+tokens = math.min(burst, tokens + elapsed * rate * factor)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / (rate * factor)
+    if wait > tonumber(ARGV[4]) then
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now, 'factor', factor)
+        redis.call('EXPIRE', KEYS[1], 3600)
+        return tostring(-wait)
+    end
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'ts', now, 'factor', factor)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+# KEYS: bucket | ARGV: now, min factor
+_THROTTLED = """
+local factor = tonumber(redis.call('HGET', KEYS[1], 'factor')) or 1
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens')) or 0
+factor = math.max(tonumber(ARGV[2]), factor / 2)
+redis.call('HSET', KEYS[1], 'tokens', math.min(tokens, 0), 'ts', ARGV[1], 'factor', factor)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(factor)
+"""
+
+
+class Bucket(NamedTuple):
+    provider: str
+    account: str
+    region: str
+    family: str
+
+    def key(self) -> str:
+        return "cmp:ratelimit:" + ":".join(self)
+
+
+def aws(region: str, family: str) -> Bucket:
+    return Bucket("aws", cloud_clients.aws_identity(), region or "default", family)
+
+
+def azure(subscription_id: str, family: str) -> Bucket:
+    return Bucket("azure", subscription_id, "global", family)
+
+
+def _limits(bucket: Bucket) -> tuple[float, float]:
+    rate, burst = settings.cloud_rate_limits[f"{bucket.provider}.{bucket.family}"]
+    return float(rate), float(burst)
+
+
+def acquire(bucket: Bucket) -> float:
+    """Takes a token, sleeping until one is due. Returns the seconds waited."""
+    r = get_redis()
+    if r is None:
+        return 0.0
+    max_wait = settings.cloud_rate_limit_max_wait_seconds
+    try:
+        wait = float(
+            r.eval(
+                _ACQUIRE,
+                1,
+                bucket.key(),
+                time.time(),
+                *_limits(bucket),
+                max_wait,
+                RECOVERY_SECONDS,
+            )
+        )
+    except Exception as e:
+        logger.debug(f"rate limit {bucket.key()} not applied: {e}")
+        return 0.0
+    if wait < 0:
+        logger.warning(
+            f"Cloud API bucket {bucket.key()} is {-wait:.0f}s behind; "
+            f"calling after {max_wait:.0f}s without a token."
+        )
+        metrics.incr(
+            "cloud_rate_limit_overrun_total",
+            provider=bucket.provider,
+            family=bucket.family,
+        )
+        wait = max_wait
+    if wait > 0:
+        time.sleep(wait)
+        metrics.observe(
+            "cloud_rate_limit_wait_seconds",
+            wait,
+            provider=bucket.provider,
+            family=bucket.family,
+        )
+    return wait
+
+
+def throttle_delay(error: Exception) -> float | None:
+    """Back-off the provider asked for (0 if unspecified); None if not a throttle."""
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code")
+        return 0.0 if code in AWS_THROTTLE_CODES else None
+    if isinstance(error, HttpResponseError) and error.status_code == 429:
+        try:
+            return float(error.response.headers.get("Retry-After", 0))
+        except (AttributeError, TypeError, ValueError):
+            return 0.0
+    return None
+
+
+def throttled(bucket: Bucket) -> None:
+    """Reports a throttle response: halves the bucket's rate and empties it."""
+    metrics.incr(
+        "cloud_throttled_total", provider=bucket.provider, family=bucket.family
+    )
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        factor = float(r.eval(_THROTTLED, 1, bucket.key(), time.time(), MIN_FACTOR))
+        logger.info(f"Cloud API throttled on {bucket.key()}; rate now x{factor:.2f}.")
+    except Exception as e:
+        logger.debug(f"throttle on {bucket.key()} not recorded: {e}")
+
+
+def call(bucket: Bucket, fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Runs fn(*args, **kwargs) as one call against `bucket`, retrying throttled
+    calls with backoff. Lazy pagers are wrapped in a function that drains
+    them (`lambda: list(client.x.list_all())`) so a throttle on any page is
+    retried too; the listing takes one token.
+    """
+    retries = settings.cloud_throttle_retries
+    for attempt in range(retries + 1):
+        acquire(bucket)
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            retry_after = throttle_delay(e)
+            if retry_after is None:
+                raise
+            throttled(bucket)
+            if attempt == retries:
+                raise
+            backoff = min(MAX_BACKOFF_SECONDS, 2**attempt) * (0.5 + random.random())
+            time.sleep(max(retry_after, backoff))
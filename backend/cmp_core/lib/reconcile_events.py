@@ -0,0 +1,208 @@
+# cmp_core/lib/reconcile_events.py
+"""
+Live reconcile progress, from the worker to SSE clients.
+
+The worker `publish`es small JSON events per project: the run starting and
+finishing, per-resource Pulumi engine steps, and resource state transitions.
+Each event gets a per-project sequence id and is, in one Lua call:
+  * appended to a capped list `cmp:reconcile:{pid}:history` (the replay
+    buffer a reconnecting client resumes from via Last-Event-ID), and
+  * published on `cmp:reconcile:{pid}:events`.
+
+On the API side one `ReconcileEventHub` per process holds a single pattern
+subscription and fans events out to a bounded queue per connected client. A
+client that does not keep up is not allowed to stall the hub or grow its
+queue: its backlog is dropped and it catches up from the replay buffer, or is
+told to `reset` (re-list resources) if the buffer has moved past it.
+
+Publishing is best effort: without REDIS_CACHE_URL, or if Redis fails, events
+are only logged at debug level.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from cmp_core.core.config import settings
+from cmp_core.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+_CHANNEL_PATTERN = "cmp:reconcile:*:events"
+
+# how long subscribe() waits for the pattern subscription to be confirmed
+SUBSCRIBE_TIMEOUT_SECONDS = 5
+
+# KEYS: seq, history, channel | ARGV: event JSON object without id, history
+# size, history ttl -> the event's id
+_PUBLISH = """
+local id = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+local event = '{"id":' .. id .. ',' .. string.sub(ARGV[1], 2)
+redis.call('RPUSH', KEYS[2], event)
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('PUBLISH', KEYS[3], event)
+return id
+"""
+
+
+def _seq_key(project_id: str) -> str:
+    return f"cmp:reconcile:{project_id}:seq"
+
+
+def _history_key(project_id: str) -> str:
+    return f"cmp:reconcile:{project_id}:history"
+
+
+def _channel(project_id: str) -> str:
+    return f"cmp:reconcile:{project_id}:events"
+
+
+def publish(project_id: str, kind: str, **data: Any) -> None:
+    """
+    Publishes a `kind` event (reconcile, stack, step, state) for the project.
+    Values must be JSON serialisable; enums and UUIDs go through str().
+    """
+    r = get_redis()
+    if r is None:
+        logger.debug(f"reconcile event {kind} for {project_id}: {data}")
+        return
+    body = json.dumps({"type": kind, **data}, default=str)
+    try:
+        r.eval(
+            _PUBLISH,
+            3,
+            _seq_key(project_id),
+            _history_key(project_id),
+            _channel(project_id),
+            body,
+            settings.reconcile_stream_history_size,
+            settings.reconcile_stream_history_ttl_seconds,
+        )
+    except Exception as e:
+        logger.debug(f"reconcile event {kind} for {project_id} not published: {e}")
+
+
+class Subscription:
+    """One client's bounded view of a project's events."""
+
+    def __init__(self, project_id: str) -> None:
+        self.project_id = project_id
+        # events, or None to wake the reader after its backlog was dropped
+        self.queue: asyncio.Queue[Optional[Dict[str, Any]]] = asyncio.Queue(
+            maxsize=settings.reconcile_stream_queue_size
+        )
+        # set when events were dropped; the reader resyncs from history
+        self.lagged = False
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.mark_lagged()
+
+    def mark_lagged(self) -> None:
+        self.lagged = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ReconcileEventHub:
+    """
+    Per-process fan-out of the reconcile channels. The pattern subscription
+    is opened with the first client and reconnects on Redis errors; clients
+    connected during an outage are marked lagged so they resync.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: Dict[str, set[Subscription]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._client = None
+        # set while Redis has confirmed the pattern subscription
+        self._live = asyncio.Event()
+
+    def _redis(self):
+        if self._client is None and settings.redis_cache_url:
+            import redis.asyncio as aioredis
+
+            self._client = aioredis.Redis.from_url(
+                settings.redis_cache_url, decode_responses=True
+            )
+        return self._client
+
+    @property
+    def available(self) -> bool:
+        return self._redis() is not None
+
+    async def subscribe(self, project_id: str) -> Subscription:
+        """
+        Registers a client and returns once the pattern subscription is live,
+        so every event published afterwards reaches its queue. If that takes
+        longer than SUBSCRIBE_TIMEOUT_SECONDS the client starts out lagged.
+        """
+        sub = Subscription(project_id)
+        self._subscribers.setdefault(project_id, set()).add(sub)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self._live.wait(), SUBSCRIBE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            sub.mark_lagged()
+        except asyncio.CancelledError:
+            self.unsubscribe(sub)
+            raise
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subscribers.get(sub.project_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.project_id]
+
+    async def latest_id(self, project_id: str) -> int:
+        """Id of the last event published for the project (0 if none is known)."""
+        return int(await self._redis().get(_seq_key(project_id)) or 0)
+
+    async def history(self, project_id: str, after_id: int) -> List[Dict[str, Any]]:
+        """Buffered events with an id above `after_id`, oldest first."""
+        raw = await self._redis().lrange(_history_key(project_id), 0, -1)
+        events = [json.loads(item) for item in raw]
+        return [e for e in events if e["id"] > after_id]
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._redis().pubsub()
+            try:
+                await pubsub.psubscribe(_CHANNEL_PATTERN)
+                async for message in pubsub.listen():
+                    if message["type"] == "psubscribe":
+                        self._live.set()
+                    if message["type"] != "pmessage":
+                        continue
+                    project_id = message["channel"].split(":")[2]
+                    subs = self._subscribers.get(project_id)
+                    if not subs:
+                        continue
+                    event = json.loads(message["data"])
+                    for sub in list(subs):
+                        sub.offer(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Reconcile event subscription lost: {e}")
+                for subs in self._subscribers.values():
+                    for sub in subs:
+                        sub.mark_lagged()
+                await asyncio.sleep(1)
+            finally:
+                self._live.clear()
+                await pubsub.aclose()
+
+
+hub = ReconcileEventHub()
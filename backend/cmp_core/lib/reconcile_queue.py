@@ -0,0 +1,181 @@
+# cmp_core/lib/reconcile_queue.py
+"""
+Redis-backed coalescing of reconcile_project runs.
+
+Per project we keep two keys:
+  * pending – a reconcile has been requested and not started yet
+  * running – a reconcile is in progress
+
+At most one reconcile per project is queued and one is running. Requests that
+arrive while one is queued are dropped unless they are due sooner (a create
+behind a jittered routine run): those move the due time up and are
+dispatched, and the later task then finds nothing queued and runs as an
+ordinary reconcile. Requests that arrive while one runs collapse into a
+single follow-up run dispatched when it finishes, at the earliest due time.
+Each transition is a Lua script, so the checks and updates are atomic.
+
+The pending marker holds the time the run is due (the request time, or later
+for a delayed request), which gives how far the oldest queued reconcile is
+behind (the queue lag, see queue_status()).
+
+Without REDIS_CACHE_URL (or if Redis is unreachable) every request is
+dispatched, which is the old behaviour.
+"""
+
+import logging
+import time
+
+from cmp_core.core.config import settings
+from cmp_core.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS: pending, running | ARGV: time the run is due, pending ttl
+# -> 1 if the caller must dispatch a reconcile now
+_REQUEST = """
+local queued = tonumber(redis.call('GET', KEYS[1]))
+if queued and queued <= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return 1
+end
+return 0
+"""
+
+# KEYS: pending, running | ARGV: now, pending ttl, running ttl
+# -> 1 if the caller may run; 0 if another run is in progress (a follow-up is
+#    then recorded so the running one re-dispatches when it finishes)
+_BEGIN = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2])
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[3])
+redis.call('DEL', KEYS[1])
+return 1
+"""
+
+# KEYS: pending, running
+# -> due time of the follow-up if requests arrived during the run, else nil
+_FINISH = """
+redis.call('DEL', KEYS[2])
+return redis.call('GET', KEYS[1])
+"""
+
+
+def _keys(project_id: str) -> list[str]:
+    prefix = f"cmp:reconcile:{project_id}"
+    return [f"{prefix}:pending", f"{prefix}:running"]
+
+
+def request_reconcile(project_id: str, delay: float = 0) -> bool:
+    """
+    Records a reconcile request due in `delay` seconds. Returns True if a task
+    must be dispatched.
+    """
+    r = get_redis()
+    if r is None:
+        return True
+    try:
+        return bool(
+            r.eval(
+                _REQUEST,
+                2,
+                *_keys(project_id),
+                time.time() + delay,
+                settings.reconcile_pending_ttl_seconds,
+            )
+        )
+    except Exception as e:
+        logger.warning(f"Reconcile coalescing unavailable ({e}); dispatching anyway.")
+        return True
+
+
+def withdraw_request(project_id: str) -> None:
+    """Drops the queued marker of a request whose task could not be dispatched."""
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        r.delete(_keys(project_id)[0])
+    except Exception as e:
+        logger.warning(f"Could not withdraw reconcile request for {project_id}: {e}")
+
+
+def begin_reconcile(project_id: str) -> bool:
+    """Marks a run as started. Returns False if another run is in progress."""
+    r = get_redis()
+    if r is None:
+        return True
+    try:
+        return bool(
+            r.eval(
+                _BEGIN,
+                2,
+                *_keys(project_id),
+                time.time(),
+                settings.reconcile_pending_ttl_seconds,
+                settings.reconcile_running_ttl_seconds,
+            )
+        )
+    except Exception as e:
+        logger.warning(f"Reconcile coalescing unavailable ({e}); running anyway.")
+        return True
+
+
+def finish_reconcile(project_id: str) -> float | None:
+    """
+    Marks a run as finished. Returns the time a follow-up is due if one must
+    be dispatched, else None.
+    """
+    r = get_redis()
+    if r is None:
+        return None
+    try:
+        due_at = r.eval(_FINISH, 2, *_keys(project_id))
+    except Exception as e:
+        logger.warning(f"Reconcile coalescing unavailable ({e}).")
+        return None
+    return float(due_at) if due_at is not None else None
+
+
+def touch_running(project_id: str) -> None:
+    """Extends the running marker while a long reconcile is still alive."""
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        r.expire(_keys(project_id)[1], settings.reconcile_running_ttl_seconds)
+    except Exception as e:
+        logger.warning(f"Could not extend running marker for {project_id}: {e}")
+
+
+def queue_status(project_ids: list[str]) -> tuple[dict[str, float], set[str]] | None:
+    """
+    Returns ({project id: time its queued reconcile is due}, {project ids
+    with a reconcile running}), or None without Redis.
+    """
+    r = get_redis()
+    if r is None:
+        return None
+    try:
+        pipe = r.pipeline(transaction=False)
+        for project_id in project_ids:
+            pending, running = _keys(project_id)
+            pipe.get(pending)
+            pipe.exists(running)
+        replies = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Reconcile queue status unavailable: {e}")
+        return None
+    queued, running = {}, set()
+    for project_id, requested_at, is_running in zip(
+        project_ids, replies[::2], replies[1::2]
+    ):
+        if requested_at is not None:
+            queued[project_id] = float(requested_at)
+        if is_running:
+            running.add(project_id)
+    return queued, running
@@ -0,0 +1,113 @@
+# cmp_core/lib/reconcile_schedule.py
+"""
+Planning of the periodic reconcile cycle run by reconcile_all_projects.
+
+Every RECONCILE_SCHEDULE_INTERVAL_SECONDS the cycle looks at each project's
+last run (start, end, duration, last drift found; kept on the projects row)
+and at the reconcile queue (lib/reconcile_queue):
+
+  * projects with a reconcile queued or running are skipped, so a slow cycle
+    never stacks a second run behind the first;
+  * projects with pending changes go first, then those whose last run found
+    drift, then the rest, least recently reconciled first;
+  * the queue lag (how long the oldest queued reconcile is overdue)
+    stretches the cycle: with a lag of L a routine project is due again only
+    L seconds after its last start, at most RECONCILE_SCHEDULE_MAX_STRETCH - 1
+    intervals;
+  * routine runs are spread over the interval with jittered countdowns
+    instead of all being queued at the same instant.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from cmp_core.core.config import settings
+
+# dispatch order
+PRIORITY_PENDING = "pending"
+PRIORITY_DRIFT = "drift"
+PRIORITY_ROUTINE = "routine"
+_ORDER = (PRIORITY_PENDING, PRIORITY_DRIFT, PRIORITY_ROUTINE)
+
+
+class ProjectRun(NamedTuple):
+    project_id: str
+    started_at: datetime | None
+    finished_at: datetime | None
+    seconds: float | None
+    drift_at: datetime | None
+    has_pending: bool
+
+
+class Plan(NamedTuple):
+    # (project id, countdown seconds, priority) in dispatch order
+    dispatch: list[tuple[str, float, str]]
+    queued: int
+    running: int
+    lag_seconds: float
+    stretch: float
+
+
+def stretch_for(lag_seconds: float) -> float:
+    """Factor by which the routine interval is stretched for a queue lag."""
+    interval = settings.reconcile_schedule_interval_seconds
+    return min(settings.reconcile_schedule_max_stretch, 1 + lag_seconds / interval)
+
+
+def _running_per_db(run: ProjectRun, now: datetime) -> bool:
+    """Fallback without Redis: a start newer than the last finish and not stale."""
+    if run.started_at is None:
+        return False
+    if run.finished_at is not None and run.finished_at >= run.started_at:
+        return False
+    ttl = timedelta(seconds=settings.reconcile_running_ttl_seconds)
+    return now - run.started_at < ttl
+
+
+def plan_cycle(
+    runs: list[ProjectRun],
+    status: tuple[dict[str, float], set[str]] | None,
+    now: datetime,
+) -> Plan:
+    """Decides which projects to reconcile this cycle, in which order and when."""
+    queued, running = status if status is not None else ({}, set())
+    if status is None:
+        running = {run.project_id for run in runs if _running_per_db(run, now)}
+    lag = max([0.0, *(now.timestamp() - due_at for due_at in queued.values())])
+    stretch = stretch_for(lag)
+
+    interval = settings.reconcile_schedule_interval_seconds
+    routine_after = timedelta(seconds=(stretch - 1) * interval)
+    drift_window = timedelta(minutes=settings.reconcile_drift_check_interval_minutes)
+    never = datetime.min.replace(tzinfo=now.tzinfo)
+
+    due: dict[str, list[ProjectRun]] = {p: [] for p in _ORDER}
+    for run in runs:
+        if run.project_id in queued or run.project_id in running:
+            continue
+        if run.has_pending:
+            due[PRIORITY_PENDING].append(run)
+        elif run.drift_at is not None and now - run.drift_at < drift_window:
+            due[PRIORITY_DRIFT].append(run)
+        elif run.started_at is None or now - run.started_at >= routine_after:
+            due[PRIORITY_ROUTINE].append(run)
+
+    dispatch = []
+    for priority in _ORDER:
+        ordered = sorted(due[priority], key=lambda run: run.started_at or never)
+        for i, run in enumerate(ordered):
+            if priority == PRIORITY_ROUTINE:
+                # one jittered slot per project across the interval, oldest first
+                countdown = interval * (i + random.random()) / len(ordered)
+            else:
+                countdown = 0.0
+            dispatch.append((run.project_id, countdown, priority))
+
+    return Plan(
+        dispatch=dispatch,
+        queued=len(queued),
+        running=len(running),
+        lag_seconds=lag,
+        stretch=stretch,
+    )
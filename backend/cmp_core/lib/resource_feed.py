@@ -0,0 +1,148 @@
+# cmp_core/lib/resource_feed.py
+"""
+Push feed of committed resource state changes.
+
+The `resources_state_notify` trigger NOTIFYs every state change on the
+`resource_state` channel with the resource id, project id, name, provider,
+new state and `state_version`. Postgres delivers it when the writing
+transaction commits, whichever process made the change (API, reconcile,
+power tasks).
+
+Each API process keeps one LISTEN connection (`feed`) and hands the changes
+to a bounded queue per subscriber, filtered by the subscriber's projects. A
+subscriber that falls behind, or that was connected while the LISTEN
+connection was being re-established, has its backlog replaced by a single
+`resync` message; it should re-list and continue from the versions it gets.
+
+`watch` parks a single request on one resource instead (long-poll GETs): its
+event is set by the first change that satisfies the caller's predicate, and
+by every reconnect, after which the caller re-reads the row.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, Optional, Set
+
+import asyncpg
+from cmp_core.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "resource_state"
+# how often the idle LISTEN connection is checked
+KEEPALIVE_SECONDS = 30
+
+RESYNC = {"type": "resync"}
+
+
+class FeedSubscription:
+    def __init__(self, project_ids: Set[str]) -> None:
+        self.project_ids = project_ids
+        self.queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(
+            maxsize=settings.resource_feed_queue_size
+        )
+        self._lagged = False
+
+    def offer(self, change: Dict[str, Any]) -> None:
+        if change["project_id"] not in self.project_ids:
+            return
+        if self._lagged and not self.queue.empty():
+            return  # the resync message is still waiting to be read
+        self._lagged = False
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            self.resync()
+
+    def resync(self) -> None:
+        self._lagged = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(RESYNC)
+
+
+class Watch:
+    def __init__(
+        self, project_id: str, name: str, until: Callable[[Dict[str, Any]], bool]
+    ) -> None:
+        self.key = (project_id, name)
+        self.until = until
+        self.event = asyncio.Event()
+
+
+class ResourceStateFeed:
+    """One LISTEN connection per process, opened with the first subscriber."""
+
+    def __init__(self) -> None:
+        self._subscribers: Set[FeedSubscription] = set()
+        self._watches: Dict[tuple[str, str], Set[Watch]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_listening(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    def subscribe(self, project_ids: Set[str]) -> FeedSubscription:
+        sub = FeedSubscription(project_ids)
+        self._subscribers.add(sub)
+        self._ensure_listening()
+        return sub
+
+    def unsubscribe(self, sub: FeedSubscription) -> None:
+        self._subscribers.discard(sub)
+
+    def watch(
+        self, project_id: str, name: str, until: Callable[[Dict[str, Any]], bool]
+    ) -> Watch:
+        """Watches one resource (by project and name) for a change `until` accepts."""
+        w = Watch(project_id, name, until)
+        self._watches.setdefault(w.key, set()).add(w)
+        self._ensure_listening()
+        return w
+
+    def unwatch(self, w: Watch) -> None:
+        watches = self._watches.get(w.key)
+        if watches is not None:
+            watches.discard(w)
+            if not watches:
+                del self._watches[w.key]
+
+    def _notify(self, connection, pid, channel: str, payload: str) -> None:
+        change = {"type": "state", **json.loads(payload)}
+        for sub in list(self._subscribers):
+            sub.offer(change)
+        for w in self._watches.get((change["project_id"], change["name"]), ()):
+            if w.until(change):
+                w.event.set()
+
+    async def _listen(self) -> None:
+        dsn = settings.database_url.replace("+asyncpg", "")
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(dsn)
+                await conn.add_listener(CHANNEL, self._notify)
+                if connected_before:
+                    # changes committed while we were away were not delivered
+                    for sub in list(self._subscribers):
+                        sub.resync()
+                    for watches in self._watches.values():
+                        for w in watches:
+                            w.event.set()
+                connected_before = True
+                while True:
+                    await asyncio.sleep(KEEPALIVE_SECONDS)
+                    await conn.fetchval("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Resource state LISTEN connection lost: {e}")
+                await asyncio.sleep(1)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+
+feed = ResourceStateFeed()
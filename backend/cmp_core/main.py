@@ -5,7 +5,9 @@ from cmp_core.api.v1.auth import router as auth_router
 from cmp_core.api.v1.azure import router as azure_vm_router
 from cmp_core.api.v1.ec2 import router as ec2_router
 from cmp_core.api.v1.members import router as members_router
+from cmp_core.api.v1.metrics import router as metrics_router
 from cmp_core.api.v1.projects import router as projects_router
+from cmp_core.api.v1.resources import router as resources_router
 from cmp_core.api.v1.users import router as users_router
 from cmp_core.core.config import settings
 from cmp_core.core.db import get_db
@@ -41,6 +43,8 @@ api_v1_router.include_router(members_router)
 api_v1_router.include_router(ec2_router)
 api_v1_router.include_router(audit_router)
 api_v1_router.include_router(azure_vm_router)
+api_v1_router.include_router(metrics_router)
+api_v1_router.include_router(resources_router)
 
 # Register the main /api/v1 router with the app
 app.include_router(api_v1_router)
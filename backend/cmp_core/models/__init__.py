@@ -1,8 +1,11 @@
 # app/models/__init__.py
 from .audit import AuditEvent  # noqa: F401
+from .outbox import OutboxMessage  # noqa: F401
 from .project import Project  # noqa: F401
 from .project_member import ProjectMember  # noqa: F401
+from .pulumi_run import PulumiRun  # noqa: F401
 from .refresh_token import RefreshToken  # noqa: F401
 from .resource import Resource  # noqa: F401
 from .role import Role  # noqa: F401
+from .stack_state import StackState  # noqa: F401
 from .user import User  # noqa: F401
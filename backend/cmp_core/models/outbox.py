@@ -0,0 +1,18 @@
+from sqlalchemy import JSON, BigInteger, Column, Identity, String
+
+from .base import Base
+from .mixins import TimestampMixin
+
+
+class OutboxMessage(TimestampMixin, Base):
+    """
+    A Celery task written in the same transaction as the change that needs it;
+    cmp_core.outbox_relay publishes it once that transaction has committed.
+    """
+
+    __tablename__ = "task_outbox"
+    # publish order
+    id = Column(BigInteger, Identity(), primary_key=True)
+    task = Column(String(200), nullable=False)
+    args = Column(JSON, nullable=False, default=list)
+    kwargs = Column(JSON, nullable=False, default=dict)
@@ -1,13 +1,34 @@
-from sqlalchemy import Column, ForeignKey, String
+import enum
+
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, String
 from sqlalchemy.orm import relationship
 
 from .base import Base
 from .mixins import IdMixin, TimestampMixin
 
 
+class ReconcileMode(str, enum.Enum):
+    """How a reconcile combines Pulumi refresh and up; see up_stack()."""
+
+    refresh_then_up = "refresh_then_up"
+    up_with_refresh = "up_with_refresh"
+    scheduled_refresh = "scheduled_refresh"
+
+
 class Project(IdMixin, TimestampMixin, Base):
     name = Column(String(64), nullable=False)
     owner_id = Column(
         ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
     )
     owner = relationship("User", backref="owned_projects")
+    # highest reconcile lease token that committed; see lib/project_lock.py
+    reconcile_fence = Column(BigInteger, nullable=False, server_default="0")
+    reconcile_mode = Column(
+        String(32), nullable=False, server_default=ReconcileMode.refresh_then_up.value
+    )
+    # last reconcile run and the last one that found drift; used by
+    # reconcile_all_projects to skip, order and spread scheduled runs
+    last_reconcile_started_at = Column(DateTime(timezone=True), nullable=True)
+    last_reconcile_finished_at = Column(DateTime(timezone=True), nullable=True)
+    last_reconcile_seconds = Column(Float, nullable=True)
+    last_drift_at = Column(DateTime(timezone=True), nullable=True)
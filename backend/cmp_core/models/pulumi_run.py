@@ -0,0 +1,26 @@
+from sqlalchemy import JSON, Boolean, Column, DateTime, Float, ForeignKey, String, Text
+
+from .base import Base
+from .mixins import IdMixin
+
+
+class PulumiRun(IdMixin, Base):
+    """One refresh/up of a stack during a reconcile, with its phase timings."""
+
+    __tablename__ = "pulumi_runs"
+    project_id = Column(
+        ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    stack_name = Column(String(128), nullable=False)
+    mode = Column(String(32), nullable=False)
+    targeted = Column(Boolean, nullable=False, default=False)
+    started_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    # None when the phase did not run (e.g. no refresh in up_with_refresh)
+    refresh_seconds = Column(Float, nullable=True)
+    up_seconds = Column(Float, nullable=True)
+    total_seconds = Column(Float, nullable=False)
+    up_skipped = Column(Boolean, nullable=False, default=False)
+    succeeded = Column(Boolean, nullable=False)
+    error = Column(Text, nullable=True)
+    # EventRecorder.summary(): per-URN steps (op, duration, status, error)
+    events = Column(JSON, nullable=True)
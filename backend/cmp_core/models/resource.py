@@ -1,6 +1,16 @@
 import enum
 
-from sqlalchemy import JSON, Column, Enum, ForeignKey, Numeric, String, UniqueConstraint
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Column,
+    Enum,
+    FetchedValue,
+    ForeignKey,
+    Numeric,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.mutable import MutableDict
 
@@ -89,6 +99,11 @@ class Resource(IdMixin, TimestampMixin, Base):
         nullable=False,
         default=ResourceState.PENDING_PROVISION,  # Default still uses the enum member
     )
+    # bumped by the resources_state_notify trigger on every state change, which
+    # also NOTIFYs the change on the resource_state channel (see resource_feed)
+    state_version = Column(
+        BigInteger, nullable=False, server_default="0", server_onupdate=FetchedValue()
+    )
 
     cost_daily = Column(Numeric(12, 4), nullable=False, server_default="0")
     meta = Column(
@@ -104,6 +119,8 @@ class Resource(IdMixin, TimestampMixin, Base):
     __table_args__ = (
         UniqueConstraint("project_id", "name", name="uq_resources_project_name"),
     )
+    # read state_version back with RETURNING instead of expiring it on flush
+    __mapper_args__ = {"eager_defaults": True}
 
     def __repr__(self) -> str:
         return (
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, ForeignKey, String
+
+from .base import Base
+
+
+class StackState(Base):
+    """Bookkeeping for one Pulumi stack, used to decide when the IaC engine must run."""
+
+    __tablename__ = "stack_states"
+    stack_name = Column(String(128), primary_key=True)
+    project_id = Column(
+        ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    # last successful `pulumi up`; drives the periodic drift check
+    last_up_at = Column(DateTime(timezone=True), nullable=True)
+    # desired_fingerprint() of the program applied by that up
+    desired_fingerprint = Column(String(64), nullable=True)
@@ -0,0 +1,132 @@
+# cmp_core/outbox_relay.py
+"""
+Publishes the task outbox (see cmp_core.lib.outbox) to the Celery broker.
+
+    python -m cmp_core.outbox_relay
+
+Each pass locks up to OUTBOX_BATCH_SIZE of the oldest rows with FOR UPDATE
+SKIP LOCKED, publishes them over one broker connection with publisher
+confirms (every publish returns only once the broker has taken the message),
+deletes them and commits. Several relays can run side by side; they never
+pick the same rows. Between passes the relay sleeps on LISTEN task_outbox,
+which the insert trigger notifies, with OUTBOX_POLL_SECONDS as a fallback.
+
+A reconcile_project row goes through the same coalescing as
+enqueue_reconcile: it is dropped if a reconcile of the project is already
+queued. If its publish fails, the queued marker it set is withdrawn again
+and the pass rolls back, so the next pass publishes it.
+"""
+
+import logging
+import select as io_select
+import time
+from datetime import datetime, timezone
+
+import psycopg2
+from cmp_core.celery_app import celery_app
+from cmp_core.core.config import settings
+from cmp_core.core.db_sync import SYNC_DATABASE_URL, SessionLocal
+from cmp_core.lib import metrics
+from cmp_core.lib.reconcile_queue import request_reconcile, withdraw_request
+from cmp_core.models.outbox import OutboxMessage
+from sqlalchemy import delete, select
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "task_outbox"
+
+# task name -> (check on the args deciding whether the message is still
+# needed, undo of that check if the message is then not published)
+_GATES = {
+    "cmp_core.tasks.reconcile_project": (
+        lambda args: request_reconcile(args[0]),
+        lambda args: withdraw_request(args[0]),
+    ),
+}
+
+
+def relay_batch(producer) -> int:
+    """Publishes and removes one batch of outbox rows; returns the rows handled."""
+    with SessionLocal() as session:
+        rows = (
+            session.execute(
+                select(OutboxMessage)
+                .order_by(OutboxMessage.id)
+                .limit(settings.outbox_batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        if not rows:
+            return 0
+        published = 0
+        for row in rows:
+            check, undo = _GATES.get(row.task, (None, None))
+            if check is not None and not check(row.args):
+                continue
+            try:
+                celery_app.send_task(
+                    row.task, args=row.args, kwargs=row.kwargs, producer=producer
+                )
+            except Exception:
+                # the row stays (the session rolls back); so must its request
+                if undo is not None:
+                    undo(row.args)
+                raise
+            published += 1
+        oldest = rows[0].created_at
+        handled = [row.id for row in rows]
+        session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(handled)))
+        session.commit()
+
+    metrics.incr("outbox_published", published)
+    if oldest is not None:
+        lag = (datetime.now(timezone.utc) - oldest).total_seconds()
+        metrics.observe("outbox_lag_seconds", max(lag, 0.0))
+    return len(handled)
+
+
+def _listen():
+    conn = psycopg2.connect(SYNC_DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {CHANNEL}")
+    return conn
+
+
+def run() -> None:
+    backoff = 1.0
+    while True:
+        listener = None
+        try:
+            listener = _listen()
+            with celery_app.connection_for_write(
+                transport_options={"confirm_publish": True}
+            ) as broker:
+                producer = broker.Producer()
+                logger.info("Outbox relay connected.")
+                while True:
+                    while relay_batch(producer) >= settings.outbox_batch_size:
+                        pass  # more waiting; no need to sleep
+                    backoff = 1.0
+                    ready, _, _ = io_select.select(
+                        [listener], [], [], settings.outbox_poll_seconds
+                    )
+                    if ready:
+                        listener.poll()
+                        listener.notifies.clear()
+        except KeyboardInterrupt:
+            return
+        except Exception as e:
+            logger.warning(f"Outbox relay error ({e}); retrying in {backoff:.0f}s.")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+        finally:
+            if listener is not None:
+                listener.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
@@ -3,7 +3,8 @@
 from typing import Any, Dict, Literal, Optional
 
 from cmp_core.models.resource import ResourceState
-from pydantic import BaseModel, ConfigDict, Field
+from cmp_core.schemas.resource import check_name_template
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class AzureCreate(BaseModel):
@@ -24,10 +25,22 @@ class AzureCreate(BaseModel):
     public_ip_allocation_method: Literal["Dynamic", "Static"] = Field(
         "Dynamic", description="Public IP allocation method"
     )
+    labels: Dict[str, str] | None = Field(
+        None, description="Free-form key/values, for picking VMs in bulk actions"
+    )
 
     model_config = ConfigDict(extra="ignore")
 
 
+class AzureBulkCreate(AzureCreate):
+    """AzureCreate whose `name` is a template such as `worker-{0..39}`."""
+
+    @field_validator("name")
+    @classmethod
+    def _check_name(cls, v: str) -> str:
+        return check_name_template(v)
+
+
 class AzureUpdate(BaseModel):
     vm_size: str | None = None
     admin_password: str | None = None
@@ -38,6 +51,8 @@ class AzureOut(BaseModel):
     name: str
     region: str
     status: ResourceState  # Or str if you prefer to pass the value
+    # increases with every state change; matches `version` in the resource feed
+    state_version: int | None = None
     # Add other Azure VM specific fields you want to expose
     vm_size: Optional[str] = None
     public_ip: Optional[str] = None
@@ -1,7 +1,8 @@
 # cmp_core/schemas/ec2.py
-from typing import Optional
+from typing import Dict, Optional
 
-from pydantic import BaseModel
+from cmp_core.schemas.resource import check_name_template
+from pydantic import BaseModel, field_validator
 
 
 class Ec2Create(BaseModel):
@@ -9,6 +10,17 @@ class Ec2Create(BaseModel):
     region: str
     instance_type: str
     ami: str
+    # free-form key/values, for picking VMs in bulk actions
+    labels: Dict[str, str] | None = None
+
+
+class Ec2BulkCreate(Ec2Create):
+    """Ec2Create whose `name` is a template such as `worker-{0..39}`."""
+
+    @field_validator("name")
+    @classmethod
+    def _check_name(cls, v: str) -> str:
+        return check_name_template(v)
 
 
 class Ec2Update(BaseModel):
@@ -24,6 +36,9 @@ class Ec2Out(BaseModel):
     ami: Optional[str] = None
     launch_time: str
     status: str
+    # increases with every state change; matches `version` in the resource feed
+    state_version: int | None = None
+    labels: Dict[str, str] | None = None
     dashboard_url: str | None = None
 
     class Config:
@@ -1,6 +1,7 @@
 from datetime import datetime
 from uuid import UUID
 
+from cmp_core.models.project import ReconcileMode
 from pydantic import BaseModel, ConfigDict
 
 
@@ -13,13 +14,15 @@ class ProjectCreate(ProjectBase):
 
 
 class ProjectUpdate(BaseModel):
-    name: str
+    name: str | None = None
+    reconcile_mode: ReconcileMode | None = None
 
 
 class ProjectOut(ProjectBase):
     id: UUID
     owner_id: UUID
     created_at: datetime
+    reconcile_mode: ReconcileMode = ReconcileMode.refresh_then_up
     resources_total: int = 0
 
     model_config = ConfigDict(from_attributes=True)
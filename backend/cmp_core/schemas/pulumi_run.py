@@ -0,0 +1,41 @@
+from datetime import datetime
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict
+
+
+class PulumiRunOut(BaseModel):
+    id: UUID
+    project_id: UUID
+    stack_name: str
+    mode: str
+    targeted: bool
+    started_at: datetime
+    refresh_seconds: float | None = None
+    up_seconds: float | None = None
+    total_seconds: float
+    up_skipped: bool
+    succeeded: bool
+    error: str | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PulumiRunStepOut(BaseModel):
+    urn: str
+    type: str
+    name: str
+    op: str
+    phase: str
+    start: float
+    duration: float
+    status: str
+    error: str | None = None
+
+
+class ResourceTypeDurationOut(BaseModel):
+    type: str
+    steps: int
+    total_seconds: float
+    max_seconds: float
+    mean_seconds: float
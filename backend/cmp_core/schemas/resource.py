@@ -0,0 +1,89 @@
+# cmp_core/schemas/resource.py
+
+import re
+from typing import Dict, List, Literal
+
+from cmp_core.models.resource import Provider, ResourceState
+from pydantic import BaseModel, Field, model_validator
+
+# most resources one bulk request may address
+MAX_BULK_ITEMS = 500
+
+_NAME_RANGE = re.compile(r"\{(\d+)\.\.(\d+)\}")
+
+
+def expand_name_template(template: str) -> List[str]:
+    """
+    `worker-{0..39}` -> worker-0 ... worker-39. A zero-padded start
+    (`{00..39}`) pads every number to its width; a template without a range
+    is a single name.
+    """
+    ranges = _NAME_RANGE.findall(template)
+    if not ranges:
+        return [template]
+    if len(ranges) > 1:
+        raise ValueError("name template may contain one {first..last} range")
+    first, last = ranges[0]
+    start, stop = int(first), int(last)
+    if stop < start:
+        raise ValueError("name range must not run backwards")
+    if stop - start + 1 > MAX_BULK_ITEMS:
+        raise ValueError(f"name range expands to more than {MAX_BULK_ITEMS} names")
+    width = len(first) if first.startswith("0") and len(first) > 1 else 0
+    head, tail = _NAME_RANGE.split(template, maxsplit=1)[::3]
+    return [f"{head}{n:0{width}d}{tail}" for n in range(start, stop + 1)]
+
+
+def check_name_template(template: str) -> str:
+    """Field validator for templated names; the names must fit the name column."""
+    if any(len(name) > 63 for name in expand_name_template(template)):
+        raise ValueError("expanded names must be at most 63 characters")
+    return template
+
+
+class ResourceSelector(BaseModel):
+    """Matches VMs of the project having all of the given attributes."""
+
+    labels: Dict[str, str] = Field(
+        default_factory=dict, description="Labels set at create time"
+    )
+    provider: Provider | None = None
+    region: str | None = None
+
+    @model_validator(mode="after")
+    def _not_empty(self):
+        if not (self.labels or self.provider or self.region):
+            raise ValueError("selector needs labels, provider or region")
+        return self
+
+
+class BulkActionRequest(BaseModel):
+    action: Literal["start", "stop", "delete", "resize"]
+    names: List[str] | None = Field(None, min_length=1, max_length=MAX_BULK_ITEMS)
+    selector: ResourceSelector | None = None
+    # resize only: instance_type on AWS, vm_size on Azure
+    size: str | None = None
+
+    @model_validator(mode="after")
+    def _check(self):
+        if (self.names is None) == (self.selector is None):
+            raise ValueError("give either names or selector")
+        if (self.action == "resize") != (self.size is not None):
+            raise ValueError("size is required for resize, and only for resize")
+        return self
+
+
+class BulkItemResult(BaseModel):
+    name: str
+    # accepted: state changed and work dispatched; the other values leave the
+    # resource untouched
+    result: Literal["accepted", "not_found", "conflict", "unsupported"]
+    state: ResourceState | None = None
+    state_version: int | None = None
+    detail: str | None = None
+
+
+class BulkActionOut(BaseModel):
+    action: str
+    accepted: int
+    items: List[BulkItemResult]
@@ -3,9 +3,12 @@
 import uuid
 from typing import Any, Dict  # Added typing for Dict and Any
 
+from cmp_core.lib import outbox
 from cmp_core.lib.grafana import make_dashboard_url
 from cmp_core.models.resource import Provider, Resource, ResourceState, ResourceType
-from cmp_core.schemas.azure import AzureCreate, AzureOut, AzureUpdate
+from cmp_core.schemas.azure import AzureBulkCreate, AzureCreate, AzureOut, AzureUpdate
+from cmp_core.schemas.resource import BulkActionOut, expand_name_template
+from cmp_core.services.resource_bulk import insert_placeholders
 from cmp_core.tasks.azure import start_azure_task, stop_azure_task
 from cmp_core.tasks.pulumi import reconcile_project
 from fastapi import HTTPException, status
@@ -44,6 +47,7 @@ def _to_azure_vm_out(res: Resource) -> AzureOut:
         name=res.name,  # Display name is still the logical name
         region=res.region,
         status=res.state,
+        state_version=res.state_version,
         vm_size=azure_vm_size,
         public_ip=azure_public_ip,
         subscription_id=azure_subscription_id,  # For API output
@@ -94,6 +98,22 @@ async def get_azure(
     return _to_azure_vm_out(r_item)
 
 
+def _azure_meta(dto: AzureCreate) -> Dict[str, Any]:
+    return {
+        "location": dto.region
+        or "",  # This will be used for AzureOut.region via Resource.region
+        "vnet_address_prefix": dto.vnet_address_prefix,
+        "subnet_prefix": dto.subnet_prefix,
+        "public_ip_allocation_method": dto.public_ip_allocation_method,
+        "vm_size": dto.vm_size,
+        "image_reference": dto.image_reference if dto.image_reference else {},
+        "admin_username": dto.admin_username,
+        "admin_password": dto.admin_password,  # Consider security implications
+        **({"labels": dto.labels} if dto.labels else {}),
+        # azure_vm_id, public_ip, subscription_id, resource_group_name will be populated by reconcile_single
+    }
+
+
 async def create_azure_nonblocking(
     db: AsyncSession,
     project_id: str,
@@ -113,18 +133,7 @@ async def create_azure_nonblocking(
         )
 
     res_id = uuid.uuid4()
-    initial_meta: Dict[str, Any] = {  # Explicitly type initial_meta
-        "location": dto.region
-        or "",  # This will be used for AzureOut.region via Resource.region
-        "vnet_address_prefix": dto.vnet_address_prefix,
-        "subnet_prefix": dto.subnet_prefix,
-        "public_ip_allocation_method": dto.public_ip_allocation_method,
-        "vm_size": dto.vm_size,
-        "image_reference": dto.image_reference if dto.image_reference else {},
-        "admin_username": dto.admin_username,
-        "admin_password": dto.admin_password,  # Consider security implications
-        # azure_vm_id, public_ip, subscription_id, resource_group_name will be populated by reconcile_single
-    }
+    initial_meta = _azure_meta(dto)
     placeholder = Resource(
         id=res_id,
         project_id=project_id,
@@ -137,14 +146,31 @@ async def create_azure_nonblocking(
         created_by=user_id,
     )
     db.add(placeholder)
+    outbox.enqueue(db, reconcile_project, str(project_id))
     await db.commit()
     await db.refresh(placeholder)
 
-    reconcile_project.delay(project_id)
-
     return _to_azure_vm_out(placeholder)  # _to_azure_vm_out will use placeholder.state
 
 
+async def create_azure_bulk(
+    db: AsyncSession,
+    project_id: str,
+    dto: AzureBulkCreate,
+    user_id: str,
+) -> BulkActionOut:
+    """One placeholder per name of the template, one INSERT, one reconcile."""
+    return await insert_placeholders(
+        db,
+        project_id,
+        Provider.azure,
+        expand_name_template(dto.name),
+        dto.region or "",
+        _azure_meta(dto),
+        user_id,
+    )
+
+
 async def update_azure_nonblocking(
     db: AsyncSession,
     project_id: str,
@@ -186,9 +212,9 @@ async def update_azure_nonblocking(
 
     r_item.state = ResourceState.PENDING_UPDATE  # Use new state
     db.add(r_item)
+    outbox.enqueue(db, reconcile_project, str(project_id))
     await db.commit()
     await db.refresh(r_item)  # Refresh to get any DB-side changes before converting
-    reconcile_project.delay(project_id)
 
     return _to_azure_vm_out(r_item)  # Use the corrected helper function
 
@@ -230,8 +256,8 @@ async def delete_azure_nonblocking(
 
     r_item.state = ResourceState.PENDING_DEPROVISION  # Use new state
     db.add(r_item)
+    outbox.enqueue(db, reconcile_project, str(project_id))
     await db.commit()
-    reconcile_project.delay(project_id)
     # No return value, so no AzureOut conversion needed here
 
 
@@ -272,9 +298,9 @@ async def start_azure_nonblocking(
     # The task itself will handle the 'STARTING' and then 'RUNNING' or 'ERROR_STARTING'
     # No need to set meta['power_state'] = "starting" here, let the task do it.
     db.add(r_item)
+    outbox.enqueue(db, start_azure_task, str(r_item.id), user_id)
     await db.commit()
     await db.refresh(r_item)
-    start_azure_task.delay(str(r_item.id), user_id)
 
     return _to_azure_vm_out(r_item)  # Use the corrected helper function
 
@@ -313,8 +339,8 @@ async def stop_azure_nonblocking(
         r_item.meta = {}
     # No need to set meta['power_state'] = "stopping" here, let the task do it.
     db.add(r_item)
+    outbox.enqueue(db, stop_azure_task, str(r_item.id), user_id)
     await db.commit()
     await db.refresh(r_item)
-    stop_azure_task.delay(str(r_item.id), user_id)
 
     return _to_azure_vm_out(r_item)  # Use the corrected helper function
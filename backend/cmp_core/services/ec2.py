@@ -2,9 +2,12 @@
 
 import uuid
 
+from cmp_core.lib import outbox
 from cmp_core.lib.grafana import make_dashboard_url
 from cmp_core.models.resource import Provider, Resource, ResourceState, ResourceType
-from cmp_core.schemas.ec2 import Ec2Create, Ec2Out, Ec2Update
+from cmp_core.schemas.ec2 import Ec2BulkCreate, Ec2Create, Ec2Out, Ec2Update
+from cmp_core.schemas.resource import BulkActionOut, expand_name_template
+from cmp_core.services.resource_bulk import insert_placeholders
 
 # Ensure new task names if we rename them, for now assume they are generic enough
 # or we create new ones like provision_task, deprovision_task etc.
@@ -41,6 +44,8 @@ async def list_ec2(db: AsyncSession, project_id: str) -> list[Ec2Out]:
                 ami=res.meta.get("ami", ""),
                 launch_time=res.meta.get("launch_time", ""),
                 status=res.state,
+                state_version=res.state_version,
+                labels=res.meta.get("labels"),
                 dashboard_url=make_dashboard_url(
                     provider=res.provider.value,
                     resource_type=res.resource_type.value,
@@ -74,6 +79,8 @@ async def get_ec2(db: AsyncSession, project_id: str, name: str) -> Ec2Out:
         ami=res.meta.get("ami", ""),
         launch_time=res.meta.get("launch_time", ""),
         status=res.state,
+        state_version=res.state_version,
+        labels=res.meta.get("labels"),
         dashboard_url=make_dashboard_url(
             provider=res.provider.value,
             resource_type=res.resource_type.value,
@@ -93,6 +100,8 @@ def _to_ec2out(res: Resource) -> Ec2Out:
         ami=res.meta.get("ami", ""),
         launch_time=res.meta.get("launch_time", ""),
         status=res.state.value,
+        state_version=res.state_version,
+        labels=res.meta.get("labels"),
         dashboard_url=make_dashboard_url(
             provider=res.provider.value,
             resource_type=res.resource_type.value,
@@ -115,12 +124,20 @@ async def _mark_and_reconcile(
     # Use the specified pending_state
     res.state = pending_state
     db.add(res)
-    await db.commit()
     # Reconcile project will pick up resources in PENDING_PROVISION, PENDING_UPDATE, PENDING_DEPROVISION
-    reconcile_project.delay(project_id)
+    outbox.enqueue(db, reconcile_project, str(project_id))
+    await db.commit()
     return _to_ec2out(res)
 
 
+def _ec2_meta(dto: Ec2Create) -> dict:
+    return {
+        "ami": dto.ami,
+        "instance_type": dto.instance_type,
+        **({"labels": dto.labels} if dto.labels else {}),
+    }
+
+
 async def create_ec2_nonblocking(
     db: AsyncSession,
     project_id: str,
@@ -150,14 +167,13 @@ async def create_ec2_nonblocking(
         name=dto.name,
         region=dto.region,
         state=ResourceState.PENDING_PROVISION,  # Use new state
-        meta={"ami": dto.ami, "instance_type": dto.instance_type},
+        meta=_ec2_meta(dto),
         created_by=user_id,
     )
     db.add(placeholder)
-    await db.commit()
-
     # 2) schedule the background reconcile (which will do a single pulumi up per-project)
-    reconcile_project.delay(project_id)
+    outbox.enqueue(db, reconcile_project, str(project_id))
+    await db.commit()
 
     # 3) return the “pending” placeholder
     return Ec2Out(
@@ -169,6 +185,8 @@ async def create_ec2_nonblocking(
         ami="",  # Should be dto.ami
         launch_time="",
         status=ResourceState.PENDING_PROVISION,  # Reflect the new state
+        state_version=placeholder.state_version,
+        labels=dto.labels or None,
         dashboard_url=make_dashboard_url(
             provider=placeholder.provider.value,
             resource_type=placeholder.resource_type.value,
@@ -178,6 +196,24 @@ async def create_ec2_nonblocking(
     )
 
 
+async def create_ec2_bulk(
+    db: AsyncSession,
+    project_id: str,
+    dto: Ec2BulkCreate,
+    user_id: str,
+) -> BulkActionOut:
+    """One placeholder per name of the template, one INSERT, one reconcile."""
+    return await insert_placeholders(
+        db,
+        project_id,
+        Provider.aws,
+        expand_name_template(dto.name),
+        dto.region,
+        _ec2_meta(dto),
+        user_id,
+    )
+
+
 async def update_ec2_nonblocking(
     db: AsyncSession,
     project_id: str,
@@ -260,8 +296,8 @@ async def delete_ec2_nonblocking(
     # Let's adjust _mark_and_reconcile or call directly.
     res.state = ResourceState.PENDING_DEPROVISION
     db.add(res)
+    outbox.enqueue(db, reconcile_project, str(project_id))
     await db.commit()
-    reconcile_project.delay(project_id)
     # For delete, typically no body is returned (204 No Content)
     # If you need to return the object, use _to_ec2out(res)
 
@@ -295,9 +331,9 @@ async def start_ec2_nonblocking(
             detail=f"Cannot start resource in state: {res.state.value}. Must be STOPPED or an error state related to starting.",
         )
 
-    start_ec2_task.delay(str(res.id), user_id)
     res.state = ResourceState.PENDING_START  # Use new state
     db.add(res)
+    outbox.enqueue(db, start_ec2_task, str(res.id), user_id)
     await db.commit()
     return _to_ec2out(res)
 
@@ -331,8 +367,8 @@ async def stop_ec2_nonblocking(
             detail=f"Cannot stop resource in state: {res.state.value}. Must be RUNNING or an error state related to stopping.",
         )
 
-    stop_ec2_task.delay(str(res.id), user_id)
     res.state = ResourceState.PENDING_STOP  # Use new state
     db.add(res)
+    outbox.enqueue(db, stop_ec2_task, str(res.id), user_id)
     await db.commit()
     return _to_ec2out(res)
@@ -1,8 +1,13 @@
-from typing import List
+import asyncio
+import json
+from typing import AsyncIterator, List
 from uuid import UUID
 
+from cmp_core.lib import outbox
+from cmp_core.lib.reconcile_events import hub
 from cmp_core.models.project import Project
 from cmp_core.models.project_member import ProjectMember
+from cmp_core.models.pulumi_run import PulumiRun
 from cmp_core.models.resource import Resource
 from cmp_core.schemas.project import ProjectCreate, ProjectOut, ProjectUpdate
 from cmp_core.tasks.pulumi import destroy_project_task
@@ -10,6 +15,10 @@ from fastapi import HTTPException, status
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+# comment line sent when no event arrived for this long, so proxies keep the
+# stream open and dead clients are noticed
+SSE_KEEPALIVE_SECONDS = 15
+
 
 async def list_projects(db: AsyncSession, user_id: UUID) -> List[Project]:
     # projects you own or are a member of
@@ -25,6 +34,19 @@ async def list_projects(db: AsyncSession, user_id: UUID) -> List[Project]:
     return result.scalars().all()
 
 
+async def member_project_ids(db: AsyncSession, user_id: UUID) -> set[str]:
+    """Ids of the projects a user owns or is a member of."""
+    result = await db.execute(
+        select(Project.id).where(
+            (Project.owner_id == user_id)
+            | Project.id.in_(
+                select(ProjectMember.project_id).where(ProjectMember.user_id == user_id)
+            )
+        )
+    )
+    return {str(pid) for pid in result.scalars().all()}
+
+
 async def list_projects_with_count(db: AsyncSession, user_id: UUID) -> list[ProjectOut]:
     projects = await list_projects(db, user_id)
 
@@ -77,7 +99,10 @@ async def update_project(
     db: AsyncSession, project_id: UUID, user_id: UUID, data: ProjectUpdate
 ) -> Project:
     proj = await get_project_or_404(db, project_id, user_id)
-    proj.name = data.name
+    if data.name is not None:
+        proj.name = data.name
+    if data.reconcile_mode is not None:
+        proj.reconcile_mode = data.reconcile_mode.value
     await db.commit()
     await db.refresh(proj)
     return proj
@@ -88,7 +113,7 @@ async def delete_project(db: AsyncSession, project_id: UUID, user_id: UUID):
     await db.delete(proj)
 
     # asynchronously destroy all infra for that project
-    destroy_project_task.delay(str(project_id))
+    outbox.enqueue(db, destroy_project_task, str(project_id))
     await db.commit()
 
 
@@ -104,3 +129,114 @@ async def get_project_by_id(db: AsyncSession, project_id: UUID) -> Project:
             detail=f"Project with id {project_id} not found",
         )
     return project
+
+
+async def list_pulumi_runs(
+    db: AsyncSession, project_id: UUID, limit: int = 50
+) -> List[PulumiRun]:
+    """Most recent Pulumi runs of a project's reconciles, newest first."""
+    result = await db.execute(
+        select(PulumiRun)
+        .where(PulumiRun.project_id == project_id)
+        .order_by(PulumiRun.started_at.desc())
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+async def get_pulumi_run_steps(
+    db: AsyncSession, project_id: UUID, run_id: UUID
+) -> list[dict]:
+    run = await db.get(PulumiRun, run_id)
+    if run is None or run.project_id != project_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return (run.events or {}).get("steps", [])
+
+
+async def resource_type_durations(
+    db: AsyncSession, project_id: UUID, runs: int = 20
+) -> list[dict]:
+    """
+    Step time per Pulumi resource type over the project's last `runs` runs,
+    biggest total first.
+    """
+    result = await db.execute(
+        select(PulumiRun.events)
+        .where(PulumiRun.project_id == project_id)
+        .order_by(PulumiRun.started_at.desc())
+        .limit(runs)
+    )
+    totals: dict[str, dict] = {}
+    for events in result.scalars().all():
+        for step in (events or {}).get("steps", []):
+            agg = totals.setdefault(
+                step["type"],
+                {
+                    "type": step["type"],
+                    "steps": 0,
+                    "total_seconds": 0.0,
+                    "max_seconds": 0.0,
+                },
+            )
+            agg["steps"] += 1
+            agg["total_seconds"] += step["duration"]
+            agg["max_seconds"] = max(agg["max_seconds"], step["duration"])
+    for agg in totals.values():
+        agg["mean_seconds"] = agg["total_seconds"] / agg["steps"]
+    return sorted(totals.values(), key=lambda a: a["total_seconds"], reverse=True)
+
+
+def _sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def reconcile_event_stream(
+    project_id: UUID, last_event_id: int | None = None
+) -> AsyncIterator[str]:
+    """
+    Server-sent events for a project's reconciles. With `last_event_id` the
+    stream first replays what the buffer still holds after it; a `reset`
+    event means events were lost and the client should re-list resources.
+    """
+    pid = str(project_id)
+    # returns once the channel subscription is live: whatever is published
+    # after the reads below reaches the queue, and ids up to last_id that
+    # also arrive there are dropped
+    sub = await hub.subscribe(pid)
+    try:
+        last_id = await hub.latest_id(pid) if last_event_id is None else last_event_id
+        sub.lagged = sub.lagged or last_event_id is not None
+        yield "retry: 3000\n\n"
+        while True:
+            if sub.lagged:
+                sub.lagged = False
+                latest = await hub.latest_id(pid)
+                # the sequence expired and restarted since the client's id
+                restarted = latest < last_id
+                if restarted:
+                    last_id = 0
+                backlog = await hub.history(pid, last_id)
+                first = backlog[0]["id"] if backlog else latest + 1
+                if restarted or first > last_id + 1:
+                    yield "event: reset\ndata: {}\n\n"
+                for event in backlog:
+                    last_id = event["id"]
+                    yield _sse(event)
+            try:
+                event = await asyncio.wait_for(
+                    sub.queue.get(), timeout=SSE_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None or event["id"] <= last_id:
+                continue  # resync from the buffer / already sent from it
+            if event["id"] > last_id + 1:
+                # events went by unseen (the subscription reconnected); the
+                # buffer has them and this one
+                sub.lagged = True
+                continue
+            last_id = event["id"]
+            yield _sse(event)
+    finally:
+        hub.unsubscribe(sub)
@@ -0,0 +1,241 @@
+# cmp_core/services/resource_bulk.py
+"""
+Actions on many VMs of a project in one request.
+
+The targets are read with one SELECT and moved to their pending state with
+one UPDATE, which re-checks the state it was validated against, so a VM that
+changed meanwhile is reported as a conflict instead of being overwritten.
+The work is dispatched once, through the outbox in the same transaction: a
+single bulk_power_op task for start / stop (one cloud call per region or
+subscription), a single reconcile for delete / resize.
+
+Bulk create inserts all placeholders with one INSERT ... ON CONFLICT DO
+NOTHING on uq_resources_project_name; the names it does not return already
+existed. One reconcile then provisions every new VM.
+"""
+
+import uuid
+from typing import Dict, List
+
+from cmp_core.lib import outbox
+from cmp_core.models.resource import Provider, Resource, ResourceState, ResourceType
+from cmp_core.schemas.resource import (
+    MAX_BULK_ITEMS,
+    BulkActionOut,
+    BulkActionRequest,
+    BulkItemResult,
+)
+from cmp_core.tasks.power import bulk_power_op_task
+from cmp_core.tasks.pulumi import reconcile_project
+from fastapi import HTTPException, status
+from sqlalchemy import JSON, case, cast, func, select, update
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_GONE = {ResourceState.DEPROVISIONING, ResourceState.TERMINATED}
+
+# action -> (states it may be requested from, state it sets); the rules of the
+# single-VM endpoints, except that a VM already pending deprovision is a
+# conflict for delete rather than a second request for the same reconcile
+TRANSITIONS = {
+    "start": (
+        {ResourceState.STOPPED, ResourceState.ERROR_STARTING, ResourceState.ERROR},
+        ResourceState.PENDING_START,
+    ),
+    "stop": (
+        {ResourceState.RUNNING, ResourceState.ERROR_STOPPING, ResourceState.ERROR},
+        ResourceState.PENDING_STOP,
+    ),
+    "delete": (
+        set(ResourceState) - _GONE - {ResourceState.PENDING_DEPROVISION},
+        ResourceState.PENDING_DEPROVISION,
+    ),
+    "resize": (
+        set(ResourceState) - _GONE - {ResourceState.PENDING_DEPROVISION},
+        ResourceState.PENDING_UPDATE,
+    ),
+}
+
+# where each provider keeps the VM size in meta
+SIZE_KEY = {Provider.aws: "instance_type", Provider.azure: "vm_size"}
+
+
+def _resized_meta(size: str):
+    """meta with the provider's size key set to `size`, computed in the UPDATE."""
+    key = case(
+        *((Resource.provider == p, k) for p, k in SIZE_KEY.items()),
+        else_="size",
+    )
+    merged = cast(Resource.meta, JSONB).op("||", return_type=JSONB)(
+        func.jsonb_build_object(key, size)
+    )
+    return cast(merged, JSON)
+
+
+async def bulk_resource_action(
+    db: AsyncSession,
+    project_id: str,
+    dto: BulkActionRequest,
+    user_id: str,
+) -> BulkActionOut:
+    allowed, pending = TRANSITIONS[dto.action]
+
+    q = select(
+        Resource.id,
+        Resource.name,
+        Resource.provider,
+        Resource.resource_type,
+        Resource.state,
+        Resource.state_version,
+    ).where(Resource.project_id == project_id)
+    if dto.names is not None:
+        q = q.where(Resource.name.in_(dto.names))
+    else:
+        sel = dto.selector
+        q = q.where(Resource.resource_type == ResourceType.vm)
+        if sel.provider is not None:
+            q = q.where(Resource.provider == sel.provider)
+        if sel.region is not None:
+            q = q.where(Resource.region == sel.region)
+        for label, value in sel.labels.items():
+            q = q.where(Resource.meta["labels"][label].as_string() == value)
+        # the cap `names` has in the schema
+        q = q.limit(MAX_BULK_ITEMS + 1)
+    rows = {row.name: row for row in (await db.execute(q.order_by(Resource.name)))}
+    if len(rows) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"selector matches more than {MAX_BULK_ITEMS} resources",
+        )
+
+    order = list(dict.fromkeys(dto.names)) if dto.names is not None else list(rows)
+    items: Dict[str, BulkItemResult] = {}
+    targets = []
+    for name in order:
+        row = rows.get(name)
+        if row is None:
+            items[name] = BulkItemResult(name=name, result="not_found")
+        elif row.resource_type != ResourceType.vm or (
+            dto.action != "delete" and row.provider not in SIZE_KEY
+        ):
+            items[name] = BulkItemResult(
+                name=name,
+                result="unsupported",
+                state=row.state,
+                state_version=row.state_version,
+                detail=f"{dto.action} is not supported for {row.provider.value} {row.resource_type.value}",
+            )
+        elif row.state not in allowed:
+            items[name] = BulkItemResult(
+                name=name,
+                result="conflict",
+                state=row.state,
+                state_version=row.state_version,
+                detail=f"Cannot {dto.action} resource in state: {row.state.value}",
+            )
+        else:
+            targets.append(row)
+
+    changed = {}
+    if targets:
+        values = {"state": pending}
+        if dto.action == "resize":
+            values["meta"] = _resized_meta(dto.size)
+        stmt = (
+            update(Resource)
+            .where(
+                Resource.id.in_([row.id for row in targets]),
+                Resource.state.in_(allowed),
+            )
+            .values(**values)
+            .returning(Resource.id, Resource.state_version)
+            .execution_options(synchronize_session=False)
+        )
+        changed = {row.id: row.state_version for row in await db.execute(stmt)}
+
+    accepted_ids: List[str] = []
+    for row in targets:
+        if row.id in changed:
+            accepted_ids.append(str(row.id))
+            items[row.name] = BulkItemResult(
+                name=row.name,
+                result="accepted",
+                state=pending,
+                state_version=changed[row.id],
+            )
+        else:
+            items[row.name] = BulkItemResult(
+                name=row.name,
+                result="conflict",
+                detail="State changed while the request was processed",
+            )
+
+    if accepted_ids:
+        if dto.action in ("start", "stop"):
+            outbox.enqueue(db, bulk_power_op_task, accepted_ids, user_id, dto.action)
+        else:
+            outbox.enqueue(db, reconcile_project, str(project_id))
+    if targets:
+        await db.commit()
+
+    return BulkActionOut(
+        action=dto.action,
+        accepted=len(accepted_ids),
+        items=[items[name] for name in order],
+    )
+
+
+async def insert_placeholders(
+    db: AsyncSession,
+    project_id: str,
+    provider: Provider,
+    names: List[str],
+    region: str,
+    meta: dict,
+    user_id: str,
+) -> BulkActionOut:
+    """Inserts PENDING_PROVISION VMs for the names that are free, then reconciles once."""
+    stmt = (
+        insert(Resource)
+        .values(
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "project_id": project_id,
+                    "provider": provider,
+                    "resource_type": ResourceType.vm,
+                    "name": name,
+                    "region": region,
+                    "state": ResourceState.PENDING_PROVISION,
+                    "meta": dict(meta),
+                    "created_by": user_id,
+                }
+                for name in names
+            ]
+        )
+        .on_conflict_do_nothing(constraint="uq_resources_project_name")
+        .returning(Resource.name, Resource.state_version)
+    )
+    created = {row.name: row.state_version for row in await db.execute(stmt)}
+    if created:
+        outbox.enqueue(db, reconcile_project, str(project_id))
+    await db.commit()
+
+    items = [
+        (
+            BulkItemResult(
+                name=name,
+                result="accepted",
+                state=ResourceState.PENDING_PROVISION,
+                state_version=created[name],
+            )
+            if name in created
+            else BulkItemResult(
+                name=name,
+                result="conflict",
+                detail=f"'{name}' already exists in project {project_id}",
+            )
+        )
+        for name in names
+    ]
+    return BulkActionOut(action="create", accepted=len(created), items=items)
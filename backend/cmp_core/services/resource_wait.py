@@ -0,0 +1,77 @@
+# cmp_core/services/resource_wait.py
+
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+from cmp_core.core.config import settings
+from cmp_core.lib.resource_feed import feed
+from cmp_core.models.resource import ResourceState
+from sqlalchemy.ext.asyncio import AsyncSession
+
+T = TypeVar("T")
+
+# a parked request re-reads the row at least this often, in case a
+# notification was missed (e.g. before the LISTEN connection was up)
+WAIT_RECHECK_SECONDS = 15
+
+# states that end a wait_for early: the requested state will not follow
+FAILED_STATES = {
+    state.value for state in ResourceState if state.name.startswith("ERROR")
+}
+
+
+async def wait_for_resource(
+    db: AsyncSession,
+    project_id: str,
+    name: str,
+    fetch: Callable[[], Awaitable[T]],
+    wait_for: ResourceState | None = None,
+    since_version: int | None = None,
+    timeout: float = 0,
+) -> T:
+    """
+    Long-poll read of one resource. `fetch` reads it (an Ec2Out / AzureOut,
+    or raises 404). Returns as soon as its state is `wait_for` (or an error
+    state, or the resource is gone) or its state_version is above
+    `since_version`; otherwise after `timeout` seconds (capped at
+    RESOURCE_WAIT_MAX_SECONDS) with the state at that time. While parked the
+    request holds no DB connection; it is woken by the resource state feed.
+    """
+    timeout = min(timeout, settings.resource_wait_max_seconds)
+    if timeout <= 0 or (wait_for is None and since_version is None):
+        return await fetch()
+
+    def satisfied(state: str, version: int | None) -> bool:
+        if since_version is not None and version is not None:
+            if version > since_version:
+                return True
+        if wait_for is not None:
+            return state in (wait_for.value, "deleted") or state in FAILED_STATES
+        return False
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    w = feed.watch(
+        str(project_id),
+        name,
+        lambda change: satisfied(change["state"], change["version"]),
+    )
+    try:
+        while True:
+            w.event.clear()
+            current = await fetch()
+            remaining = deadline - loop.time()
+            if remaining <= 0 or satisfied(
+                ResourceState(current.status).value, current.state_version
+            ):
+                return current
+            # end the read transaction so the connection goes back to the pool
+            await db.rollback()
+            try:
+                await asyncio.wait_for(
+                    w.event.wait(), timeout=min(remaining, WAIT_RECHECK_SECONDS)
+                )
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        feed.unwatch(w)
@@ -0,0 +1,694 @@
+# cmp_core/tasks/power.py
+"""
+VM start/stop as a non-blocking state machine, for AWS and Azure alike.
+
+`begin_power_op` (behind start_ec2_task, stop_azure_task, ...) and its bulk
+form `begin_power_ops` (bulk_power_op_task) move resources to STARTING /
+STOPPING, fire the provider calls without waiting for them to finish, one
+start/stop_instances call per AWS region and one client per Azure
+subscription, and record each operation in meta["power_op"]:
+
+    {"id", "provider", "action", "requested_by", "requested_at", "deadline",
+     "attempts", "next_check_at", "handle": {cloud ids to check},
+     "lro_token": Azure only, the ARM operation's continuation token}
+
+The operation is recorded, without its handle, in the same commit that moves
+the resource to STARTING / STOPPING, and the handle is added once the calls
+return; an operation that never gets one fails at its deadline.
+
+`confirm_power_ops` (every POWER_OP_BEAT_SECONDS from beat, plus countdown
+kicks when a check is due sooner) checks the due operations with one batched
+call per AWS region / Azure subscription:
+  * live state is the target          -> RUNNING / STOPPED
+  * VM gone or terminated, or still in the state it was leaving after
+    POWER_OP_SETTLE_SECONDS           -> ERROR_STARTING / ERROR_STOPPING
+  * past the deadline                 -> ERROR_STARTING / ERROR_STOPPING
+  * otherwise the next check is backed off exponentially.
+Azure operations are resumed from their continuation token for one status GET
+each, so the outcome ARM reports (Succeeded / Failed / Canceled) decides
+before the power state does, and a VM that is slow to deallocate is not failed
+by the settle check while its operation is still running. Nothing lives in a
+worker's memory between runs: a recycled worker, or any other one, picks the
+operation up from the row.
+Like reconcile, the cloud calls run without a DB session and results are only
+applied to rows still carrying the same operation. reconcile_single leaves
+resources with a power_op to the confirmer.
+"""
+
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from azure.core.exceptions import HttpResponseError
+from azure.mgmt.compute import ComputeManagementClient
+from azure.mgmt.core.polling.arm_polling import ARMPolling
+from celery import shared_task
+from cmp_core.core.config import settings
+from cmp_core.core.db_sync import SessionLocal
+from cmp_core.core.redis import get_redis
+from cmp_core.lib import cloud_clients, metrics, rate_limit
+from cmp_core.models.audit import AuditEvent
+from cmp_core.models.resource import Resource, ResourceState
+from cmp_core.tasks.pulumi import (
+    _azure_power_state,
+    fetch_aws_info_bulk,
+    map_azure_power_state_to_resource_state,
+    parse_azure_vm_id,
+)
+
+logger = logging.getLogger(__name__)
+
+POWER_OP_BEAT_SECONDS = 15
+# a VM still in the state it was asked to leave after this long is a failure
+POWER_OP_SETTLE_SECONDS = 60
+
+_KICK_KEY = "cmp:power:kick"
+
+
+class PowerOpError(Exception):
+    """The power operation could not be requested from the provider."""
+
+
+class _Action(NamedTuple):
+    pending: ResourceState
+    in_progress: ResourceState
+    target: ResourceState
+    failed: ResourceState
+    leaving: ResourceState
+
+
+ACTIONS = {
+    "start": _Action(
+        ResourceState.PENDING_START,
+        ResourceState.STARTING,
+        ResourceState.RUNNING,
+        ResourceState.ERROR_STARTING,
+        ResourceState.STOPPED,
+    ),
+    "stop": _Action(
+        ResourceState.PENDING_STOP,
+        ResourceState.STOPPING,
+        ResourceState.STOPPED,
+        ResourceState.ERROR_STOPPING,
+        ResourceState.RUNNING,
+    ),
+}
+
+FIRE_PROVIDERS = ("aws", "azure")
+
+# audit action prefix per provider, as before: ec2_start_success, azure_vm_stop_failure, ...
+AUDIT_PREFIX = {"aws": "ec2", "azure": "azure_vm"}
+
+AWS_STATES = {
+    "pending": ResourceState.STARTING,
+    "running": ResourceState.RUNNING,
+    "stopping": ResourceState.STOPPING,
+    "stopped": ResourceState.STOPPED,
+    "shutting-down": ResourceState.TERMINATED,
+    "terminated": ResourceState.TERMINATED,
+}
+
+
+def _fire_aws(region: str, targets: dict[str, dict], action: str) -> dict:
+    """
+    One start/stop_instances call for all instances of a region (`targets`
+    maps resource id to meta). A single bad instance id fails the whole call,
+    so a failed batch is retried one instance at a time.
+    """
+    results: dict = {}
+    aws_ids = {}
+    for resource_id, meta in targets.items():
+        if meta.get("aws_id"):
+            aws_ids[resource_id] = meta["aws_id"]
+        else:
+            results[resource_id] = PowerOpError("aws_id missing in metadata")
+    if not aws_ids:
+        return results
+    client = cloud_clients.ec2(region)
+    request = client.start_instances if action == "start" else client.stop_instances
+    bucket = rate_limit.aws(region, rate_limit.WRITE)
+
+    def call(**kwargs):
+        return rate_limit.call(bucket, request, **kwargs)
+
+    failed: dict = {}
+    try:
+        call(InstanceIds=list(aws_ids.values()))
+    except Exception as e:
+        if len(aws_ids) == 1:
+            failed = {resource_id: e for resource_id in aws_ids}
+        else:
+            logger.warning(f"Batched {action} in {region} failed, retrying singly: {e}")
+            for resource_id, aws_id in aws_ids.items():
+                try:
+                    call(InstanceIds=[aws_id])
+                except Exception as single_error:
+                    failed[resource_id] = single_error
+    for resource_id, aws_id in aws_ids.items():
+        results[resource_id] = failed.get(resource_id) or {
+            "aws_id": aws_id,
+            "region": region,
+        }
+    return results
+
+
+# ARM operation statuses that end it without the requested power state
+LRO_FAILED = ("failed", "canceled")
+
+
+class _SendOnlyPolling(ARMPolling):
+    """
+    Reads the status link from the initial response and does not poll, so
+    begin_* returns once ARM has accepted the request.
+    """
+
+    def run(self) -> None:
+        pass
+
+
+class _StatusOncePolling(ARMPolling):
+    """
+    Makes one status GET instead of polling the operation to its end. For a
+    failed operation the base run() raises the HttpResponseError carrying
+    ARM's error.
+    """
+
+    def run(self) -> None:
+        if not self.finished():
+            self.update_status()
+        if self.status().lower() in LRO_FAILED:
+            super().run()
+
+
+def _fire_azure(subscription_id: str, targets: dict[str, dict], action: str) -> dict:
+    """
+    Sends begin_start/begin_deallocate for the VMs of one subscription on a
+    shared client. ARM has no batch power API, so the requests go out from a
+    few threads at once.
+    """
+    compute = cloud_clients.azure_compute(subscription_id)
+    # deallocate rather than power off, so stopped VMs are not billed
+    begin = (
+        compute.virtual_machines.begin_start
+        if action == "start"
+        else compute.virtual_machines.begin_deallocate
+    )
+    bucket = rate_limit.azure(subscription_id, rate_limit.WRITE)
+
+    def fire(meta: dict) -> dict:
+        azure_vm_id = meta["azure_vm_id"]
+        _, rg, name = parse_azure_vm_id(azure_vm_id)
+        # sends the request and returns; the confirmer resumes from the token
+        poller = rate_limit.call(bucket, begin, rg, name, polling=_SendOnlyPolling())
+        return {
+            "azure_vm_id": azure_vm_id,
+            "subscription_id": subscription_id,
+            "lro_token": poller.continuation_token(),
+        }
+
+    with ThreadPoolExecutor(
+        max_workers=min(settings.power_op_azure_concurrency, len(targets)),
+        thread_name_prefix="power-fire",
+    ) as pool:
+        futures = {
+            resource_id: pool.submit(fire, meta)
+            for resource_id, meta in targets.items()
+        }
+    results: dict = {}
+    for resource_id, future in futures.items():
+        try:
+            results[resource_id] = future.result()
+        except Exception as e:
+            results[resource_id] = e
+    return results
+
+
+def _fire(targets: dict[str, dict], action: str) -> dict:
+    """
+    Requests `action` for many VMs (`targets` maps resource id to provider,
+    region and meta) with one call per AWS region and one client per Azure
+    subscription. Returns the handle, or the error, per resource id.
+    """
+    results: dict = {}
+    groups: dict[tuple, dict[str, dict]] = {}
+    for resource_id, target in targets.items():
+        meta = target["meta"]
+        if target["provider"] == "aws":
+            groups.setdefault((_fire_aws, target["region"]), {})[resource_id] = meta
+            continue
+        azure_vm_id = meta.get("azure_vm_id")
+        if not azure_vm_id:
+            results[resource_id] = PowerOpError("azure_vm_id missing")
+            continue
+        subscription_id, rg, name = parse_azure_vm_id(azure_vm_id)
+        if not all([subscription_id, rg, name]):
+            results[resource_id] = PowerOpError(
+                f"Failed to parse Azure VM ID: {azure_vm_id}"
+            )
+            continue
+        groups.setdefault((_fire_azure, subscription_id), {})[resource_id] = meta
+
+    for (fire, scope), group in groups.items():
+        try:
+            results.update(fire(scope, group, action))
+        except Exception as e:
+            results.update({resource_id: e for resource_id in group})
+    return results
+
+
+def _audit(
+    session, resource: Resource, user_id: str | None, action: str, details: dict
+) -> None:
+    session.add(
+        AuditEvent(
+            user_id=user_id,
+            project_id=resource.project_id,
+            action=action,
+            object_type="resource",
+            object_id=str(resource.id),
+            details=details,
+        )
+    )
+
+
+def _kick(countdown: float) -> None:
+    """Schedules an early confirmer run, at most one per countdown window."""
+    countdown = max(1, round(countdown))
+    r = get_redis()
+    if r is not None:
+        try:
+            if not r.set(_KICK_KEY, 1, nx=True, ex=countdown):
+                return
+        except Exception as e:
+            logger.debug(f"power op kick marker not set: {e}")
+    confirm_power_ops.apply_async(countdown=countdown)
+
+
+def begin_power_op(resource_id: str, user_id: str, provider: str, action: str) -> None:
+    """Fires a start/stop of a VM and hands the outcome to confirm_power_ops."""
+    begin_power_ops([resource_id], user_id, action, provider=provider)
+
+
+def begin_power_ops(
+    resource_ids: list[str],
+    user_id: str,
+    action: str,
+    provider: str | None = None,
+) -> None:
+    """
+    Fires a start/stop of many VMs, batched per region / subscription, and
+    hands the outcomes to confirm_power_ops: one commit before the cloud
+    calls, one after, one kick. No session is held while the calls run; the
+    results are applied to the rows, locked again, that still carry the
+    operation recorded before them. `provider`, when given, is what every
+    resource must be.
+    """
+    spec = ACTIONS[action]
+    requested_at = datetime.now(timezone.utc)
+    deadline = requested_at + timedelta(seconds=settings.power_op_timeout_seconds)
+    with SessionLocal() as session:
+        resources = (
+            session.query(Resource)
+            .filter(Resource.id.in_(resource_ids))
+            .order_by(Resource.id)
+            .all()
+        )
+        missing = set(map(str, resource_ids)) - {str(r.id) for r in resources}
+        for resource_id in missing:
+            logger.error(f"Resource {resource_id} not found for VM {action}.")
+
+        targets: dict[str, dict] = {}
+        target_ids = []
+        op_ids = {}
+        for resource in resources:
+            actual = resource.provider.value
+            prefix = AUDIT_PREFIX.get(actual, actual)
+            if actual not in FIRE_PROVIDERS or (provider and actual != provider):
+                expected = provider or "/".join(sorted(FIRE_PROVIDERS))
+                logger.error(f"Resource {resource.id} is not an {expected} resource.")
+                resource.state = spec.failed
+                resource.meta["error_message"] = f"Not an {expected} resource"
+                _audit(
+                    session,
+                    resource,
+                    user_id,
+                    f"{prefix}_{action}_failure_wrong_provider",
+                    {"error": resource.meta["error_message"]},
+                )
+                continue
+            if resource.state != spec.pending:
+                logger.warning(
+                    f"{prefix} {action} called for resource {resource.id} not in {spec.pending.name} state (current: {resource.state.value}). Proceeding cautiously."
+                )
+            targets[str(resource.id)] = {
+                "provider": actual,
+                "region": resource.region,
+                "meta": dict(resource.meta),
+            }
+            resource.state = spec.in_progress
+            # provisional until the calls return, so reconcile already leaves
+            # the row alone; without a handle the confirmer only fails it at
+            # the deadline, should this worker die before recording one
+            resource.meta["power_op"] = {
+                "id": uuid.uuid4().hex,
+                "provider": actual,
+                "action": action,
+                "requested_by": str(user_id),
+                "requested_at": requested_at.isoformat(),
+                "deadline": deadline.isoformat(),
+                "attempts": 0,
+                "next_check_at": deadline.isoformat(),
+            }
+            target_ids.append(resource.id)
+            op_ids[resource.id] = resource.meta["power_op"]["id"]
+        session.commit()
+    if not targets:
+        return
+    logger.info(f"{len(targets)} VM(s) set to {spec.in_progress.name}.")
+
+    handles = _fire(targets, action)
+
+    now = datetime.now(timezone.utc)
+    delay = settings.power_op_initial_delay_seconds
+    with SessionLocal() as session:
+        locked = (
+            session.query(Resource)
+            .filter(Resource.id.in_(target_ids))
+            .order_by(Resource.id)
+            .with_for_update()
+            .all()
+        )
+        for resource in locked:
+            target = targets[str(resource.id)]
+            op = (resource.meta or {}).get("power_op")
+            ours = op is not None and op["id"] == op_ids[resource.id]
+            if resource.state != spec.in_progress or not ours:
+                # overridden meanwhile (deleted, reset, another operation):
+                # whatever changed it owns the row now
+                logger.warning(
+                    f"Resource {resource.id} left {spec.in_progress.name} while its {action} was requested (now {resource.state.value}); result not applied."
+                )
+                if ours:
+                    resource.meta.pop("power_op")
+                continue
+            provider_name = target["provider"]
+            prefix = AUDIT_PREFIX[provider_name]
+            handle = handles[str(resource.id)]
+            if isinstance(handle, Exception):
+                logger.error(
+                    f"Error requesting {action} of {provider_name} VM {resource.id}: {handle}",
+                    exc_info=handle,
+                )
+                resource.state = spec.failed
+                resource.meta["error_message"] = str(handle)
+                resource.meta.pop("power_op", None)
+                _audit(
+                    session,
+                    resource,
+                    user_id,
+                    f"{prefix}_{action}_failure",
+                    {"error": str(handle), "final_state": resource.state.value},
+                )
+                continue
+
+            lro_token = handle.pop("lro_token", None)
+            resource.meta["power_op"] = {
+                **op,
+                "next_check_at": (now + timedelta(seconds=delay)).isoformat(),
+                "handle": handle,
+            }
+            if lro_token:
+                resource.meta["power_op"]["lro_token"] = lro_token
+            _audit(
+                session,
+                resource,
+                user_id,
+                f"{prefix}_{action}_requested",
+                {**handle, "state": resource.state.value},
+            )
+            logger.info(f"{provider_name} VM {resource.id} {action} requested.")
+        session.commit()
+    _kick(delay)
+
+
+@shared_task(name="cmp_core.tasks.bulk_power_op")
+def bulk_power_op_task(resource_ids: list[str], user_id: str, action: str):
+    """Start/stop of many VMs in one task (POST .../resources:bulk-action)."""
+    begin_power_ops(resource_ids, user_id, action)
+
+
+def _aws_states(region: str, aws_ids: list[str]) -> dict:
+    return fetch_aws_info_bulk(cloud_clients.ec2(region), aws_ids)
+
+
+def _lro_status(
+    compute: ComputeManagementClient,
+    azure_vm_id: str,
+    action: str,
+    token: str,
+    bucket: rate_limit.Bucket,
+) -> dict:
+    """One status GET of an ARM operation resumed from its continuation token."""
+    _, rg, name = parse_azure_vm_id(azure_vm_id)
+    begin = (
+        compute.virtual_machines.begin_start
+        if action == "start"
+        else compute.virtual_machines.begin_deallocate
+    )
+
+    def poll() -> dict:
+        poller = begin(
+            rg, name, continuation_token=token, polling=_StatusOncePolling(0)
+        )
+        try:
+            poller.wait()
+        except HttpResponseError as e:
+            if poller.status().lower() not in LRO_FAILED:
+                raise  # the status GET failed, not the operation
+            error = getattr(e.error, "message", None) or e.message
+            return {"lro_status": poller.status(), "lro_error": error}
+        return {"lro_status": poller.status()}
+
+    return rate_limit.call(bucket, poll)
+
+
+def _azure_states(subscription_id: str, vms: dict[str, tuple[str, str | None]]) -> dict:
+    """
+    Power state of many VMs of one subscription with a single paged list call,
+    plus the status of each VM's operation that has a continuation token
+    (`vms` maps VM id to (action, token)). A token that cannot be resumed only
+    loses the operation status; the power state still decides.
+    """
+    compute = cloud_clients.azure_compute(subscription_id)
+    bucket = rate_limit.azure(subscription_id, rate_limit.READ)
+    wanted = {vm_id.lower(): vm_id for vm_id in vms}
+    found = {
+        vm.id.lower(): {"power_state": _azure_power_state(vm.instance_view)}
+        for vm in rate_limit.call(
+            bucket, lambda: list(compute.virtual_machines.list_all(status_only="true"))
+        )
+        if vm.id and vm.id.lower() in wanted
+    }
+    states = {vm_id: found.get(key) for key, vm_id in wanted.items()}
+
+    ops = {vm_id: op for vm_id, op in vms.items() if op[1] and states[vm_id]}
+    if ops:
+        with ThreadPoolExecutor(
+            max_workers=min(settings.power_op_azure_concurrency, len(ops)),
+            thread_name_prefix="power-lro",
+        ) as pool:
+            futures = {
+                vm_id: pool.submit(_lro_status, compute, vm_id, action, token, bucket)
+                for vm_id, (action, token) in ops.items()
+            }
+        for vm_id, future in futures.items():
+            try:
+                states[vm_id].update(future.result())
+            except Exception as e:
+                logger.debug(f"Operation status of {vm_id} not resumed: {e}")
+    return states
+
+
+def _check(ops: dict[str, dict]) -> dict[str, dict | None | Exception]:
+    """Live info per operation id: a dict, None (VM not found) or the fetch error."""
+    aws: dict[str, list[str]] = {}
+    azure: dict[str, dict[str, tuple[str, str | None]]] = {}
+    for op in ops.values():
+        handle = op["handle"]
+        if op["provider"] == "aws":
+            aws.setdefault(handle["region"], []).append(handle["aws_id"])
+        else:
+            azure.setdefault(handle["subscription_id"], {})[handle["azure_vm_id"]] = (
+                op["action"],
+                op.get("lro_token"),
+            )
+
+    by_cloud_id: dict = {}
+    for fetch, groups in ((_aws_states, aws), (_azure_states, azure)):
+        for scope, cloud_ids in groups.items():
+            try:
+                by_cloud_id.update(fetch(scope, cloud_ids))
+            except Exception as e:
+                logger.warning(f"Power state check failed for {scope}: {e}")
+                by_cloud_id.update({cloud_id: e for cloud_id in cloud_ids})
+
+    return {
+        op_id: by_cloud_id.get(
+            op["handle"].get("aws_id") or op["handle"].get("azure_vm_id")
+        )
+        for op_id, op in ops.items()
+    }
+
+
+def _observed(op: dict, live: dict) -> ResourceState:
+    spec = ACTIONS[op["action"]]
+    if op["provider"] == "aws":
+        return AWS_STATES.get(live.get("state"), ResourceState.UNKNOWN)
+    return map_azure_power_state_to_resource_state(
+        live.get("power_state"), spec.in_progress
+    )
+
+
+def _outcome(
+    op: dict, live: dict | None | Exception, now: datetime
+) -> tuple[str, str | None]:
+    """("success" | "failure" | "timeout" | "wait", error message)."""
+    spec = ACTIONS[op["action"]]
+    if live is None:
+        return "failure", "VM not found in the cloud"
+    if not isinstance(live, Exception):
+        lro_status = live.get("lro_status")
+        if lro_status == "Succeeded":
+            return "success", None
+        if lro_status and lro_status.lower() in LRO_FAILED:
+            return "failure", live.get("lro_error") or f"Operation {lro_status}"
+        observed = _observed(op, live)
+        if observed == spec.target:
+            return "success", None
+        if observed == ResourceState.TERMINATED:
+            return "failure", "VM was terminated"
+        elapsed = (now - datetime.fromisoformat(op["requested_at"])).total_seconds()
+        if (
+            observed == spec.leaving
+            and elapsed > POWER_OP_SETTLE_SECONDS
+            and lro_status is None
+        ):
+            return "failure", f"VM still {observed.value} after {round(elapsed)}s"
+    if now >= datetime.fromisoformat(op["deadline"]):
+        return "timeout", f"VM did not reach {spec.target.value} in time"
+    return "wait", None
+
+
+def _backoff(attempts: int) -> float:
+    return min(
+        settings.power_op_initial_delay_seconds * 2**attempts,
+        settings.power_op_max_delay_seconds,
+    )
+
+
+@shared_task(name="cmp_core.tasks.confirm_power_ops")
+def confirm_power_ops():
+    """Checks due power operations in one batch and advances their state machine."""
+    r = get_redis()
+    if r is not None:
+        try:
+            r.delete(_KICK_KEY)  # this is the kicked run; later ones may kick again
+        except Exception as e:
+            logger.debug(f"power op kick marker not cleared: {e}")
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as session:
+        rows = (
+            session.query(Resource.id, Resource.meta)
+            .filter(
+                Resource.state.in_([ResourceState.STARTING, ResourceState.STOPPING])
+            )
+            .all()
+        )
+    due = {}
+    for resource_id, meta in rows:
+        op = (meta or {}).get("power_op")
+        if op and datetime.fromisoformat(op["next_check_at"]) <= now:
+            due[resource_id] = op
+    if not due:
+        return
+
+    # an operation without a handle was never recorded as sent (see
+    # begin_power_ops) and is only due once past its deadline
+    live = _check({op["id"]: op for op in due.values() if "handle" in op})
+    now = datetime.now(timezone.utc)
+
+    next_due = None
+    with SessionLocal() as session:
+        locked = (
+            session.query(Resource)
+            .filter(Resource.id.in_(list(due)))
+            .order_by(Resource.id)
+            .with_for_update()
+            .all()
+        )
+        for resource in locked:
+            op = (resource.meta or {}).get("power_op")
+            spec = ACTIONS[due[resource.id]["action"]]
+            if (
+                not op
+                or op["id"] != due[resource.id]["id"]
+                or resource.state != spec.in_progress
+            ):
+                continue  # finished, replaced or overridden meanwhile
+            if "handle" in op:
+                info = live[op["id"]]
+                outcome, error = _outcome(op, info, now)
+            else:
+                info = None
+                outcome = "timeout"
+                error = (
+                    f"VM {op['action']} was interrupted before it was confirmed as sent"
+                )
+
+            if outcome == "wait":
+                attempts = op["attempts"] + 1
+                next_check = now + timedelta(seconds=_backoff(attempts))
+                resource.meta["power_op"] = {
+                    **op,
+                    "attempts": attempts,
+                    "next_check_at": next_check.isoformat(),
+                }
+                next_due = min(next_due or next_check, next_check)
+                continue
+
+            prefix = AUDIT_PREFIX[op["provider"]]
+            elapsed = (now - datetime.fromisoformat(op["requested_at"])).total_seconds()
+            resource.meta.pop("power_op")
+            details = {**op.get("handle", {}), "attempts": op["attempts"] + 1}
+            if outcome == "success":
+                resource.state = spec.target
+                for key in ("public_ip", "launch_time", "power_state"):
+                    # the listed power state can lag an operation ARM reports done
+                    if key == "power_state" and _observed(op, info) != spec.target:
+                        continue
+                    if info.get(key):
+                        resource.meta[key] = info[key]
+                action = f"{prefix}_{op['action']}_success"
+            else:
+                resource.state = spec.failed
+                resource.meta["error_message"] = error
+                details["error"] = error
+                action = f"{prefix}_{op['action']}_{outcome}"
+                logger.warning(f"{prefix} {op['action']} of {resource.id}: {error}")
+            details["final_state"] = resource.state.value
+            _audit(session, resource, op["requested_by"], action, details)
+            metrics.observe(
+                "power_op_seconds",
+                elapsed,
+                provider=op["provider"],
+                action=op["action"],
+                outcome=outcome,
+            )
+        session.commit()
+
+    if next_due is not None:
+        wait = (next_due - datetime.now(timezone.utc)).total_seconds()
+        if wait < POWER_OP_BEAT_SECONDS:
+            _kick(wait)
@@ -1,24 +1,59 @@
 # cmp_core/tasks/pulumi.py
 
+import copy
 import logging
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 
-import boto3
 from azure.core.exceptions import ResourceNotFoundError  # Import the specific exception
 from azure.identity import DefaultAzureCredential
 from azure.mgmt.compute import ComputeManagementClient
 from azure.mgmt.network import NetworkManagementClient
+from botocore.exceptions import ClientError
 from celery import shared_task
+from cmp_core.core.config import settings
 from cmp_core.core.db_sync import SessionLocal
-from cmp_core.lib.pulumi_project import destroy_project, up_project
+from cmp_core.lib import cloud_clients, metrics, rate_limit, reconcile_events
+from cmp_core.lib.project_lock import ProjectLease
+from cmp_core.lib.pulumi_project import (
+    desired_fingerprint,
+    destroy_project,
+    migrate_to_partitioned_stacks,
+    project_stack_name,
+    stack_groups,
+    up_stack,
+)
+from cmp_core.lib.reconcile_queue import (
+    begin_reconcile,
+    finish_reconcile,
+    queue_status,
+    request_reconcile,
+    touch_running,
+)
+from cmp_core.lib.reconcile_schedule import ProjectRun, plan_cycle
 from cmp_core.models.audit import AuditEvent
-from cmp_core.models.project import Project
+from cmp_core.models.project import Project, ReconcileMode
+from cmp_core.models.pulumi_run import PulumiRun
 from cmp_core.models.resource import Resource, ResourceState
-from sqlalchemy import select
+from cmp_core.models.stack_state import StackState
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session  # selectinload for eager loading if needed
 
 logger = logging.getLogger(__name__)
-MAX_THREADS = 10  # можна налаштувати через конфіг
+MAX_THREADS = settings.reconcile_max_threads  # RECONCILE_MAX_THREADS
+
+# describe_instances accepts at most 1000 instance IDs per call
+AWS_DESCRIBE_BATCH_SIZE = 1000
+# EC2 allows at most 200 values in a single describe filter
+AWS_FILTER_BATCH_SIZE = 200
+
+
+class LiveStateNotFound(Exception):
+    """Raised when the cloud provider has no live record for a resource's cloud ID."""
 
 
 # Helper function to map Azure power states to your ResourceState enum
@@ -67,9 +102,7 @@ def load_resources(session: Session, project_id: str) -> list[Resource]:
     return session.query(Resource).filter_by(project_id=project_id).all()
 
 
-def fetch_aws_info(client, aws_id: str) -> dict:
-    resp = client.describe_instances(InstanceIds=[aws_id])
-    inst = resp["Reservations"][0]["Instances"][0]
+def _aws_instance_info(inst: dict) -> dict:
     return {
         "public_ip": inst.get("PublicIpAddress", ""),
         "launch_time": inst["LaunchTime"].isoformat(),
@@ -77,6 +110,63 @@ def fetch_aws_info(client, aws_id: str) -> dict:
     }
 
 
+def fetch_aws_info(client, aws_id: str) -> dict:
+    resp = rate_limit.call(
+        rate_limit.aws(client.meta.region_name, rate_limit.READ),
+        client.describe_instances,
+        InstanceIds=[aws_id],
+    )
+    inst = resp["Reservations"][0]["Instances"][0]
+    return _aws_instance_info(inst)
+
+
+def fetch_aws_info_bulk(client, aws_ids: list[str]) -> dict[str, dict | None]:
+    """
+    Fetches live info for many EC2 instances of a single region using paginated
+    describe_instances calls (up to AWS_DESCRIBE_BATCH_SIZE IDs per call).
+    Returns {aws_id: info}. IDs that EC2 did not return map to None, which
+    callers treat as "instance not found".
+    """
+    wanted = list(dict.fromkeys(aws_id for aws_id in aws_ids if aws_id))
+    found: dict[str, dict] = {}
+    paginator = client.get_paginator("describe_instances")
+    bucket = rate_limit.aws(client.meta.region_name, rate_limit.READ)
+
+    for start in range(0, len(wanted), AWS_DESCRIBE_BATCH_SIZE):
+        chunk = wanted[start : start + AWS_DESCRIBE_BATCH_SIZE]
+        try:
+            pages = rate_limit.call(
+                bucket, lambda: list(paginator.paginate(InstanceIds=chunk))
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in (
+                "InvalidInstanceID.NotFound",
+                "InvalidInstanceID.Malformed",
+            ):
+                raise
+            # A single unknown ID fails the whole InstanceIds call. An
+            # instance-id filter simply omits unknown IDs, so retry with that.
+            logger.info(
+                f"describe_instances rejected a batch of {len(chunk)} IDs ({e}). Retrying with instance-id filters."
+            )
+            pages = []
+            for f_start in range(0, len(chunk), AWS_FILTER_BATCH_SIZE):
+                values = chunk[f_start : f_start + AWS_FILTER_BATCH_SIZE]
+                filters = [{"Name": "instance-id", "Values": values}]
+                pages.extend(
+                    rate_limit.call(
+                        bucket, lambda: list(paginator.paginate(Filters=filters))
+                    )
+                )
+
+        for page in pages:
+            for reservation in page.get("Reservations", []):
+                for inst in reservation.get("Instances", []):
+                    found[inst["InstanceId"]] = _aws_instance_info(inst)
+
+    return {aws_id: found.get(aws_id) for aws_id in wanted}
+
+
 def parse_azure_vm_id(vm_id: str) -> tuple[str | None, str | None, str | None]:
     """
     Parses an Azure VM ID string into subscription ID, resource group name, and VM name.
@@ -122,6 +212,15 @@ def _get_rg_and_name_from_id(resource_id: str) -> tuple[str | None, str | None]:
         return None, None
 
 
+def _azure_power_state(instance_view) -> str:
+    """Returns the PowerState display status (e.g. "VM running") of an instance view."""
+    if instance_view and instance_view.statuses:
+        for status_obj in instance_view.statuses:
+            if status_obj.code and status_obj.code.lower().startswith("powerstate/"):
+                return status_obj.display_status
+    return "unknown"
+
+
 def fetch_azure_info(
     vm_id_str: str,
     cred: DefaultAzureCredential,
@@ -140,27 +239,23 @@ def fetch_azure_info(
         return {}
 
     compute = compute_clients.setdefault(
-        subscription_id, ComputeManagementClient(cred, subscription_id)
+        subscription_id, cloud_clients.azure_compute(subscription_id)
     )
     network = network_clients.setdefault(
-        subscription_id, NetworkManagementClient(cred, subscription_id)
+        subscription_id, cloud_clients.azure_network(subscription_id)
     )
 
+    bucket = rate_limit.azure(subscription_id, rate_limit.READ)
     try:
-        vm = compute.virtual_machines.get(
-            vm_resource_group_name, actual_vm_name_from_id, expand="instanceView"
+        vm = rate_limit.call(
+            bucket,
+            compute.virtual_machines.get,
+            vm_resource_group_name,
+            actual_vm_name_from_id,
+            expand="instanceView",
         )
 
-        power_state = "unknown"  # Default
-        if vm.instance_view and vm.instance_view.statuses:
-            for status_obj in vm.instance_view.statuses:  # Renamed status to status_obj
-                if status_obj.code and status_obj.code.lower().startswith(
-                    "powerstate/"
-                ):
-                    power_state = (
-                        status_obj.display_status
-                    )  # Use display_status which is like "VM running"
-                    break  # Found power state
+        power_state = _azure_power_state(vm.instance_view)
 
         public_ip_address = None
         if vm.network_profile and vm.network_profile.network_interfaces:
@@ -169,7 +264,9 @@ def fetch_azure_info(
                 nic_rg, nic_name = _get_rg_and_name_from_id(nic_ref.id)
                 if nic_rg and nic_name:
                     try:
-                        nic = network.network_interfaces.get(nic_rg, nic_name)
+                        nic = rate_limit.call(
+                            bucket, network.network_interfaces.get, nic_rg, nic_name
+                        )
                         if nic.ip_configurations:
                             ip_config = nic.ip_configurations[
                                 0
@@ -182,8 +279,11 @@ def fetch_azure_info(
                                     ip_config.public_ip_address.id
                                 )
                                 if pip_rg and pip_name:
-                                    pip = network.public_ip_addresses.get(
-                                        pip_rg, pip_name
+                                    pip = rate_limit.call(
+                                        bucket,
+                                        network.public_ip_addresses.get,
+                                        pip_rg,
+                                        pip_name,
                                     )
                                     public_ip_address = pip.ip_address
                     except Exception as e_pip:
@@ -216,6 +316,247 @@ def fetch_azure_info(
         return {}
 
 
+def fetch_azure_info_bulk(
+    subscription_id: str,
+    vm_ids: list[str],
+    compute: ComputeManagementClient,
+    network: NetworkManagementClient,
+) -> dict[str, dict | None]:
+    """
+    Fetches live info for many Azure VMs of one subscription with three paged
+    list calls (VMs with status, NICs, public IPs) joined in memory by ID,
+    instead of three ARM GETs per VM.
+    Returns {vm_id: info}. VMs that ARM did not list map to None (not found).
+    """
+    wanted = {vm_id.lower(): vm_id for vm_id in vm_ids if vm_id}
+    bucket = rate_limit.azure(subscription_id, rate_limit.READ)
+
+    vms = {
+        vm.id.lower(): vm
+        for vm in rate_limit.call(
+            bucket, lambda: list(compute.virtual_machines.list_all(status_only="true"))
+        )
+        if vm.id and vm.id.lower() in wanted
+    }
+
+    # primary NIC per VM; NICs reference their VM, so no per-VM NIC lookup is needed
+    nic_by_vm: dict = {}
+    for nic in rate_limit.call(
+        bucket, lambda: list(network.network_interfaces.list_all())
+    ):
+        vm_ref = nic.virtual_machine.id.lower() if nic.virtual_machine else None
+        if vm_ref not in vms:
+            continue
+        if vm_ref not in nic_by_vm or nic.primary:
+            nic_by_vm[vm_ref] = nic
+
+    ip_by_pip_id = {
+        pip.id.lower(): pip.ip_address
+        for pip in rate_limit.call(
+            bucket, lambda: list(network.public_ip_addresses.list_all())
+        )
+        if pip.id
+    }
+
+    live_states: dict[str, dict | None] = {}
+    for vm_key, vm_id in wanted.items():
+        vm = vms.get(vm_key)
+        if vm is None:
+            live_states[vm_id] = None
+            continue
+
+        public_ip_address = None
+        nic = nic_by_vm.get(vm_key)
+        if nic and nic.ip_configurations:
+            ip_config = nic.ip_configurations[0]  # Assuming first IP config
+            if ip_config.public_ip_address and ip_config.public_ip_address.id:
+                public_ip_address = ip_by_pip_id.get(
+                    ip_config.public_ip_address.id.lower()
+                )
+
+        _, vm_resource_group_name, _ = parse_azure_vm_id(vm.id)
+        live_states[vm_id] = {
+            "azure_vm_id": vm.id,
+            "actual_vm_name": vm.name,
+            "power_state": _azure_power_state(vm.instance_view),
+            "public_ip": public_ip_address,
+            "subscription_id": subscription_id,
+            "resource_group_name": vm_resource_group_name,
+            "location": vm.location,
+        }
+    return live_states
+
+
+def _live_state_targets(
+    resources: list[Resource], outputs: dict
+) -> tuple[dict[str, list[str]], dict[str, list[str]]]:
+    """
+    Returns the cloud IDs that need a live-state fetch, grouped as
+    ({aws_region: [aws_id]}, {azure_subscription_id: [azure_vm_id]}).
+    """
+    aws_ids_by_region: dict[str, list[str]] = {}
+    azure_ids_by_subscription: dict[str, list[str]] = {}
+    for res in resources:
+        # reconcile_single settles these from the outputs alone
+        if res.state == ResourceState.DEPROVISIONING:
+            continue
+        cloud_id = outputs.get(f"{res.name}-id")
+        if not cloud_id:
+            continue
+        if res.provider.value == "aws":
+            aws_ids_by_region.setdefault(res.region, []).append(cloud_id)
+        elif res.provider.value == "azure":
+            subscription_id, _, _ = parse_azure_vm_id(cloud_id)
+            if subscription_id:
+                azure_ids_by_subscription.setdefault(subscription_id, []).append(
+                    cloud_id
+                )
+    return aws_ids_by_region, azure_ids_by_subscription
+
+
+def prefetch_live_states(
+    resources: list[Resource],
+    outputs: dict,
+    ec2_clients: dict,
+    azure_cred: DefaultAzureCredential,
+    azure_compute_clients: dict,
+    azure_network_clients: dict,
+) -> dict:
+    """
+    Fetches the live state of every resource of a project concurrently and
+    returns a {cloud_id: live_info} map for reconcile_single.
+
+    One bulk sweep runs per AWS region / Azure subscription on a bounded thread
+    pool (MAX_THREADS), with per-provider caps so we stay under API throttling.
+    If a bulk sweep fails, its resources are fetched one by one on the same pool.
+    Values are the live info dict, None when the cloud does not know the
+    resource, or the exception raised while fetching it.
+
+    Only cloud calls run on the pool; callers keep all ORM mutation and
+    AuditEvent creation on the session's thread.
+    """
+    aws_targets, azure_targets = _live_state_targets(resources, outputs)
+    if not aws_targets and not azure_targets:
+        return {}
+
+    # the process-wide clients (lib/cloud_clients), looked up once per run
+    for region in aws_targets:
+        ec2_clients.setdefault(region, cloud_clients.ec2(region))
+    for subscription_id in azure_targets:
+        azure_compute_clients.setdefault(
+            subscription_id, cloud_clients.azure_compute(subscription_id)
+        )
+        azure_network_clients.setdefault(
+            subscription_id, cloud_clients.azure_network(subscription_id)
+        )
+
+    provider_slots = {
+        "aws": threading.BoundedSemaphore(settings.reconcile_aws_concurrency),
+        "azure": threading.BoundedSemaphore(settings.reconcile_azure_concurrency),
+    }
+
+    def _limited(provider: str, fn, *args):
+        with provider_slots[provider]:
+            return fn(*args)
+
+    live_states: dict = {}
+    with ThreadPoolExecutor(
+        max_workers=MAX_THREADS, thread_name_prefix="reconcile-live"
+    ) as pool:
+        bulk_futures = {}
+        for region, aws_ids in aws_targets.items():
+            future = pool.submit(
+                _limited, "aws", fetch_aws_info_bulk, ec2_clients[region], aws_ids
+            )
+            bulk_futures[future] = ("aws", region, aws_ids)
+        for subscription_id, vm_ids in azure_targets.items():
+            future = pool.submit(
+                _limited,
+                "azure",
+                fetch_azure_info_bulk,
+                subscription_id,
+                vm_ids,
+                azure_compute_clients[subscription_id],
+                azure_network_clients[subscription_id],
+            )
+            bulk_futures[future] = ("azure", subscription_id, vm_ids)
+
+        single_futures = {}
+        for future in as_completed(bulk_futures):
+            provider, scope, cloud_ids = bulk_futures[future]
+            try:
+                live_states.update(future.result())
+                continue
+            except Exception as e:
+                logger.error(
+                    f"Bulk live-state fetch failed for {provider} {scope}: {e}. Falling back to per-resource fetches.",
+                    exc_info=True,
+                )
+            for cloud_id in cloud_ids:
+                if provider == "aws":
+                    single = pool.submit(
+                        _limited, "aws", fetch_aws_info, ec2_clients[scope], cloud_id
+                    )
+                else:
+                    single = pool.submit(
+                        _limited,
+                        "azure",
+                        fetch_azure_info,
+                        cloud_id,
+                        azure_cred,
+                        azure_compute_clients,
+                        azure_network_clients,
+                    )
+                single_futures[single] = cloud_id
+
+        for future in as_completed(single_futures):
+            cloud_id = single_futures[future]
+            try:
+                live_states[cloud_id] = future.result()
+            except ResourceNotFoundError:
+                live_states[cloud_id] = None
+            except Exception as e:
+                live_states[cloud_id] = e
+
+    return live_states
+
+
+def _prefetched(live_states: dict, cloud_id: str) -> dict:
+    """The prefetched live info of `cloud_id`; raises what the fetch reported."""
+    live_info = live_states.get(cloud_id)
+    if live_info is None:
+        raise LiveStateNotFound(cloud_id)
+    if isinstance(live_info, Exception):
+        raise live_info
+    return live_info
+
+
+def _dispatch_auto_heal(
+    resource_id: str, provider: str, audit_user_id: str, action: str
+) -> None:
+    """
+    Sends the start or stop task that brings a resource back to its recorded
+    state (`action` is the event's auto_heal_action). Called after commit.
+    """
+    if action == "start_triggered":
+        from cmp_core.tasks.azure import start_azure_task
+        from cmp_core.tasks.ec2 import start_ec2_task
+
+        tasks = {"aws": start_ec2_task, "azure": start_azure_task}
+    else:
+        from cmp_core.tasks.azure import stop_azure_task
+        from cmp_core.tasks.ec2 import stop_ec2_task
+
+        tasks = {"aws": stop_ec2_task, "azure": stop_azure_task}
+    task = tasks.get(provider)
+    if task is None:
+        logger.error(
+            f"Auto-healing: Unknown provider {provider} for resource {resource_id}."
+        )
+        return
+    task.delay(resource_id, audit_user_id)
+
+
 def reconcile_single(
     resource: Resource,
     outputs: dict,  # Pulumi outputs
@@ -223,7 +564,21 @@ def reconcile_single(
     azure_cred: DefaultAzureCredential,
     azure_compute_clients: dict,
     azure_network_clients: dict,
+    live_states: dict | None = None,
 ) -> tuple[Resource, AuditEvent] | None:
+    """
+    Syncs one resource with the Pulumi outputs and its live cloud state.
+    `live_states` is an optional precomputed {cloud_id: info} map (see
+    prefetch_live_states); an entry of None means the cloud reported the
+    resource as not found, an exception entry means the fetch failed.
+    With a map, IDs missing from it (an Azure ID that does not parse) count as
+    not found, so no cloud call runs under the caller's row locks; without
+    one each resource is fetched individually.
+
+    Auto-heal start/stop tasks are not sent from here: the event records them
+    in `auto_heal_action` and the caller dispatches them (_dispatch_auto_heal)
+    once its transaction has committed.
+    """
     meta = (resource.meta or {}).copy()
     original_db_state = (
         resource.state
@@ -236,6 +591,15 @@ def reconcile_single(
         f"Reconciling single resource: {resource.name} (ID: {resource.id}), original DB state: {original_db_state.value}"
     )
 
+    # start/stop in flight: confirm_power_ops owns the state until it settles
+    if original_db_state in (ResourceState.STARTING, ResourceState.STOPPING) and (
+        resource.meta or {}
+    ).get("power_op"):
+        logger.info(
+            f"Resource {resource.name} has a {original_db_state.value} power operation in flight; leaving it to the confirmer."
+        )
+        return None
+
     # --- Handle DEPROVISIONING state ---
     if original_db_state == ResourceState.DEPROVISIONING:
         event_action = "deprovision_reconcile"
@@ -375,12 +739,15 @@ def reconcile_single(
         new_resource_state = ResourceState.UNKNOWN  # Default
 
         if resource.provider.value == "aws":
-            client = ec2_clients.setdefault(
-                resource.region, boto3.client("ec2", region_name=resource.region)
-            )
-            live_info = fetch_aws_info(
-                client, cloud_id_from_outputs
-            )  # cloud_id_from_outputs is aws_id
+            if live_states is not None:
+                live_info = _prefetched(live_states, cloud_id_from_outputs)
+            else:
+                client = ec2_clients.setdefault(
+                    resource.region, cloud_clients.ec2(resource.region)
+                )
+                live_info = fetch_aws_info(
+                    client, cloud_id_from_outputs
+                )  # cloud_id_from_outputs is aws_id
 
             # Update meta from live_info (AWS)
             if (
@@ -414,12 +781,15 @@ def reconcile_single(
                 new_resource_state = ResourceState.UNKNOWN
 
         elif resource.provider.value == "azure":
-            live_info = fetch_azure_info(
-                cloud_id_from_outputs,
-                azure_cred,
-                azure_compute_clients,
-                azure_network_clients,
-            )  # cloud_id_from_outputs is azure_vm_id
+            if live_states is not None:
+                live_info = _prefetched(live_states, cloud_id_from_outputs)
+            else:
+                live_info = fetch_azure_info(
+                    cloud_id_from_outputs,
+                    azure_cred,
+                    azure_compute_clients,
+                    azure_network_clients,
+                )  # cloud_id_from_outputs is azure_vm_id
 
             # Update meta from live_info (Azure) - more detailed updates
             for key in [
@@ -495,26 +865,7 @@ def reconcile_single(
             logger.warning(
                 f"Resource {resource.name} (DB state: RUNNING) found STOPPED in cloud. Triggering auto-start."
             )
-            # Ensure audit_user_id is a string for the task signature
-            audit_user_id = str(
-                getattr(resource, "created_by", "system_reconciliation")
-            )
-
-            if resource.provider.value == "aws":
-                from cmp_core.tasks.ec2 import start_ec2_task
-
-                start_ec2_task.delay(str(resource.id), audit_user_id)
-            elif resource.provider.value == "azure":
-                from cmp_core.tasks.azure import (  # Assuming start_azure_task exists
-                    start_azure_task,
-                )
-
-                start_azure_task.delay(str(resource.id), audit_user_id)
-            else:
-                logger.error(
-                    f"Auto-healing: Unknown provider {resource.provider.value} for resource {resource.name} to start."
-                )
-
+            # sent by the caller after commit, see _dispatch_auto_heal
             event_action = "reconcile_auto_heal_start_triggered"
             event_details["auto_heal_action"] = "start_triggered"
             event_details["cloud_state_detected"] = new_resource_state.value
@@ -529,26 +880,7 @@ def reconcile_single(
             logger.warning(
                 f"Resource {resource.name} (DB state: STOPPED) found RUNNING in cloud. Triggering auto-stop."
             )
-            # Ensure audit_user_id is a string for the task signature
-            audit_user_id = str(
-                getattr(resource, "created_by", "system_reconciliation")
-            )
-
-            if resource.provider.value == "aws":
-                from cmp_core.tasks.ec2 import stop_ec2_task
-
-                stop_ec2_task.delay(str(resource.id), audit_user_id)
-            elif resource.provider.value == "azure":
-                from cmp_core.tasks.azure import (  # Assuming stop_azure_task exists
-                    stop_azure_task,
-                )
-
-                stop_azure_task.delay(str(resource.id), audit_user_id)
-            else:
-                logger.error(
-                    f"Auto-healing: Unknown provider {resource.provider.value} for resource {resource.name} to stop."
-                )
-
+            # sent by the caller after commit, see _dispatch_auto_heal
             event_action = "reconcile_auto_heal_stop_triggered"
             event_details["auto_heal_action"] = "stop_triggered"
             event_details["cloud_state_detected"] = new_resource_state.value
@@ -566,8 +898,9 @@ def reconcile_single(
             event_action = "reconcile_state_sync_from_cloud"
 
     except (
-        ResourceNotFoundError
-    ):  # Specifically for Azure if fetch_azure_info raises it
+        ResourceNotFoundError,  # Azure, raised by fetch_azure_info
+        LiveStateNotFound,  # missing from a bulk live-state response
+    ):
         logger.warning(
             f"Resource {resource.name} (ID: {cloud_id_from_outputs}) not found in cloud during live fetch. Marking as error."
         )
@@ -575,6 +908,8 @@ def reconcile_single(
             ResourceState.ERROR
         )  # Or a more specific error like ERROR_PROVISIONING if original_db_state was PROVISIONING
         meta["cloud_id_status"] = "not_found_live"
+        event_action = "reconcile_live_not_found"
+        event_details["live_state"] = "not_found"
         changed = True
     except Exception as e:
         logger.error(
@@ -618,11 +953,287 @@ def reconcile_single(
     return resource, event
 
 
+# States only the IaC engine can converge. In-progress and failed IaC states are
+# included so a run that crashed or failed is retried, as before.
+IAC_PENDING_STATES = [
+    ResourceState.PENDING_PROVISION,
+    ResourceState.PENDING_UPDATE,
+    ResourceState.PENDING_DEPROVISION,
+    ResourceState.PROVISIONING,
+    ResourceState.UPDATING,
+    ResourceState.DEPROVISIONING,
+    ResourceState.ERROR_PROVISIONING,
+    ResourceState.ERROR_UPDATING,
+    ResourceState.ERROR_DEPROVISIONING,
+]
+
+
+def _cloud_id_from_meta(resource: Resource) -> str | None:
+    meta = resource.meta or {}
+    if resource.provider.value == "aws":
+        return meta.get("aws_id")
+    if resource.provider.value == "azure":
+        return meta.get("azure_vm_id")
+    return None
+
+
+def _needs_iac(resource: Resource) -> bool:
+    """True if the resource has desired-state changes that need a Pulumi up."""
+    if resource.state == ResourceState.TERMINATED:
+        return False
+    if resource.state in IAC_PENDING_STATES:
+        return True
+    # never got a cloud ID recorded, so Pulumi has not created it yet
+    return not _cloud_id_from_meta(resource)
+
+
+# settled states: only a change made outside the platform moves a resource out
+# of them during a reconcile
+_DRIFT_FROM = {ResourceState.RUNNING.value, ResourceState.STOPPED.value}
+
+
+def _drift_check_due(stack_state: StackState | None) -> bool:
+    if stack_state is None or stack_state.last_up_at is None:
+        return True
+    interval = timedelta(minutes=settings.reconcile_drift_check_interval_minutes)
+    return datetime.now(timezone.utc) - stack_state.last_up_at >= interval
+
+
+def _outputs_from_meta(resources: list[Resource]) -> dict:
+    """Builds Pulumi-output-shaped data from the cloud IDs/IPs stored in meta."""
+    outputs = {}
+    for res in resources:
+        cloud_id = _cloud_id_from_meta(res)
+        if cloud_id:
+            outputs[f"{res.name}-id"] = cloud_id
+            outputs[f"{res.name}-ip"] = (res.meta or {}).get("public_ip")
+    return outputs
+
+
+def _migrate_to_partitions(project_id: str, lease: ProjectLease) -> bool:
+    """
+    With partitioning on, moves state still held by the project's monolithic
+    stack into its partition stacks. Runs before the plan phase and holds no
+    session while Pulumi works. Once done (or if there was nothing to move)
+    a StackState row is recorded for every partition, so later runs skip the
+    check. Returns False if the move failed and this run must keep using the
+    monolithic stack; the next run retries it.
+    """
+    if not settings.pulumi_stack_partitioning:
+        return True
+    monolith = project_stack_name(project_id)
+    with SessionLocal() as session:
+        known = set(
+            session.scalars(
+                select(StackState.stack_name).filter_by(project_id=project_id)
+            )
+        )
+        # projects reconciled before stack_states existed have no rows at all
+        if known and monolith not in known:
+            return True
+        resources = [
+            _snapshot(res)
+            for res in session.query(Resource).filter_by(project_id=project_id)
+        ]
+    if not resources:
+        return True
+
+    try:
+        moved = migrate_to_partitioned_stacks(project_id, resources)
+    except Exception as e:
+        logger.error(
+            f"Could not move project {project_id} to partitioned stacks, keeping {monolith}: {e}",
+            exc_info=True,
+        )
+        return False
+    if moved:
+        logger.info(f"Moved stack {monolith} of project {project_id} into {moved}")
+
+    with SessionLocal() as session:
+        session.execute(delete(StackState).where(StackState.stack_name == monolith))
+        for name in stack_groups(project_id, resources):
+            if name not in known:
+                session.add(StackState(stack_name=name, project_id=project_id))
+        lease.fence(session)
+        session.commit()
+    return True
+
+
+def _up_stacks(
+    project_id: str,
+    programs: dict[str, list],
+    targets: dict[str, list],
+    last_fingerprints: dict[str, str | None],
+    mode: str,
+    drift_due: dict[str, bool],
+    runs: dict[str, dict],
+) -> dict[str, dict | Exception]:
+    """
+    Runs `up_stack` for each stack, concurrently; stacks in `targets` get a
+    targeted run. Failures are returned, not raised. Each stack's start time
+    and phase timings are collected into `runs`; engine steps and stack
+    results are published as live reconcile progress.
+    """
+    for name in programs:
+        runs[name] = {"started_at": datetime.now(timezone.utc)}
+
+    def run(name: str) -> dict:
+        stats = runs[name]
+        start = time.monotonic()
+        try:
+            return up_stack(
+                name,
+                programs[name],
+                last_fingerprint=last_fingerprints.get(name),
+                targets=targets.get(name),
+                mode=mode,
+                drift_check=drift_due[name],
+                stats=stats,
+                on_step=lambda step: reconcile_events.publish(
+                    project_id, "step", stack=name, **step
+                ),
+            )
+        except Exception as e:
+            reconcile_events.publish(
+                project_id, "stack", stack=name, status="failed", error=str(e)
+            )
+            raise
+        else:
+            reconcile_events.publish(project_id, "stack", stack=name, status="ok")
+        finally:
+            stats["total_seconds"] = time.monotonic() - start
+
+    results: dict[str, dict | Exception] = {}
+    if len(programs) == 1:
+        (name,) = programs
+        try:
+            results[name] = run(name)
+        except Exception as e:
+            results[name] = e
+        return results
+
+    workers = min(len(programs), settings.pulumi_max_parallel_stacks)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run, name): name for name in programs}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+    return results
+
+
+def enqueue_reconcile(project_id: str, countdown: float = 0) -> None:
+    """
+    Queues a reconcile for the project, to start in `countdown` seconds,
+    unless one is already queued to start no later. Requests made while a
+    reconcile runs collapse into a single follow-up run.
+    """
+    if request_reconcile(project_id, delay=countdown):
+        reconcile_project.apply_async((project_id,), countdown=countdown or None)
+    else:
+        logger.info(f"Reconcile for project {project_id} already queued; coalesced.")
+
+
 @shared_task(name="cmp_core.tasks.reconcile_project")
 def reconcile_project(project_id: str):
+    if not begin_reconcile(project_id):
+        logger.info(
+            f"Reconcile for project {project_id} already running; follow-up recorded."
+        )
+        return
+    lease = ProjectLease(project_id, on_renew=lambda: touch_running(project_id))
+    try:
+        # do not hold a worker slot waiting; the follow-up below retries later
+        if not lease.acquire(wait_seconds=0):
+            logger.warning(
+                f"Reconcile lease for project {project_id} is held elsewhere; retrying later."
+            )
+            request_reconcile(project_id, delay=settings.reconcile_lock_wait_seconds)
+            return
+        with lease:
+            started = datetime.now(timezone.utc)
+            _record_run(project_id, last_reconcile_started_at=started)
+            try:
+                _reconcile_project(project_id, lease)
+            finally:
+                finished = datetime.now(timezone.utc)
+                seconds = (finished - started).total_seconds()
+                _record_run(
+                    project_id,
+                    last_reconcile_finished_at=finished,
+                    last_reconcile_seconds=seconds,
+                )
+                metrics.observe("reconcile_seconds", seconds)
+    finally:
+        due_at = finish_reconcile(project_id)
+        if due_at is not None:
+            logger.info(
+                f"Requests arrived during reconcile of {project_id}; dispatching follow-up."
+            )
+            countdown = max(0.0, due_at - time.time())
+            reconcile_project.apply_async((project_id,), countdown=countdown or None)
+
+
+def _record_run(project_id: str, **values) -> None:
+    """Stores reconcile bookkeeping on the project row (see lib/reconcile_schedule)."""
+    try:
+        with SessionLocal() as session:
+            session.execute(
+                update(Project).where(Project.id == project_id).values(**values)
+            )
+            session.commit()
+    except Exception as e:
+        logger.warning(f"Could not record reconcile run of project {project_id}: {e}")
+
+
+def _state_change(resource: Resource, before: ResourceState) -> dict:
+    """A `state` progress event, built before commit expires the row."""
+    return {
+        "resource_id": resource.id,
+        "name": resource.name,
+        "provider": resource.provider.value,
+        "before": before.value,
+        "state": resource.state.value,
+    }
+
+
+def _snapshot(resource: Resource) -> SimpleNamespace:
+    """Detached copy of the fields the Pulumi program and live-state sync read."""
+    return SimpleNamespace(
+        id=resource.id,
+        project_id=resource.project_id,
+        name=resource.name,
+        provider=resource.provider,
+        region=resource.region,
+        state=resource.state,
+        meta=copy.deepcopy(dict(resource.meta or {})),
+        created_by=resource.created_by,
+    )
+
+
+def _reconcile_project(project_id: str, lease: ProjectLease):
+    """
+    Reconciles a project in three phases so that no DB connection is held
+    while Pulumi or the cloud APIs are working:
+
+    1. plan: load resources, move pending states to in-progress, commit and
+       snapshot everything the IaC engine needs as plain data;
+    2. run: Pulumi up and live-state fetch on the snapshots, without a session;
+    3. apply: a short transaction that locks the resource rows (FOR UPDATE)
+       and applies results to rows whose state is still the snapshotted one.
+       Rows changed meanwhile are left for the reconcile their change queued.
+
+    State still held by a monolithic stack is moved into the partition stacks
+    before phase 1, also without a session held (see _migrate_to_partitions).
+    """
     logger.info(f"Start reconcile for project {project_id}")
-    with SessionLocal() as session:
-        try:
+    try:
+        partitioned = _migrate_to_partitions(project_id, lease)
+
+        # ── phase 1: plan ────────────────────────────────────────────────────
+        with SessionLocal() as session:
             resources_to_process = (
                 session.query(Resource).filter_by(project_id=project_id).all()
             )
@@ -632,71 +1243,173 @@ def reconcile_project(project_id: str):
                 )
                 return
 
-            # Update states to "in-progress" before calling Pulumi
-            resources_for_pulumi_program = []
-            for res in resources_to_process:
-                if res.state == ResourceState.PENDING_PROVISION:
-                    res.state = ResourceState.PROVISIONING
-                    session.add(res)
-                    logger.info(
-                        f"Resource {res.name} state PENDING_PROVISION -> PROVISIONING"
-                    )
-                elif res.state == ResourceState.PENDING_UPDATE:
-                    res.state = ResourceState.UPDATING
-                    session.add(res)
-                    logger.info(f"Resource {res.name} state PENDING_UPDATE -> UPDATING")
-                elif res.state == ResourceState.PENDING_DEPROVISION:
-                    res.state = ResourceState.DEPROVISIONING
-                    session.add(res)
-                    logger.info(
-                        f"Resource {res.name} state PENDING_DEPROVISION -> DEPROVISIONING"
-                    )
-
-                # The _inline_program will skip DEPROVISIONING and TERMINATED states.
-                # For other states (RUNNING, STOPPED, ERROR, PROVISIONING, UPDATING), they are included.
-                if res.state not in [
-                    ResourceState.TERMINATED
-                ]:  # TERMINATED definitely skip
-                    # Pass the state that Pulumi will see (e.g. PROVISIONING, not PENDING_PROVISION)
-                    # We need to create a temporary representation or ensure _inline_program uses the current session's view
-                    # For simplicity, let's assume _inline_program gets the updated state if we commit before up_project
-                    # OR, pass a list of dicts/SimpleNamespace with the state set correctly.
-                    # For now, let's assume the objects in resources_to_process reflect the new in-progress state.
-                    resources_for_pulumi_program.append(res)
-
-            session.commit()  # Commit state changes before calling Pulumi
+            stack_states = {
+                st.stack_name: st
+                for st in session.query(StackState).filter_by(project_id=project_id)
+            }
+            if partitioned:
+                groups = stack_groups(project_id, resources_to_process)
+            else:
+                groups = {project_stack_name(project_id): resources_to_process}
+            drift_due = {
+                name: _drift_check_due(stack_states.get(name)) for name in groups
+            }
+            # stacks with pending changes, plus those whose drift check is due
+            dirty = [
+                name
+                for name, group in groups.items()
+                if any(_needs_iac(res) for res in group)
+                or (
+                    drift_due[name]
+                    and any(res.state != ResourceState.TERMINATED for res in group)
+                )
+            ]
+            # Between full drift passes only the resources with pending
+            # changes (and what their handlers declare) are refreshed/updated
+            targeted = {
+                name: {res.id for res in groups[name] if _needs_iac(res)}
+                for name in dirty
+                if settings.pulumi_targeted_updates and not drift_due[name]
+            }
+            last_fingerprints = {
+                name: st.desired_fingerprint for name, st in stack_states.items()
+            }
+            project = session.get(Project, project_id)
+            mode = project.reconcile_mode if project else ReconcileMode.refresh_then_up
 
+            # Update states to "in-progress" before calling Pulumi
+            transitions = []
+            for name in dirty:
+                for res in groups[name]:
+                    before = res.state
+                    if res.state == ResourceState.PENDING_PROVISION:
+                        res.state = ResourceState.PROVISIONING
+                        logger.info(
+                            f"Resource {res.name} state PENDING_PROVISION -> PROVISIONING"
+                        )
+                    elif res.state == ResourceState.PENDING_UPDATE:
+                        res.state = ResourceState.UPDATING
+                        logger.info(
+                            f"Resource {res.name} state PENDING_UPDATE -> UPDATING"
+                        )
+                    elif res.state == ResourceState.PENDING_DEPROVISION:
+                        res.state = ResourceState.DEPROVISIONING
+                        logger.info(
+                            f"Resource {res.name} state PENDING_DEPROVISION -> DEPROVISIONING"
+                        )
+                    if res.state != before:
+                        transitions.append(_state_change(res, before))
+            if session.dirty or session.deleted:
+                lease.fence(session)
+                session.commit()  # Commit state changes before calling Pulumi
+
+            reconcile_events.publish(
+                project_id, "reconcile", status="started", stacks=dirty
+            )
+            for change in transitions:
+                reconcile_events.publish(project_id, "state", **change)
+
+            snapshots = {
+                name: [_snapshot(res) for res in group]
+                for name, group in groups.items()
+            }
+        # the session is closed and its connection back in the pool from here on
+
+        # ── phase 2: run ─────────────────────────────────────────────────────
+        pulumi_outputs = {}
+        for name, group in snapshots.items():
+            if name not in dirty:
+                # Fast path: nothing for the IaC engine to converge, so only
+                # sync live cloud state. The cloud IDs come from what earlier
+                # runs stored in meta instead of from Pulumi outputs.
+                pulumi_outputs.update(_outputs_from_meta(group))
+
+        skipped = set()
+        finished_full = {}
+        runs: dict[str, dict] = {}
+        results: dict[str, dict | Exception] = {}
+        if dirty:
             logger.info(
-                f"Running Pulumi up for project {project_id} with {len(resources_for_pulumi_program)} relevant resources."
+                f"Pulumi run required for project {project_id} on stacks: {dirty}"
             )
-            pulumi_outputs = up_project(
-                project_id, resources_for_pulumi_program
-            )  # Pass the filtered/state-updated list
+            # The _inline_program will skip DEPROVISIONING and TERMINATED states.
+            # For other states (RUNNING, STOPPED, ERROR, PROVISIONING, UPDATING), they are included.
+            programs = {
+                name: [
+                    snap
+                    for snap in snapshots[name]
+                    if snap.state != ResourceState.TERMINATED
+                ]
+                for name in dirty
+            }
+            targets = {
+                name: [snap for snap in snapshots[name] if snap.id in ids]
+                for name, ids in targeted.items()
+            }
+            results = _up_stacks(
+                project_id, programs, targets, last_fingerprints, mode, drift_due, runs
+            )
+            for name, result in results.items():
+                if isinstance(result, Exception):
+                    # leave this stack's resources untouched; their in-progress
+                    # states make the next reconcile retry the stack
+                    logger.error(
+                        f"Pulumi up of stack {name} failed for project {project_id}: {result}",
+                        exc_info=result,
+                    )
+                    skipped.update(snap.id for snap in snapshots[name])
+                    continue
+                logger.info(f"Pulumi up finished for stack {name}. Outputs: {result}")
+                pulumi_outputs.update(result)
+                # the drift cadence and fingerprint track full passes only
+                if name not in targets:
+                    finished_full[name] = desired_fingerprint(programs[name])
+        else:
             logger.info(
-                f"Pulumi up finished for project {project_id}. Outputs: {pulumi_outputs}"
+                f"No pending work for project {project_id}. Skipping Pulumi, syncing live state only."
             )
 
-            # Re-fetch resources to ensure we have the latest state from the DB after commit and before reconcile_single
-            # This is important if reconcile_single runs much later or in a different context.
-            # However, since we are in the same session block, resources_to_process should be fine.
-            # For safety, one might re-query, but let's proceed with current objects.
+        to_sync = {
+            snap.id: snap
+            for group in snapshots.values()
+            for snap in group
+            if snap.id not in skipped
+        }
 
-            ec2_clients: dict = {}
-            azure_cred = DefaultAzureCredential()
-            azure_compute_clients: dict = {}
-            azure_network_clients: dict = {}
+        ec2_clients: dict = {}
+        azure_cred = cloud_clients.azure_credential()
+        azure_compute_clients: dict = {}
+        azure_network_clients: dict = {}
+
+        # bulk sweeps per AWS region / Azure subscription, fetched concurrently;
+        # reconcile_single below then runs against the map
+        live_states = prefetch_live_states(
+            list(to_sync.values()),
+            pulumi_outputs,
+            ec2_clients,
+            azure_cred,
+            azure_compute_clients,
+            azure_network_clients,
+        )
 
+        # ── phase 3: apply ───────────────────────────────────────────────────
+        with SessionLocal() as session:
+            locked = (
+                session.query(Resource)
+                .filter(Resource.id.in_(list(to_sync)))
+                .order_by(Resource.id)
+                .with_for_update()
+                .all()
+            )
             updated_resources_events = []
-            for (
-                resource_obj
-            ) in (
-                resources_to_process
-            ):  # Iterate over all original resources for the project
-                # The resource_obj here still has its state as it was *after* the pre-Pulumi update (e.g. PROVISIONING)
+            for resource_obj in locked:
+                if resource_obj.state != to_sync[resource_obj.id].state:
+                    logger.info(
+                        f"Resource {resource_obj.name} changed to {resource_obj.state.value} during reconcile; leaving it for the next run."
+                    )
+                    continue
+                # The resource_obj state is the one after the pre-Pulumi update (e.g. PROVISIONING)
                 # This state is used as `original_db_state` in `reconcile_single`
-                logger.debug(
-                    f"Preparing to call reconcile_single for {resource_obj.name}, state: {resource_obj.state.value}"
-                )
                 result = reconcile_single(
                     resource_obj,
                     pulumi_outputs,
@@ -704,33 +1417,101 @@ def reconcile_project(project_id: str):
                     azure_cred,
                     azure_compute_clients,
                     azure_network_clients,
+                    live_states,
                 )
                 if result:
                     updated_resources_events.append(result)
 
-            if updated_resources_events:
-                for res_to_save, event_to_save in updated_resources_events:
-                    session.add(res_to_save)
-                    session.add(event_to_save)
+            for res_to_save, event_to_save in updated_resources_events:
+                session.add(res_to_save)
+                session.add(event_to_save)
+            for name, stats in runs.items():
+                error = results[name] if isinstance(results[name], Exception) else None
+                session.add(
+                    PulumiRun(
+                        project_id=project_id,
+                        stack_name=name,
+                        mode=mode,
+                        targeted=name in targets,
+                        started_at=stats["started_at"],
+                        refresh_seconds=stats.get("refresh_seconds"),
+                        up_seconds=stats.get("up_seconds"),
+                        total_seconds=stats["total_seconds"],
+                        up_skipped=stats.get("up_skipped", False),
+                        succeeded=error is None,
+                        error=str(error) if error else None,
+                        events=stats.get("events"),
+                    )
+                )
+                for phase in ("refresh", "up", "total"):
+                    if stats.get(f"{phase}_seconds") is not None:
+                        metrics.observe(
+                            "pulumi_phase_seconds",
+                            stats[f"{phase}_seconds"],
+                            phase=phase,
+                            mode=mode,
+                        )
+            for name, fingerprint in finished_full.items():
+                stack_state = session.get(StackState, name) or StackState(
+                    stack_name=name, project_id=project_id
+                )
+                stack_state.last_up_at = datetime.now(timezone.utc)
+                stack_state.desired_fingerprint = fingerprint
+                session.add(stack_state)
+            transitions = [
+                _state_change(res, to_sync[res.id].state)
+                for res, _ in updated_resources_events
+                if res.state != to_sync[res.id].state
+            ]
+            if any(change["before"] in _DRIFT_FROM for change in transitions):
+                # the cloud moved a settled resource; schedule the project sooner
+                session.execute(
+                    update(Project)
+                    .where(Project.id == project_id)
+                    .values(last_drift_at=datetime.now(timezone.utc))
+                )
+            heals = [
+                (
+                    str(res.id),
+                    res.provider.value,
+                    # Ensure audit_user_id is a string for the task signature
+                    str(getattr(res, "created_by", "system_reconciliation")),
+                    event.details["auto_heal_action"],
+                )
+                for res, event in updated_resources_events
+                if "auto_heal_action" in event.details
+            ]
+            if updated_resources_events or finished_full or runs:
+                lease.fence(session)
                 session.commit()
                 logger.info(
                     f"Committed {len(updated_resources_events)} resource/event updates after reconcile_single for project {project_id}."
                 )
+                for change in transitions:
+                    reconcile_events.publish(project_id, "state", **change)
+                # sent once the row locks are released and the event is stored
+                for heal in heals:
+                    _dispatch_auto_heal(*heal)
             else:
                 logger.info(
                     f"No resource changes detected by reconcile_single for project {project_id}."
                 )
 
-        except Exception as e:
-            logger.error(
-                f"Error during reconcile_project for {project_id}: {e}", exc_info=True
-            )
-            # Potentially mark all "in-progress" resources for this project as ERROR here
-            # For now, just log.
-            session.rollback()  # Rollback any partial changes from this attempt
-        finally:
-            # Close any cloud clients if necessary (boto3 clients usually manage their own connections)
-            pass
+        reconcile_events.publish(
+            project_id,
+            "reconcile",
+            status="finished",
+            updated=len(updated_resources_events),
+            failed_stacks=sorted(
+                name for name, r in results.items() if isinstance(r, Exception)
+            ),
+        )
+    except Exception as e:
+        logger.error(
+            f"Error during reconcile_project for {project_id}: {e}", exc_info=True
+        )
+        # The session context rolls back any partial changes from this attempt
+        reconcile_events.publish(project_id, "reconcile", status="failed", error=str(e))
 
     logger.info(f"Finish reconcile for project {project_id}")
 
@@ -746,10 +1527,58 @@ def destroy_project_task(project_id: str):
 @shared_task(name="cmp_core.tasks.reconcile_all_projects")
 def reconcile_all_projects():
     """
-    Find every project and enqueue a reconcile for each.
+    Queues the reconciles due this cycle, skipping projects with one queued
+    or running; see cmp_core.lib.reconcile_schedule for the order and timing.
     """
+    has_pending = (
+        select(Resource.id)
+        .where(
+            Resource.project_id == Project.id,
+            Resource.state.in_(IAC_PENDING_STATES),
+        )
+        .exists()
+    )
     with SessionLocal() as session:
-        result = session.execute(select(Project.id))
-        project_ids = [str(pid) for pid in result.scalars().all()]
-        for pid in project_ids:
-            reconcile_project.delay(pid)
+        runs = [
+            ProjectRun(
+                project_id=str(row.id),
+                started_at=row.last_reconcile_started_at,
+                finished_at=row.last_reconcile_finished_at,
+                seconds=row.last_reconcile_seconds,
+                drift_at=row.last_drift_at,
+                has_pending=row.has_pending,
+            )
+            for row in session.execute(
+                select(
+                    Project.id,
+                    Project.last_reconcile_started_at,
+                    Project.last_reconcile_finished_at,
+                    Project.last_reconcile_seconds,
+                    Project.last_drift_at,
+                    has_pending.label("has_pending"),
+                )
+            )
+        ]
+
+    plan = plan_cycle(
+        runs,
+        queue_status([run.project_id for run in runs]),
+        datetime.now(timezone.utc),
+    )
+    for project_id, countdown, _ in plan.dispatch:
+        enqueue_reconcile(project_id, countdown=countdown)
+
+    metrics.set_gauge("reconcile_queue_depth", plan.queued)
+    metrics.set_gauge("reconcile_queue_lag_seconds", plan.lag_seconds)
+    metrics.set_gauge("reconcile_schedule_stretch", plan.stretch)
+    for priority in {priority for _, _, priority in plan.dispatch}:
+        metrics.incr(
+            "reconcile_scheduled_total",
+            sum(1 for _, _, p in plan.dispatch if p == priority),
+            priority=priority,
+        )
+    logger.info(
+        f"Reconcile cycle: {len(plan.dispatch)} of {len(runs)} projects queued, "
+        f"{plan.queued} already queued, {plan.running} running, "
+        f"lag {plan.lag_seconds:.0f}s, stretch x{plan.stretch:.1f}."
+    )
@@ -0,0 +1,42 @@
+"""add stack_states
+
+Revision ID: 3f9d2c7e1a4b
+Revises: 6919f27d20f2
+Create Date: 2026-10-18 09:12:41.518204
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9d2c7e1a4b"
+down_revision: Union[str, None] = "6919f27d20f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "stack_states",
+        sa.Column("stack_name", sa.String(length=128), nullable=False),
+        sa.Column("project_id", sa.UUID(), nullable=False),
+        sa.Column("last_up_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("stack_name"),
+    )
+    op.create_index(
+        op.f("ix_stack_states_project_id"),
+        "stack_states",
+        ["project_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_stack_states_project_id"), table_name="stack_states")
+    op.drop_table("stack_states")
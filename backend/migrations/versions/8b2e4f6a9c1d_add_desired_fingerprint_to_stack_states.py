@@ -0,0 +1,31 @@
+"""add desired_fingerprint to stack_states
+
+Revision ID: 8b2e4f6a9c1d
+Revises: 3f9d2c7e1a4b
+Create Date: 2026-10-18 10:03:17.284913
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8b2e4f6a9c1d"
+down_revision: Union[str, None] = "3f9d2c7e1a4b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "stack_states",
+        sa.Column("desired_fingerprint", sa.String(length=64), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("stack_states", "desired_fingerprint")
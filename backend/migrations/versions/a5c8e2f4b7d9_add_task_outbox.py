@@ -0,0 +1,60 @@
+"""add task_outbox
+
+Revision ID: a5c8e2f4b7d9
+Revises: f3b8d1e6a2c4
+Create Date: 2026-10-18 19:42:06.118230
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a5c8e2f4b7d9"
+down_revision: Union[str, None] = "f3b8d1e6a2c4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# one NOTIFY per inserting statement wakes the relay; Postgres delivers it on
+# commit and folds duplicates within a transaction
+OUTBOX_NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_outbox_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('task_outbox', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "task_outbox",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column("task", sa.String(length=200), nullable=False),
+        sa.Column("args", sa.JSON(), nullable=False),
+        sa.Column("kwargs", sa.JSON(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute(OUTBOX_NOTIFY_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER task_outbox_notify "
+        "AFTER INSERT ON task_outbox "
+        "FOR EACH STATEMENT EXECUTE FUNCTION task_outbox_notify()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS task_outbox_notify ON task_outbox")
+    op.execute("DROP FUNCTION IF EXISTS task_outbox_notify()")
+    op.drop_table("task_outbox")
@@ -0,0 +1,49 @@
+"""add reconcile run tracking to projects
+
+Revision ID: b7d1f3a9c6e2
+Revises: a5c8e2f4b7d9
+Create Date: 2026-10-18 21:07:33.402518
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d1f3a9c6e2"
+down_revision: Union[str, None] = "a5c8e2f4b7d9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "projects",
+        sa.Column(
+            "last_reconcile_started_at", sa.DateTime(timezone=True), nullable=True
+        ),
+    )
+    op.add_column(
+        "projects",
+        sa.Column(
+            "last_reconcile_finished_at", sa.DateTime(timezone=True), nullable=True
+        ),
+    )
+    op.add_column(
+        "projects", sa.Column("last_reconcile_seconds", sa.Float(), nullable=True)
+    )
+    op.add_column(
+        "projects",
+        sa.Column("last_drift_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("projects", "last_drift_at")
+    op.drop_column("projects", "last_reconcile_seconds")
+    op.drop_column("projects", "last_reconcile_finished_at")
+    op.drop_column("projects", "last_reconcile_started_at")
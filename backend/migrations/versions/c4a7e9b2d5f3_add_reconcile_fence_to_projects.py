@@ -0,0 +1,33 @@
+"""add reconcile_fence to projects
+
+Revision ID: c4a7e9b2d5f3
+Revises: 8b2e4f6a9c1d
+Create Date: 2026-10-18 11:26:54.730162
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4a7e9b2d5f3"
+down_revision: Union[str, None] = "8b2e4f6a9c1d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "projects",
+        sa.Column(
+            "reconcile_fence", sa.BigInteger(), nullable=False, server_default="0"
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("projects", "reconcile_fence")
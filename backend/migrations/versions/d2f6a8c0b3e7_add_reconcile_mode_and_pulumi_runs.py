@@ -0,0 +1,62 @@
+"""add reconcile_mode to projects and pulumi_runs
+
+Revision ID: d2f6a8c0b3e7
+Revises: c4a7e9b2d5f3
+Create Date: 2026-10-18 14:02:17.384519
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d2f6a8c0b3e7"
+down_revision: Union[str, None] = "c4a7e9b2d5f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "projects",
+        sa.Column(
+            "reconcile_mode",
+            sa.String(length=32),
+            nullable=False,
+            server_default="refresh_then_up",
+        ),
+    )
+    op.create_table(
+        "pulumi_runs",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("project_id", sa.UUID(), nullable=False),
+        sa.Column("stack_name", sa.String(length=128), nullable=False),
+        sa.Column("mode", sa.String(length=32), nullable=False),
+        sa.Column("targeted", sa.Boolean(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("refresh_seconds", sa.Float(), nullable=True),
+        sa.Column("up_seconds", sa.Float(), nullable=True),
+        sa.Column("total_seconds", sa.Float(), nullable=False),
+        sa.Column("up_skipped", sa.Boolean(), nullable=False),
+        sa.Column("succeeded", sa.Boolean(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_pulumi_runs_project_id"), "pulumi_runs", ["project_id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_pulumi_runs_started_at"), "pulumi_runs", ["started_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_pulumi_runs_started_at"), table_name="pulumi_runs")
+    op.drop_index(op.f("ix_pulumi_runs_project_id"), table_name="pulumi_runs")
+    op.drop_table("pulumi_runs")
+    op.drop_column("projects", "reconcile_mode")
@@ -0,0 +1,28 @@
+"""add events to pulumi_runs
+
+Revision ID: e7a3c5d9f1b2
+Revises: d2f6a8c0b3e7
+Create Date: 2026-10-18 15:40:52.107733
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e7a3c5d9f1b2"
+down_revision: Union[str, None] = "d2f6a8c0b3e7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("pulumi_runs", sa.Column("events", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("pulumi_runs", "events")
@@ -0,0 +1,82 @@
+"""add state_version and state change notify trigger to resources
+
+Revision ID: f3b8d1e6a2c4
+Revises: e7a3c5d9f1b2
+Create Date: 2026-10-18 17:05:13.482916
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f3b8d1e6a2c4"
+down_revision: Union[str, None] = "e7a3c5d9f1b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# NOTIFY is delivered when the writing transaction commits, so listeners only
+# ever see committed states; a deleted resource is reported as "deleted".
+STATE_NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION resources_state_notify() RETURNS trigger AS $$
+DECLARE
+    rec resources;
+    new_state text;
+    new_version bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        rec := OLD;
+        new_state := 'deleted';
+        new_version := OLD.state_version + 1;
+    ELSE
+        IF TG_OP = 'UPDATE' THEN
+            IF NEW.state IS NOT DISTINCT FROM OLD.state THEN
+                RETURN NEW;
+            END IF;
+            NEW.state_version := OLD.state_version + 1;
+        END IF;
+        rec := NEW;
+        new_state := NEW.state::text;
+        new_version := NEW.state_version;
+    END IF;
+    PERFORM pg_notify(
+        'resource_state',
+        json_build_object(
+            'id', rec.id,
+            'project_id', rec.project_id,
+            'name', rec.name,
+            'provider', rec.provider,
+            'state', new_state,
+            'version', new_version
+        )::text
+    );
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "resources",
+        sa.Column("state_version", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute(STATE_NOTIFY_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER resources_state_notify "
+        "BEFORE INSERT OR UPDATE OF state OR DELETE ON resources "
+        "FOR EACH ROW EXECUTE FUNCTION resources_state_notify()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS resources_state_notify ON resources")
+    op.execute("DROP FUNCTION IF EXISTS resources_state_notify()")
+    op.drop_column("resources", "state_version")
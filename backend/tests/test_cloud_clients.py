@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from cmp_core.lib import cloud_clients
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # static keys, so boto3 never goes looking for instance credentials
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIATEST")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+    cloud_clients.clear()
+    yield
+    cloud_clients.clear()
+
+
+def test_clients_are_built_once_per_region_and_identity():
+    eu = cloud_clients.ec2("eu-west-1")
+
+    assert cloud_clients.ec2("eu-west-1") is eu
+    assert cloud_clients.ec2("us-east-1") is not eu
+    assert eu.meta.config.max_pool_connections == cloud_clients.POOL_CONNECTIONS
+    assert cloud_clients.aws_identity() == "AKIATEST"
+
+    # other credentials are another account: never hand out its client
+    with mock.patch.object(cloud_clients, "aws_identity", return_value="AKIAOTHER"):
+        assert cloud_clients.ec2("eu-west-1") is not eu
+
+
+def test_concurrent_callers_share_one_build():
+    built = []
+
+    def build():
+        time.sleep(0.05)
+        built.append(object())
+        return built[-1]
+
+    clients = []
+    threads = [
+        threading.Thread(
+            target=lambda: clients.append(cloud_clients._cached(("k",) * 4, build))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 1
+    assert clients == built * 8
+
+
+def test_azure_clients_share_the_credential_and_http_session():
+    with (
+        mock.patch.object(cloud_clients, "DefaultAzureCredential") as credential,
+        mock.patch.object(cloud_clients, "ComputeManagementClient") as compute,
+        mock.patch.object(cloud_clients, "NetworkManagementClient") as network,
+    ):
+        cloud_clients.azure_compute("sub-1")
+        cloud_clients.azure_compute("sub-1")
+        cloud_clients.azure_compute("sub-2")
+        cloud_clients.azure_network("sub-1")
+
+    credential.assert_called_once_with()
+    calls = compute.call_args_list + network.call_args_list
+    assert [c.args for c in calls] == [
+        (credential.return_value, "sub-1"),
+        (credential.return_value, "sub-2"),
+        (credential.return_value, "sub-1"),
+    ]
+    transports = [c.kwargs["transport"] for c in calls]
+    assert len({id(t.session) for t in transports}) == 1
+    # one client closing its transport must not close the shared session
+    assert not any(t._session_owner for t in transports)
+
+
+def test_clear_closes_what_was_built():
+    client = mock.Mock()
+    cloud_clients._cached(("aws", "ec2", "r", "k"), lambda: client)
+
+    cloud_clients.clear()
+
+    client.close.assert_called_once_with()
+    assert cloud_clients._clients == {}
+
+
+def test_forked_child_starts_with_an_empty_registry():
+    parent_client = cloud_clients.ec2("eu-west-1")
+    # another thread holds the registry lock while the process forks
+    locked, release = threading.Event(), threading.Event()
+
+    def hold():
+        with cloud_clients._lock:
+            locked.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    locked.wait()
+    read_end, write_end = os.pipe()
+    try:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(read_end)
+                report = {
+                    "empty": cloud_clients._clients == {},
+                    "lock_free": cloud_clients._lock.acquire(timeout=1),
+                    "new_client": cloud_clients.ec2("eu-west-1") is not parent_client,
+                }
+                os.write(write_end, json.dumps(report).encode())
+            finally:
+                os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end) as reader:
+            report = json.loads(reader.read() or "{}")
+        os.waitpid(pid, 0)
+    finally:
+        release.set()
+        holder.join()
+
+    assert report == {"empty": True, "lock_free": True, "new_client": True}
+    # the parent keeps its client
+    assert cloud_clients.ec2("eu-west-1") is parent_client
@@ -0,0 +1,57 @@
+import pytest
+from pydantic import ValidationError
+
+from cmp_core.schemas.ec2 import Ec2BulkCreate
+from cmp_core.schemas.resource import (
+    MAX_BULK_ITEMS,
+    check_name_template,
+    expand_name_template,
+)
+
+
+@pytest.mark.parametrize(
+    "template, names",
+    [
+        ("web", ["web"]),
+        ("worker-{0..2}", ["worker-0", "worker-1", "worker-2"]),
+        ("node{8..10}-eu", ["node8-eu", "node9-eu", "node10-eu"]),
+        # a zero-padded start pads every number to its width
+        ("vm-{08..10}", ["vm-08", "vm-09", "vm-10"]),
+        ("vm-{001..002}", ["vm-001", "vm-002"]),
+        ("vm-{0..0}", ["vm-0"]),
+        ("{1..2}", ["1", "2"]),
+    ],
+)
+def test_expand(template, names):
+    assert expand_name_template(template) == names
+
+
+@pytest.mark.parametrize(
+    "template, error",
+    [
+        ("vm-{0..1}-{0..1}", "one {first..last} range"),
+        ("vm-{3..1}", "must not run backwards"),
+        (f"vm-{{1..{MAX_BULK_ITEMS + 1}}}", f"more than {MAX_BULK_ITEMS} names"),
+    ],
+)
+def test_expand_rejects(template, error):
+    with pytest.raises(ValueError, match=error):
+        expand_name_template(template)
+
+
+def test_largest_range_is_allowed():
+    assert len(expand_name_template(f"vm-{{1..{MAX_BULK_ITEMS}}}")) == MAX_BULK_ITEMS
+
+
+def test_check_limits_the_expanded_name_length():
+    stem = "v" * 61
+    assert check_name_template(f"{stem}{{0..99}}") == f"{stem}{{0..99}}"
+    with pytest.raises(ValueError, match="at most 63 characters"):
+        check_name_template(f"{stem}{{0..100}}")
+
+
+def test_bulk_create_schema_validates_the_template():
+    fields = {"region": "eu-west-1", "instance_type": "t3.micro", "ami": "ami-1"}
+    assert Ec2BulkCreate(name="web-{0..3}", **fields).name == "web-{0..3}"
+    with pytest.raises(ValidationError, match="backwards"):
+        Ec2BulkCreate(name="web-{3..0}", **fields)
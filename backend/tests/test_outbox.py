@@ -0,0 +1,166 @@
+import itertools
+from unittest import mock
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import cmp_core.models as models
+from cmp_core.celery_app import celery_app
+from cmp_core.models.base import Base
+from cmp_core.models.outbox import OutboxMessage
+from cmp_core.models.resource import Resource, ResourceState, ResourceType
+from cmp_core.schemas.azure import AzureUpdate
+from cmp_core.schemas.ec2 import Ec2Update
+from cmp_core.services import azure_vm, ec2
+
+RECONCILE = "cmp_core.tasks.reconcile_project"
+USER = "3f2b1c1e-0000-4000-8000-000000000001"
+
+
+@pytest_asyncio.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as session:
+        user = models.User(email="ops@example.com", password_hash="x")
+        session.add(user)
+        await session.flush()
+        project = models.Project(name="p", owner_id=user.id)
+        session.add(project)
+        await session.flush()
+        for provider, name, state in [
+            ("aws", "web", ResourceState.RUNNING),
+            ("aws", "batch", ResourceState.STOPPED),
+            ("azure", "az-web", ResourceState.RUNNING),
+            ("azure", "az-batch", ResourceState.STOPPED),
+        ]:
+            session.add(
+                Resource(
+                    project_id=project.id,
+                    provider=provider,
+                    resource_type=ResourceType.vm,
+                    name=name,
+                    region="eu",
+                    state=state,
+                    meta={},
+                    created_by=user.id,
+                )
+            )
+        await session.commit()
+
+    # SQLite only autoincrements INTEGER keys; Postgres fills the identity column
+    ids = itertools.count(1)
+
+    def number(mapper, connection, row):
+        row.id = next(ids)
+
+    event.listen(OutboxMessage, "before_insert", number)
+    try:
+        # handlers must not reach the broker; the relay publishes the rows
+        with mock.patch.object(celery_app, "send_task", side_effect=AssertionError):
+            async with sessions() as session:
+                yield session, project.id
+    finally:
+        event.remove(OutboxMessage, "before_insert", number)
+        await engine.dispose()
+
+
+async def _outbox(session):
+    return [
+        (row.task, row.args, row.kwargs)
+        for row in (await session.execute(select(OutboxMessage))).scalars()
+    ]
+
+
+async def _resource_id(session, provider, name):
+    return (
+        await session.execute(
+            select(Resource.id).filter_by(provider=provider, name=name)
+        )
+    ).scalar_one()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "call",
+    [
+        lambda db, pid: ec2.update_ec2_nonblocking(
+            db, pid, Ec2Update(instance_type="t3.large"), "web", USER
+        ),
+        lambda db, pid: ec2.delete_ec2_nonblocking(db, pid, "web", USER),
+        lambda db, pid: azure_vm.update_azure_nonblocking(
+            db, pid, "az-web", AzureUpdate(vm_size="Standard_B2s"), USER
+        ),
+        lambda db, pid: azure_vm.delete_azure_nonblocking(db, pid, "az-web", USER),
+    ],
+    ids=["ec2-update", "ec2-delete", "azure-update", "azure-delete"],
+)
+async def test_desired_state_changes_queue_a_reconcile(db, call):
+    session, project_id = db
+
+    await call(session, project_id)
+
+    assert await _outbox(session) == [(RECONCILE, [str(project_id)], {})]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "provider, call, name, task",
+    [
+        ("aws", ec2.start_ec2_nonblocking, "batch", "cmp_core.tasks.start_ec2_task"),
+        ("aws", ec2.stop_ec2_nonblocking, "web", "cmp_core.tasks.stop_ec2_task"),
+        (
+            "azure",
+            azure_vm.start_azure_nonblocking,
+            "az-batch",
+            "cmp_core.tasks.start_azure_vm",
+        ),
+        (
+            "azure",
+            azure_vm.stop_azure_nonblocking,
+            "az-web",
+            "cmp_core.tasks.stop_azure_vm",
+        ),
+    ],
+)
+async def test_power_ops_queue_their_task_with_the_row(db, provider, call, name, task):
+    session, project_id = db
+    resource_id = await _resource_id(session, provider, name)
+
+    await call(session, project_id, name, USER)
+
+    assert await _outbox(session) == [(task, [str(resource_id), USER], {})]
+
+
+@pytest.mark.asyncio
+async def test_rejected_request_queues_nothing(db):
+    session, project_id = db
+
+    with pytest.raises(HTTPException):
+        await ec2.start_ec2_nonblocking(session, project_id, "web", USER)
+    await session.rollback()
+
+    assert await _outbox(session) == []
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_change_takes_its_task_with_it(db):
+    session, project_id = db
+    resource = await session.get(Resource, await _resource_id(session, "aws", "web"))
+
+    # a commit that fails after the enqueue, as a concurrent write would make it
+    with (
+        mock.patch.object(session, "commit", side_effect=RuntimeError("conflict")),
+        pytest.raises(RuntimeError),
+    ):
+        await ec2.stop_ec2_nonblocking(session, project_id, "web", USER)
+    await session.rollback()
+
+    assert await _outbox(session) == []
+    await session.refresh(resource)
+    assert resource.state == ResourceState.RUNNING
@@ -0,0 +1,66 @@
+from unittest import mock
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import sessionmaker
+
+from cmp_core import outbox_relay
+from cmp_core.lib import reconcile_queue
+from cmp_core.models.base import Base
+from cmp_core.models.outbox import OutboxMessage
+
+RECONCILE = "cmp_core.tasks.reconcile_project"
+
+
+@pytest.fixture
+def relay():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    sessions = sessionmaker(engine)
+    with sessions() as session:
+        session.add(OutboxMessage(id=1, task=RECONCILE, args=["p1"], kwargs={}))
+        # SQLite hands timestamps back naive; the lag metric is not tested here
+        session.execute(update(OutboxMessage).values(created_at=None))
+        session.commit()
+    with (
+        mock.patch.object(outbox_relay, "SessionLocal", sessions),
+        mock.patch.object(
+            reconcile_queue,
+            "get_redis",
+            return_value=fakeredis.FakeRedis(decode_responses=True),
+        ),
+        mock.patch.object(outbox_relay.celery_app, "send_task") as send_task,
+    ):
+        yield sessions, send_task
+
+
+def _rows(sessions):
+    with sessions() as session:
+        return session.scalars(select(OutboxMessage.id)).all()
+
+
+def test_failed_publish_is_retried_by_the_next_pass(relay):
+    sessions, send_task = relay
+    send_task.side_effect = [ConnectionError("broker down"), None]
+
+    with pytest.raises(ConnectionError):
+        outbox_relay.relay_batch(producer=None)
+    # the row is kept and the project is not marked as queued
+    assert _rows(sessions) == [1]
+    assert reconcile_queue.queue_status(["p1"]) == ({}, set())
+
+    assert outbox_relay.relay_batch(producer=None) == 1
+    assert send_task.call_count == 2
+    assert _rows(sessions) == []
+    queued, _ = reconcile_queue.queue_status(["p1"])
+    assert list(queued) == ["p1"]
+
+
+def test_reconcile_already_queued_is_dropped(relay):
+    sessions, send_task = relay
+    reconcile_queue.request_reconcile("p1")
+
+    assert outbox_relay.relay_batch(producer=None) == 1
+    send_task.assert_not_called()
+    assert _rows(sessions) == []
@@ -0,0 +1,305 @@
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import pytest
+import requests
+import urllib3
+from azure.core.credentials import AccessToken
+from azure.core.pipeline.transport import RequestsTransport
+from azure.mgmt.compute import ComputeManagementClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import cmp_core.models as models
+from cmp_core.core.config import settings
+from cmp_core.lib import rate_limit
+from cmp_core.models.base import Base
+from cmp_core.models.resource import Resource, ResourceState
+from cmp_core.tasks import power, pulumi
+
+NOW = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def _op(provider="aws", action="start", age=10, deadline_in=300):
+    return {
+        "provider": provider,
+        "action": action,
+        "requested_at": (NOW - timedelta(seconds=age)).isoformat(),
+        "deadline": (NOW + timedelta(seconds=deadline_in)).isoformat(),
+    }
+
+
+SETTLED = power.POWER_OP_SETTLE_SECONDS + 1
+TIMED_OUT = f"VM did not reach {ResourceState.RUNNING.value} in time"
+
+
+@pytest.mark.parametrize(
+    "op, live, expected",
+    [
+        (_op(), None, ("failure", "VM not found in the cloud")),
+        (_op(), {"state": "running"}, ("success", None)),
+        (_op(action="stop"), {"state": "stopped"}, ("success", None)),
+        (_op(), {"state": "terminated"}, ("failure", "VM was terminated")),
+        (_op(), {"state": "pending"}, ("wait", None)),
+        # still in the state it was leaving: only a failure once settled
+        (_op(), {"state": "stopped"}, ("wait", None)),
+        (
+            _op(age=SETTLED),
+            {"state": "stopped"},
+            ("failure", f"VM still {ResourceState.STOPPED.value} after {SETTLED}s"),
+        ),
+        (_op(deadline_in=0), {"state": "pending"}, ("timeout", TIMED_OUT)),
+        # a failed state check waits for the next one, up to the deadline
+        (_op(), RuntimeError("throttled"), ("wait", None)),
+        (_op(deadline_in=-1), RuntimeError("throttled"), ("timeout", TIMED_OUT)),
+    ],
+)
+def test_aws_outcome(op, live, expected):
+    assert power._outcome(op, live, NOW) == expected
+
+
+@pytest.mark.parametrize(
+    "live, expected",
+    [
+        ({"power_state": "VM deallocated"}, ("success", None)),
+        (
+            {"power_state": "VM running", "lro_status": "Succeeded"},
+            ("success", None),
+        ),
+        (
+            {"power_state": "VM running", "lro_status": "Failed", "lro_error": "quota"},
+            ("failure", "quota"),
+        ),
+        (
+            {"power_state": "VM running", "lro_status": "Canceled"},
+            ("failure", "Operation Canceled"),
+        ),
+        # ARM still working: a VM slow to deallocate is not failed by the settle check
+        ({"power_state": "VM running", "lro_status": "InProgress"}, ("wait", None)),
+        (
+            {"power_state": "VM running"},
+            ("failure", f"VM still {ResourceState.RUNNING.value} after {SETTLED}s"),
+        ),
+    ],
+)
+def test_azure_outcome(live, expected):
+    op = _op(provider="azure", action="stop", age=SETTLED)
+    assert power._outcome(op, live, NOW) == expected
+
+
+def test_backoff_doubles_up_to_the_cap():
+    delays = [power._backoff(attempts) for attempts in range(12)]
+    assert delays[0] == settings.power_op_initial_delay_seconds
+    assert delays[1] == 2 * delays[0]
+    assert delays == sorted(delays)
+    assert delays[-1] == settings.power_op_max_delay_seconds
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with mock.patch.object(power, "SessionLocal", sessionmaker(engine)):
+        yield power.SessionLocal
+
+
+def _resources(session_factory, count):
+    with session_factory() as session:
+        user = models.User(email="ops@example.com", password_hash="x")
+        session.add(user)
+        session.flush()
+        project = models.Project(name="p", owner_id=user.id)
+        session.add(project)
+        session.flush()
+        resources = [
+            Resource(
+                project_id=project.id,
+                provider="aws",
+                resource_type="vm",
+                name=f"vm{i}",
+                region="us-east-1",
+                state=ResourceState.PENDING_START,
+                meta={"aws_id": f"i-{i}"},
+                created_by=user.id,
+            )
+            for i in range(count)
+        ]
+        session.add_all(resources)
+        session.commit()
+        return user.id, [r.id for r in resources]
+
+
+def test_results_skip_rows_changed_while_firing(db):
+    user_id, (kept, changed) = _resources(db, 2)
+
+    def fire(targets, action):
+        # the row moves on while the cloud call is in flight
+        with db() as session:
+            session.get(Resource, changed).state = ResourceState.PENDING_DEPROVISION
+            session.commit()
+        return {
+            resource_id: {"aws_id": target["meta"]["aws_id"], "region": "us-east-1"}
+            for resource_id, target in targets.items()
+        }
+
+    with (
+        mock.patch.object(power, "_fire", side_effect=fire),
+        mock.patch.object(power, "_kick") as kick,
+    ):
+        power.begin_power_ops([kept, changed], user_id, "start")
+
+    with db() as session:
+        resource = session.get(Resource, kept)
+        assert resource.state == ResourceState.STARTING
+        assert resource.meta["power_op"]["handle"] == {
+            "aws_id": "i-0",
+            "region": "us-east-1",
+        }
+        resource = session.get(Resource, changed)
+        assert resource.state == ResourceState.PENDING_DEPROVISION
+        assert "power_op" not in resource.meta
+        actions = [e.action for e in session.query(models.AuditEvent)]
+    assert actions == ["ec2_start_requested"]
+    kick.assert_called_once()
+
+
+VM_ID = (
+    "/subscriptions/sub/resourceGroups/rg/providers"
+    "/Microsoft.Compute/virtualMachines/vm1"
+)
+OPERATION = "https://management.azure.com/subscriptions/sub/operations/op1"
+
+
+class _ARM(requests.adapters.BaseAdapter):
+    """Answers the compute client's HTTP calls with canned ARM responses."""
+
+    def __init__(self, operation: dict):
+        super().__init__()
+        self.operation = operation
+        self.calls = []
+
+    def send(self, request, **kwargs):
+        self.calls.append(request.method)
+        if request.method == "POST":
+            status, headers, body = 202, {"Azure-AsyncOperation": OPERATION}, b""
+        else:
+            status, headers = 200, {"Content-Type": "application/json"}
+            body = json.dumps(self.operation).encode()
+        response = requests.Response()
+        response.request, response.url = request, request.url
+        response.status_code = status
+        response.headers.update(headers)
+        response.raw = urllib3.HTTPResponse(
+            body=io.BytesIO(body), status=status, preload_content=False
+        )
+        return response
+
+    def close(self):
+        pass
+
+
+class _Credential:
+    def get_token(self, *scopes, **kwargs):
+        return AccessToken("token", 2**31)
+
+
+def _compute(arm: _ARM) -> ComputeManagementClient:
+    session = requests.Session()
+    session.mount("https://", arm)
+    return ComputeManagementClient(
+        _Credential(),
+        "sub",
+        transport=RequestsTransport(session=session, session_owner=False),
+    )
+
+
+@pytest.mark.parametrize(
+    "operation, expected",
+    [
+        ({"status": "InProgress"}, {"lro_status": "InProgress"}),
+        ({"status": "Succeeded"}, {"lro_status": "Succeeded"}),
+        (
+            {"status": "Failed", "error": {"code": "Quota", "message": "no quota"}},
+            {"lro_status": "Failed", "lro_error": "no quota"},
+        ),
+    ],
+)
+def test_azure_operation_is_fired_and_resumed_through_public_pollers(
+    operation, expected
+):
+    # fails when azure-core / azure-mgmt-compute change how pollers resume
+    arm = _ARM(operation)
+    compute = _compute(arm)
+    bucket = rate_limit.azure("sub", rate_limit.WRITE)
+    with (
+        mock.patch.object(power.cloud_clients, "azure_compute", return_value=compute),
+        mock.patch.object(rate_limit, "get_redis", return_value=None),
+    ):
+        handle = power._fire_azure("sub", {"r1": {"azure_vm_id": VM_ID}}, "start")
+        assert arm.calls == ["POST"]
+        token = handle["r1"]["lro_token"]
+
+        status = power._lro_status(compute, VM_ID, "start", token, bucket)
+    assert status == expected
+    assert arm.calls == ["POST", "GET"]
+
+
+def test_operation_is_recorded_before_the_calls_go_out(db):
+    user_id, (resource_id,) = _resources(db, 1)
+
+    def fire(targets, action):
+        with db() as session:
+            resource = session.get(Resource, resource_id)
+            op = resource.meta["power_op"]
+            assert (resource.state, op["action"]) == (ResourceState.STARTING, "start")
+            assert "handle" not in op
+            # a reconcile running now leaves the row to the operation
+            assert pulumi.reconcile_single(resource, {}, {}, None, {}, {}, {}) is None
+        return {str(resource_id): {"aws_id": "i-0", "region": "us-east-1"}}
+
+    with (
+        mock.patch.object(power, "_fire", side_effect=fire),
+        mock.patch.object(power, "_kick"),
+    ):
+        power.begin_power_ops([resource_id], user_id, "start")
+
+    with db() as session:
+        op = session.get(Resource, resource_id).meta["power_op"]
+    assert op["handle"] == {"aws_id": "i-0", "region": "us-east-1"}
+    assert op["next_check_at"] < op["deadline"]
+
+
+def test_operation_never_sent_fails_at_its_deadline(db):
+    user_id, (resource_id,) = _resources(db, 1)
+    with db() as session:
+        resource = session.get(Resource, resource_id)
+        resource.state = ResourceState.STARTING
+        resource.meta["power_op"] = {
+            "id": "op1",
+            "provider": "aws",
+            "action": "start",
+            "requested_by": str(user_id),
+            "requested_at": (NOW - timedelta(hours=1)).isoformat(),
+            "deadline": NOW.isoformat(),
+            "attempts": 0,
+            "next_check_at": NOW.isoformat(),
+        }
+        session.commit()
+
+    with (
+        mock.patch.object(power, "get_redis", return_value=None),
+        mock.patch.object(power, "_check", return_value={}) as check,
+        # requested_by is stored as text, which SQLite will not take as a UUID
+        mock.patch.object(power, "_audit") as audit,
+    ):
+        power.confirm_power_ops()
+
+    # nothing to look up in the cloud
+    check.assert_called_once_with({})
+    with db() as session:
+        resource = session.get(Resource, resource_id)
+        assert resource.state == ResourceState.ERROR_STARTING
+        assert "power_op" not in resource.meta
+    assert audit.call_args.args[3] == "ec2_start_timeout"
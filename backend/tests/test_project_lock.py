@@ -0,0 +1,62 @@
+from unittest import mock
+
+import fakeredis
+import pytest
+
+from cmp_core.lib import project_lock
+from cmp_core.lib.project_lock import ProjectLease
+
+
+@pytest.fixture
+def redis():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    with mock.patch.object(project_lock, "get_redis", return_value=r):
+        yield r
+
+
+def test_held_lease_is_not_waited_for(redis):
+    with ProjectLease("p1") as first:
+        assert first.acquire(wait_seconds=0) is True
+        first_token = first.token
+        second = ProjectLease("p1")
+        assert second.acquire(wait_seconds=0) is False
+        assert second.token is None
+    # released on exit; the next holder gets a larger fencing token
+    with ProjectLease("p1") as third:
+        assert third.acquire(wait_seconds=0) is True
+        assert third.token > first_token
+
+
+def test_redis_errors_run_without_a_lease():
+    broken = mock.Mock()
+    broken.incr.side_effect = ConnectionError("down")
+    with mock.patch.object(project_lock, "get_redis", return_value=broken):
+        lease = ProjectLease("p1")
+        assert lease.acquire(wait_seconds=0) is True
+        assert lease.token is None
+        lease.fence(session=None)  # no token: nothing to fence
+        lease.release()
+        broken.eval.assert_not_called()
+
+
+def test_held_gauge_is_set_from_the_leases_alive(redis):
+    with mock.patch.object(project_lock.metrics, "set_gauge") as set_gauge:
+
+        def held():
+            return set_gauge.call_args.args[1]
+
+        dead = ProjectLease("dead")
+        assert dead.acquire(wait_seconds=0) is True
+        dead._stop.set()  # the worker dies: no renewal, no release
+        with ProjectLease("p1") as first:
+            first.acquire(wait_seconds=0)
+            assert held() == 2
+        assert held() == 1
+
+        later = project_lock.time.time() + dead._ttl + 1
+        with mock.patch.object(project_lock.time, "time", return_value=later):
+            with ProjectLease("p2") as second:
+                second.acquire(wait_seconds=0)
+                # the dead worker's lease has expired
+                assert held() == 1
+            assert held() == 0
@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from pulumi.automation import OpType
+
+from cmp_core.lib import pulumi_events
+from cmp_core.lib.pulumi_events import EventRecorder
+
+URN = "urn:pulumi:s::p::aws:ec2/instance:Instance::"
+
+
+def _event(**kinds):
+    event = dict.fromkeys(
+        [
+            "resource_pre_event",
+            "res_outputs_event",
+            "res_op_failed_event",
+            "diagnostic_event",
+        ]
+    )
+    return SimpleNamespace(**{**event, **kinds})
+
+
+def _pre(name, op=OpType.UPDATE, planning=False):
+    metadata = SimpleNamespace(urn=URN + name, type="aws:ec2/instance:Instance", op=op)
+    return _event(
+        resource_pre_event=SimpleNamespace(metadata=metadata, planning=planning)
+    )
+
+
+def _done(name):
+    return _event(
+        res_outputs_event=SimpleNamespace(
+            metadata=SimpleNamespace(urn=URN + name), planning=False
+        )
+    )
+
+
+def _failed(name):
+    return _event(
+        res_op_failed_event=SimpleNamespace(metadata=SimpleNamespace(urn=URN + name))
+    )
+
+
+def _diagnostic(message, name=None, severity="error"):
+    return _event(
+        diagnostic_event=SimpleNamespace(
+            message=message, urn=URN + name if name else None, severity=severity
+        )
+    )
+
+
+@pytest.fixture
+def clock():
+    clock = SimpleNamespace(now=100.0)
+    with mock.patch.object(
+        pulumi_events.time, "monotonic", side_effect=lambda: clock.now
+    ):
+        yield clock
+
+
+def test_one_record_per_step_with_timing_and_errors(clock):
+    steps = []
+    recorder = EventRecorder("s", on_step=steps.append)
+    on_up = recorder.on("up")
+
+    on_up(_pre("vm1", op=OpType.CREATE))
+    on_up(_pre("vm2", op=OpType.SAME))
+    on_up(_pre("vm3", planning=True))
+    on_up(_pre("vm3"))
+    clock.now += 2.5
+    on_up(_done("vm1"))
+    on_up(_diagnostic("  quota exceeded\n", name="vm3"))
+    on_up(_diagnostic("update failed"))
+    on_up(_diagnostic("just a warning", severity="warning"))
+    clock.now += 1.0
+    on_up(_failed("vm3"))
+
+    summary = recorder.summary()
+    assert summary["unchanged"] == 1
+    assert summary["errors"] == ["update failed"]
+    assert [
+        (s["name"], s["op"], s["phase"], s["duration"], s["status"], s["error"])
+        for s in summary["steps"]
+    ] == [
+        ("vm3", "update", "up", 3.5, "failed", "quota exceeded"),
+        ("vm1", "create", "up", 2.5, "ok", None),
+    ]
+    # each step is seen as it starts and as it ends
+    assert [(s["name"], s["status"]) for s in steps] == [
+        ("vm1", "running"),
+        ("vm3", "running"),
+        ("vm1", "ok"),
+        ("vm3", "failed"),
+    ]
+
+
+def test_phases_are_kept_apart_and_open_steps_are_incomplete(clock):
+    recorder = EventRecorder("s")
+
+    recorder.on("refresh")(_pre("vm1", op=OpType.REFRESH))
+    recorder.on("up")(_pre("vm1"))
+    clock.now += 1.0
+    recorder.on("refresh")(_done("vm1"))
+    clock.now += 1.0
+
+    assert [
+        (s["phase"], s["duration"], s["status"]) for s in recorder.summary()["steps"]
+    ] == [("up", 2.0, "incomplete"), ("refresh", 1.0, "ok")]
+
+
+def test_long_diagnostics_are_truncated(clock):
+    recorder = EventRecorder("s")
+
+    recorder.on("up")(_diagnostic("x" * 5000))
+
+    assert recorder.summary()["errors"] == ["x" * pulumi_events.MAX_ERROR_LENGTH]
+
+
+def test_a_failing_step_callback_does_not_break_the_run(clock):
+    recorder = EventRecorder("s", on_step=mock.Mock(side_effect=RuntimeError))
+
+    recorder.on("up")(_pre("vm1"))
+    recorder.on("up")(_done("vm1"))
+
+    assert recorder.summary()["steps"][0]["status"] == "ok"
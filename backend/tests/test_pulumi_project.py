@@ -0,0 +1,319 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from cmp_core.lib import pulumi_project
+from cmp_core.lib.pulumi_project import desired_fingerprint
+from cmp_core.models.project import ReconcileMode
+from cmp_core.models.resource import Provider, ResourceState
+
+
+def _vm(provider, meta, state=ResourceState.PENDING_PROVISION):
+    return SimpleNamespace(
+        provider=provider, name="vm1", region="eu-west-1", state=state, meta=meta
+    )
+
+
+AWS_META = {"ami": "ami-123", "instance_type": "t3.micro"}
+AZURE_META = {"location": "westeurope", "vm_size": "Standard_B1s"}
+
+
+def test_fingerprint_ignores_outputs_written_back_after_up():
+    before = desired_fingerprint([_vm(Provider.aws, dict(AWS_META))])
+    after = desired_fingerprint(
+        [
+            _vm(
+                Provider.aws,
+                {**AWS_META, "aws_id": "i-0abc", "public_ip": "1.2.3.4"},
+                ResourceState.RUNNING,
+            )
+        ]
+    )
+    assert before == after
+
+    before = desired_fingerprint([_vm(Provider.azure, dict(AZURE_META))])
+    after = desired_fingerprint(
+        [_vm(Provider.azure, {**AZURE_META, "azure_id": "/subscriptions/s/vm"})]
+    )
+    assert before == after
+
+
+def test_fingerprint_changes_with_desired_state():
+    base = desired_fingerprint([_vm(Provider.aws, dict(AWS_META))])
+    resized = desired_fingerprint(
+        [_vm(Provider.aws, {**AWS_META, "instance_type": "t3.large"})]
+    )
+    assert base != resized
+
+
+def test_fingerprint_is_independent_of_order():
+    a = _vm(Provider.aws, dict(AWS_META))
+    b = SimpleNamespace(**{**vars(a), "name": "vm2"})
+    assert desired_fingerprint([a, b]) == desired_fingerprint([b, a])
+
+
+OLD = "cmp-cloud-project-p1-stack"
+EU = "cmp-cloud-project-p1-aws-eu-west-1-stack"
+US = "cmp-cloud-project-p1-aws-us-east-1-stack"
+
+
+def _urn(stack, type_, name):
+    return f"urn:pulumi:{stack}::cmp-cloud-project::{type_}::{name}"
+
+
+def _monolith():
+    root = _urn(OLD, "pulumi:pulumi:Stack", f"cmp-cloud-project-{OLD}")
+    resources = [{"urn": root, "type": "pulumi:pulumi:Stack"}]
+    for name, region in (("vm1", "eu-west-1"), ("vm2", "us-east-1")):
+        provider = _urn(OLD, "pulumi:providers:aws", f"aws-p-{region}")
+        resources += [
+            {"urn": provider, "id": f"id-{region}", "parent": root},
+            {
+                "urn": _urn(OLD, "aws:ec2/instance:Instance", name),
+                "parent": root,
+                "provider": f"{provider}::id-{region}",
+                "dependencies": [provider],
+                "propertyDependencies": {"ami": [provider]},
+                # user data mentioning the stack must survive untouched
+                "outputs": {"userData": f"echo urn:pulumi:{OLD}::"},
+            },
+        ]
+    return SimpleNamespace(version=3, deployment={"resources": resources})
+
+
+class _Workspace:
+    def __init__(self):
+        self.stacks = {OLD: _monolith()}
+        self.imported = {}
+        self.fail_on = None
+
+    def list_stacks(self):
+        return [SimpleNamespace(name=name) for name in self.stacks]
+
+    def export_stack(self, name):
+        return self.stacks[name]
+
+    def remove_stack(self, name, force=False):
+        assert force
+        del self.stacks[name]
+
+    @contextmanager
+    def checkout(self, name, project_name, program):
+        def import_stack(deployment):
+            if name == self.fail_on:
+                raise RuntimeError("import failed")
+            self.imported[name] = deployment.deployment
+
+        yield SimpleNamespace(
+            export_stack=lambda: SimpleNamespace(deployment={}),
+            import_stack=import_stack,
+        )
+
+
+@pytest.fixture
+def ws():
+    ws = _Workspace()
+    with (
+        mock.patch.object(pulumi_project, "workspace", return_value=ws),
+        mock.patch.object(pulumi_project, "checkout", ws.checkout),
+        mock.patch.object(pulumi_project, "evict"),
+        mock.patch.object(pulumi_project, "_ensure_cloud_env"),
+    ):
+        yield ws
+
+
+VMS = [
+    SimpleNamespace(provider=Provider.aws, name="vm1", region="eu-west-1"),
+    SimpleNamespace(provider=Provider.aws, name="vm2", region="us-east-1"),
+]
+
+
+def test_migration_rewrites_only_resource_references(ws):
+    assert sorted(pulumi_project.migrate_to_partitioned_stacks("p1", VMS)) == [EU, US]
+    assert OLD not in ws.stacks
+
+    root, provider, vm = ws.imported[EU]["resources"]
+    assert root["urn"] == _urn(EU, "pulumi:pulumi:Stack", f"cmp-cloud-project-{EU}")
+    assert provider["urn"] == _urn(EU, "pulumi:providers:aws", "aws-p-eu-west-1")
+    assert vm["urn"] == _urn(EU, "aws:ec2/instance:Instance", "vm1")
+    assert vm["parent"] == root["urn"]
+    assert vm["provider"] == f"{provider['urn']}::id-eu-west-1"
+    assert vm["dependencies"] == [provider["urn"]]
+    assert vm["propertyDependencies"] == {"ami": [provider["urn"]]}
+    assert vm["outputs"] == {"userData": f"echo urn:pulumi:{OLD}::"}
+
+
+def test_interrupted_migration_keeps_the_monolith_and_can_be_redone(ws):
+    ws.fail_on = US
+    with pytest.raises(RuntimeError):
+        pulumi_project.migrate_to_partitioned_stacks("p1", VMS)
+    assert OLD in ws.stacks
+    assert ws.stacks[OLD].deployment == _monolith().deployment
+
+    ws.fail_on = None
+    assert sorted(pulumi_project.migrate_to_partitioned_stacks("p1", VMS)) == [EU, US]
+    assert OLD not in ws.stacks
+    assert [r["urn"] for r in ws.imported[US]["resources"]][-1] == _urn(
+        US, "aws:ec2/instance:Instance", "vm2"
+    )
+    assert pulumi_project.migrate_to_partitioned_stacks("p1", VMS) == []
+
+
+STACK = "cmp-cloud-project-p1-stack"
+
+
+class _Stack:
+    """Records the engine runs up_stack asks for."""
+
+    def __init__(self, urns=(), drift=False):
+        self.urns = list(urns)
+        self.drift = drift
+        self.runs = []
+
+    def export_stack(self):
+        return SimpleNamespace(
+            deployment={"resources": [{"urn": u} for u in self.urns]}
+        )
+
+    def refresh(self, target=None, on_event=None):
+        self.runs.append(("refresh", target))
+        changes = {"update": 1} if self.drift else {"same": 2}
+        return SimpleNamespace(summary=SimpleNamespace(resource_changes=changes))
+
+    def up(self, target=None, refresh=False, on_event=None):
+        self.runs.append(("up", target, refresh))
+        return SimpleNamespace(outputs={"vm1-id": SimpleNamespace(value="i-new")})
+
+    def outputs(self):
+        return {"vm1-id": SimpleNamespace(value="i-old")}
+
+
+@contextmanager
+def _checked_out(stack):
+    @contextmanager
+    def checkout(name, project_name, program):
+        assert name == STACK
+        yield stack
+
+    with (
+        mock.patch.object(pulumi_project, "checkout", checkout),
+        mock.patch.object(pulumi_project, "_ensure_cloud_env"),
+    ):
+        yield
+
+
+def _res(name, state=ResourceState.RUNNING, meta=AWS_META):
+    return SimpleNamespace(
+        id=name,
+        provider=Provider.aws,
+        name=name,
+        region="eu-west-1",
+        state=state,
+        meta=dict(meta),
+    )
+
+
+REFRESH = ("refresh", None)
+
+
+def _up(refresh=False, target=None):
+    return ("up", target, refresh)
+
+
+@pytest.mark.parametrize(
+    "mode, drift_check, unchanged, drift, runs",
+    [
+        ("refresh_then_up", True, True, False, [REFRESH]),
+        ("refresh_then_up", True, True, True, [REFRESH, _up()]),
+        ("refresh_then_up", False, False, False, [REFRESH, _up()]),
+        ("up_with_refresh", True, True, False, [_up(refresh=True)]),
+        ("up_with_refresh", False, False, False, [_up(refresh=True)]),
+        # between drift checks: no refresh at all
+        ("scheduled_refresh", False, True, True, []),
+        ("scheduled_refresh", False, False, True, [_up()]),
+        # drift check: one run when there are changes, else a refresh-only pass
+        ("scheduled_refresh", True, False, False, [_up(refresh=True)]),
+        ("scheduled_refresh", True, True, False, [REFRESH]),
+        ("scheduled_refresh", True, True, True, [REFRESH, _up()]),
+    ],
+)
+def test_full_run_per_mode(mode, drift_check, unchanged, drift, runs):
+    resources = [_res("vm1")]
+    fingerprint = desired_fingerprint(resources) if unchanged else "stale"
+    stack, stats = _Stack(drift=drift), {}
+
+    with _checked_out(stack):
+        outputs = pulumi_project.up_stack(
+            STACK,
+            resources,
+            last_fingerprint=fingerprint,
+            mode=ReconcileMode(mode),
+            drift_check=drift_check,
+            stats=stats,
+        )
+
+    assert stack.runs == runs
+    skipped = not any(run[0] == "up" for run in runs)
+    assert stats["up_skipped"] is skipped
+    assert outputs == {"vm1-id": "i-old" if skipped else "i-new"}
+    assert ("refresh_seconds" in stats) is (REFRESH in runs)
+
+
+def _urn_of(name, type_="aws:ec2/instance:Instance"):
+    return _urn(STACK, type_, name)
+
+
+PROVIDER_URN = _urn_of("aws-p-eu-west-1", "pulumi:providers:aws")
+
+
+@pytest.mark.parametrize(
+    "mode, runs",
+    [
+        (
+            ReconcileMode.refresh_then_up,
+            [
+                # a refresh can only target what the state already has
+                ("refresh", [PROVIDER_URN, _urn_of("vm3")]),
+                _up(target=[PROVIDER_URN, _urn_of("vm2"), _urn_of("vm3")]),
+            ],
+        ),
+        (
+            ReconcileMode.up_with_refresh,
+            [_up(True, [PROVIDER_URN, _urn_of("vm2"), _urn_of("vm3")])],
+        ),
+    ],
+)
+def test_targeted_run_touches_only_the_dirty_resources(mode, runs):
+    settled = _res("vm1")
+    new = _res("vm2", ResourceState.PROVISIONING)
+    # omitted from the program, so the targeted up deletes it
+    going = _res("vm3", ResourceState.DEPROVISIONING)
+    stack = _Stack(urns=[PROVIDER_URN, _urn_of("vm1"), _urn_of("vm3")], drift=True)
+
+    with _checked_out(stack):
+        outputs = pulumi_project.up_stack(
+            STACK,
+            [settled, new, going],
+            # the fingerprint does not matter to a targeted run
+            last_fingerprint=desired_fingerprint([settled, new, going]),
+            targets=[new, going],
+            mode=mode,
+        )
+
+    assert stack.runs == runs
+    assert outputs == {"vm1-id": "i-new"}
+
+
+def test_targeted_run_with_nothing_to_target_skips_the_engine():
+    # deleted before its first up: neither in the state nor in the program
+    gone = _res("vm1", ResourceState.DEPROVISIONING)
+    stack, stats = _Stack(), {}
+
+    with _checked_out(stack):
+        outputs = pulumi_project.up_stack(STACK, [gone], targets=[gone], stats=stats)
+
+    assert stack.runs == []
+    assert stats["up_skipped"] is True
+    assert outputs == {"vm1-id": "i-old"}
@@ -0,0 +1,105 @@
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from cmp_core.core.config import settings
+from cmp_core.lib import pulumi_workspaces
+
+
+@pytest.fixture
+def created(tmp_path):
+    """Stands in for create_or_select_stack; each stack gets a real work dir."""
+    stacks = []
+
+    def create(stack_name, project_name, program, opts):
+        work_dir = tmp_path / f"{stack_name}-{len(stacks)}"
+        work_dir.mkdir()
+        (work_dir / "Pulumi.yaml").write_text(f"name: {project_name}\n")
+        stack = SimpleNamespace(
+            name=stack_name,
+            workspace=SimpleNamespace(work_dir=str(work_dir), program=program),
+        )
+        stacks.append(stack)
+        return stack
+
+    pulumi_workspaces.clear()
+    with (
+        mock.patch.object(pulumi_workspaces, "create_or_select_stack", create),
+        mock.patch.object(pulumi_workspaces, "pulumi_command"),
+        mock.patch.object(settings, "pulumi_workspace_pool_size", 2),
+        mock.patch.object(settings, "pulumi_workspace_max_idle_seconds", 600),
+    ):
+        yield stacks
+    pulumi_workspaces.clear()
+
+
+def _use(stack_name, program=None):
+    with pulumi_workspaces.checkout(stack_name, "p", program) as stack:
+        return stack
+
+
+def _alive(stack):
+    return os.path.isdir(stack.workspace.work_dir)
+
+
+def test_stack_is_reused_with_the_new_program(created):
+    first = _use("a", program="v1")
+    again = _use("a", program="v2")
+
+    assert again is first
+    assert again.workspace.program == "v2"
+    assert len(created) == 1
+
+
+def test_failed_operation_discards_the_workspace(created):
+    with pytest.raises(RuntimeError):
+        with pulumi_workspaces.checkout("a", "p", None) as failed:
+            raise RuntimeError("engine crashed")
+
+    assert not _alive(failed)
+    assert _use("a") is not failed
+
+
+def test_least_recently_used_are_evicted_beyond_the_pool_size(created):
+    a, b = _use("a"), _use("b")
+    _use("a")
+    c = _use("c")
+
+    assert list(pulumi_workspaces._idle) == ["a", "c"]
+    assert not _alive(b)
+    assert _alive(a) and _alive(c)
+
+
+def test_stale_workspaces_are_replaced(created):
+    idle = _use("a")
+    with mock.patch.object(
+        pulumi_workspaces.time,
+        "monotonic",
+        return_value=pulumi_workspaces.time.monotonic() + 601,
+    ):
+        assert _use("a") is not idle
+    assert not _alive(idle)
+
+    broken = _use("a")
+    os.remove(f"{broken.workspace.work_dir}/Pulumi.yaml")
+    assert _use("a") is not broken
+
+
+def test_concurrent_checkouts_of_a_stack_get_their_own_workspace(created):
+    with pulumi_workspaces.checkout("a", "p", None) as outer:
+        inner = _use("a")
+        assert inner is not outer
+    # the later return wins; the other one is dropped
+    assert pulumi_workspaces._idle["a"][0] is outer
+    assert not _alive(inner)
+
+
+def test_evict_drops_the_pooled_workspace(created):
+    stack = _use("a")
+
+    pulumi_workspaces.evict("a")
+
+    assert "a" not in pulumi_workspaces._idle
+    assert not _alive(stack)
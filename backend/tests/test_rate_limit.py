@@ -0,0 +1,179 @@
+from unittest import mock
+
+import fakeredis
+import pytest
+from azure.core.exceptions import HttpResponseError
+from botocore.exceptions import ClientError
+
+from cmp_core.core.config import settings
+from cmp_core.lib import rate_limit
+
+RATE, BURST, MAX_WAIT = 2.0, 4.0, 10.0
+BUCKET = rate_limit.azure("sub", rate_limit.WRITE)
+
+
+class _Clock:
+    """Stands in for the time module; sleeping moves the clock forward."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    clock = _Clock()
+    with (
+        mock.patch.object(rate_limit, "time", clock),
+        mock.patch.object(
+            rate_limit,
+            "get_redis",
+            return_value=fakeredis.FakeRedis(decode_responses=True),
+        ),
+        mock.patch.object(
+            settings, "cloud_rate_limits", {"azure.write": (RATE, BURST)}
+        ),
+        mock.patch.object(settings, "cloud_rate_limit_max_wait_seconds", MAX_WAIT),
+        mock.patch.object(rate_limit, "metrics") as metrics,
+    ):
+        clock.metrics = metrics
+        yield clock
+
+
+def _state():
+    return rate_limit.get_redis().hgetall(BUCKET.key())
+
+
+def test_burst_then_reserved_tokens_in_order(clock):
+    assert [rate_limit.acquire(BUCKET) for _ in range(int(BURST))] == [0.0] * 4
+    assert clock.slept == []
+
+    # each caller short of a token reserves the next one, 1/rate apart
+    with mock.patch.object(clock, "sleep"):
+        waits = [rate_limit.acquire(BUCKET) for _ in range(3)]
+    assert waits == pytest.approx([0.5, 1.0, 1.5])
+    assert float(_state()["tokens"]) == pytest.approx(-3.0)
+
+
+def test_tokens_refill_up_to_the_burst(clock):
+    for _ in range(int(BURST)):
+        rate_limit.acquire(BUCKET)
+
+    clock.now += 1.0
+    assert rate_limit.acquire(BUCKET) == 0.0
+    assert float(_state()["tokens"]) == pytest.approx(RATE - 1)
+
+    clock.now += 3600
+    rate_limit.acquire(BUCKET)
+    assert float(_state()["tokens"]) == pytest.approx(BURST - 1)
+
+
+def test_overrun_calls_after_max_wait_without_reserving(clock):
+    with mock.patch.object(clock, "sleep"):
+        for _ in range(int(BURST + RATE * MAX_WAIT)):
+            rate_limit.acquire(BUCKET)
+    tokens = float(_state()["tokens"])
+    assert tokens == pytest.approx(-RATE * MAX_WAIT)
+
+    # the next token is due after more than MAX_WAIT: nothing is reserved
+    assert rate_limit.acquire(BUCKET) == MAX_WAIT
+    assert clock.slept == [MAX_WAIT]
+    assert float(_state()["tokens"]) == pytest.approx(tokens)
+    clock.metrics.incr.assert_called_once_with(
+        "cloud_rate_limit_overrun_total", provider="azure", family="write"
+    )
+
+
+def test_throttle_halves_the_rate_which_then_recovers(clock):
+    rate_limit.acquire(BUCKET)
+    for expected in [1 / 2, 1 / 4, 1 / 8, 1 / 16, 1 / 16]:
+        rate_limit.throttled(BUCKET)
+        assert float(_state()["factor"]) == expected
+    assert float(_state()["tokens"]) == 0.0
+
+    # at 1/16 of the rate a token takes 16 / rate seconds
+    with mock.patch.object(clock, "sleep"):
+        assert rate_limit.acquire(BUCKET) == pytest.approx(16 / RATE)
+
+    clock.now += rate_limit.RECOVERY_SECONDS / 2
+    rate_limit.acquire(BUCKET)
+    assert float(_state()["factor"]) == pytest.approx(1 / 16 + 1 / 2)
+    clock.now += rate_limit.RECOVERY_SECONDS
+    rate_limit.acquire(BUCKET)
+    assert float(_state()["factor"]) == 1.0
+
+
+def _aws_error(code):
+    return ClientError({"Error": {"Code": code}}, "DescribeInstances")
+
+
+def _arm_error(status, headers):
+    return HttpResponseError(
+        response=mock.Mock(status_code=status, headers=headers, reason="")
+    )
+
+
+@pytest.mark.parametrize(
+    "error, delay",
+    [
+        (_aws_error("RequestLimitExceeded"), 0.0),
+        (_aws_error("ThrottlingException"), 0.0),
+        (_aws_error("InvalidInstanceID.NotFound"), None),
+        (_arm_error(429, {"Retry-After": "7"}), 7.0),
+        (_arm_error(429, {"Retry-After": "soon"}), 0.0),
+        (_arm_error(429, {}), 0.0),
+        (_arm_error(409, {"Retry-After": "7"}), None),
+        (RuntimeError("boom"), None),
+    ],
+)
+def test_throttle_delay(error, delay):
+    assert rate_limit.throttle_delay(error) == delay
+
+
+def test_call_retries_throttles_with_backoff(clock):
+    fn = mock.Mock(side_effect=[_arm_error(429, {"Retry-After": "20"}), "ok"])
+
+    with mock.patch.object(rate_limit.random, "random", return_value=0.5):
+        assert rate_limit.call(BUCKET, fn, "a", b=1) == "ok"
+
+    assert fn.call_args_list == [mock.call("a", b=1)] * 2
+    # Retry-After wins over the shorter backoff
+    assert clock.slept[-1] == 20.0
+    # halved, then recovering while the retry waited
+    factor = 1 / 2 + 20.0 / rate_limit.RECOVERY_SECONDS
+    assert float(_state()["factor"]) == pytest.approx(factor)
+
+
+def test_call_gives_up_after_the_configured_retries(clock):
+    error = _aws_error("Throttling")
+    fn = mock.Mock(side_effect=error)
+
+    with (
+        mock.patch.object(settings, "cloud_throttle_retries", 2),
+        mock.patch.object(rate_limit.random, "random", return_value=0.5),
+        pytest.raises(ClientError) as raised,
+    ):
+        rate_limit.call(BUCKET, fn)
+
+    assert raised.value is error
+    assert fn.call_count == 3
+    # backoff doubles between attempts
+    assert clock.slept == [1.0, 2.0]
+
+
+def test_call_does_not_retry_other_errors(clock):
+    fn = mock.Mock(side_effect=_aws_error("UnauthorizedOperation"))
+
+    with pytest.raises(ClientError):
+        rate_limit.call(BUCKET, fn)
+
+    assert fn.call_count == 1
+    assert float(_state()["factor"]) == 1.0
+    clock.metrics.incr.assert_not_called()
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import uuid
+from unittest import mock
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+
+from cmp_core.core import deps
+from cmp_core.core.db import get_db
+from cmp_core.lib import reconcile_events
+from cmp_core.lib.reconcile_events import ReconcileEventHub
+from cmp_core.main import app
+from cmp_core.services import project as project_service
+
+PROJECT = uuid.uuid4()
+PID = str(PROJECT)
+
+
+@pytest_asyncio.fixture
+async def redis():
+    server = fakeredis.FakeServer()
+    hub = ReconcileEventHub()
+    hub._client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    r = fakeredis.FakeRedis(server=server, decode_responses=True)
+    with (
+        mock.patch.object(reconcile_events, "get_redis", return_value=r),
+        mock.patch.object(project_service, "hub", hub),
+    ):
+        yield r
+    hub._task.cancel()
+
+
+async def _ids(stream, count: int) -> list[int]:
+    ids = []
+    while len(ids) < count:
+        chunk = await asyncio.wait_for(stream.__anext__(), timeout=2)
+        if chunk.startswith("id: "):
+            ids.append(int(chunk.split("\n")[0][4:]))
+    return ids
+
+
+def _publish(count: int) -> None:
+    for _ in range(count):
+        reconcile_events.publish(PID, "reconcile", status="started")
+
+
+@pytest.mark.asyncio
+async def test_new_client_gets_everything_published_after_connecting(redis):
+    _publish(2)
+    stream = project_service.reconcile_event_stream(PROJECT)
+    assert await stream.__anext__() == "retry: 3000\n\n"
+
+    _publish(3)
+    assert await _ids(stream, 3) == [3, 4, 5]
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_resumed_client_gets_the_backlog_once(redis):
+    _publish(3)
+    stream = project_service.reconcile_event_stream(PROJECT, last_event_id=1)
+    assert await stream.__anext__() == "retry: 3000\n\n"
+
+    _publish(1)
+    assert await _ids(stream, 3) == [2, 3, 4]
+    _publish(1)
+    assert await _ids(stream, 1) == [5]
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_events_missed_on_the_channel_are_filled_from_the_buffer(redis):
+    stream = project_service.reconcile_event_stream(PROJECT)
+    assert await stream.__anext__() == "retry: 3000\n\n"
+
+    # buffered but never seen on the channel, as during a reconnect
+    seq = redis.incr(reconcile_events._seq_key(PID))
+    redis.rpush(
+        reconcile_events._history_key(PID),
+        json.dumps({"id": seq, "type": "reconcile", "status": "started"}),
+    )
+    _publish(1)
+    assert await _ids(stream, 2) == [1, 2]
+    await stream.aclose()
+
+
+@pytest.mark.parametrize(
+    "auth, status_code",
+    [
+        ({"headers": {"Authorization": "Bearer t"}}, 503),
+        # EventSource cannot set headers
+        ({"params": {"token": "t"}}, 503),
+        ({}, 401),
+    ],
+)
+def test_stream_takes_the_token_from_the_header_or_the_query(auth, status_code):
+    # a project member
+    member = mock.Mock(execute=mock.AsyncMock(return_value=mock.Mock()))
+    app.dependency_overrides[get_db] = lambda: member
+    try:
+        with (
+            mock.patch.object(
+                deps, "user_from_token", mock.AsyncMock(return_value=mock.Mock())
+            ) as user_from_token,
+            mock.patch.object(ReconcileEventHub, "available", False),
+        ):
+            response = TestClient(app).get(
+                f"/api/v1/projects/{PID}/reconcile/stream", **auth
+            )
+    finally:
+        app.dependency_overrides.clear()
+
+    # 503: authenticated, then refused for want of Redis
+    assert response.status_code == status_code
+    if status_code == 503:
+        assert user_from_token.call_args.args[1] == "t"
@@ -0,0 +1,394 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+import boto3
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+from cmp_core.core.config import settings
+from cmp_core.models.resource import Provider, Resource, ResourceState
+from cmp_core.tasks import ec2, pulumi
+
+
+def _resource(provider=Provider.aws, state=ResourceState.RUNNING, name="vm"):
+    return Resource(
+        id=uuid.uuid4(),
+        project_id=uuid.uuid4(),
+        provider=provider,
+        name=name,
+        region="eu-west-1",
+        state=state,
+        meta={},
+        created_by=uuid.uuid4(),
+    )
+
+
+def _reconcile(resource, outputs, live_states):
+    return pulumi.reconcile_single(resource, outputs, {}, None, {}, {}, live_states)
+
+
+@pytest.fixture
+def no_cloud_calls():
+    with (
+        mock.patch.object(pulumi, "fetch_aws_info", side_effect=AssertionError),
+        mock.patch.object(pulumi, "fetch_azure_info", side_effect=AssertionError),
+        mock.patch.object(pulumi.cloud_clients, "ec2", side_effect=AssertionError),
+    ):
+        yield
+
+
+def test_terminated_resources_with_an_id_are_prefetched():
+    resources = [
+        _resource(state=ResourceState.TERMINATED, name="gone"),
+        _resource(state=ResourceState.DEPROVISIONING, name="going"),
+        _resource(provider=Provider.azure, name="bad-id"),
+    ]
+    outputs = {"gone-id": "i-1", "going-id": "i-2", "bad-id-id": "not-an-arm-id"}
+
+    aws, azure = pulumi._live_state_targets(resources, outputs)
+
+    assert aws == {"eu-west-1": ["i-1"]}
+    assert azure == {}
+
+
+@pytest.mark.parametrize(
+    "provider, cloud_id", [(Provider.aws, "i-1"), (Provider.azure, "not-an-arm-id")]
+)
+def test_id_missing_from_the_prefetch_counts_as_not_found(
+    no_cloud_calls, provider, cloud_id
+):
+    resource = _resource(provider=provider)
+
+    resource, event = _reconcile(resource, {"vm-id": cloud_id}, live_states={})
+
+    assert resource.state == ResourceState.ERROR
+    assert event.action == "reconcile_live_not_found"
+
+
+@pytest.mark.parametrize(
+    "state, live, action",
+    [
+        (ResourceState.RUNNING, "stopped", "start_triggered"),
+        (ResourceState.STOPPED, "running", "stop_triggered"),
+    ],
+)
+def test_auto_heal_is_recorded_not_sent(no_cloud_calls, state, live, action):
+    resource = _resource(state=state)
+
+    with (
+        mock.patch.object(ec2, "start_ec2_task") as start,
+        mock.patch.object(ec2, "stop_ec2_task") as stop,
+    ):
+        resource, event = _reconcile(
+            resource, {"vm-id": "i-1"}, live_states={"i-1": {"state": live}}
+        )
+
+    assert resource.state == state
+    assert event.details["auto_heal_action"] == action
+    start.delay.assert_not_called()
+    stop.delay.assert_not_called()
+
+
+def test_auto_heal_dispatch_picks_the_provider_task():
+    with (
+        mock.patch.object(ec2, "start_ec2_task") as start,
+        mock.patch.object(ec2, "stop_ec2_task") as stop,
+    ):
+        pulumi._dispatch_auto_heal("r1", "aws", "u1", "stop_triggered")
+        pulumi._dispatch_auto_heal("r2", "gcp", "u1", "start_triggered")
+
+    stop.delay.assert_called_once_with("r1", "u1")
+    start.delay.assert_not_called()
+
+
+@pytest.fixture
+def unlimited():
+    with (
+        mock.patch.object(pulumi.rate_limit, "get_redis", return_value=None),
+        mock.patch.object(
+            pulumi.rate_limit.cloud_clients, "aws_identity", return_value="key"
+        ),
+    ):
+        yield
+
+
+def _instance(aws_id, state="running"):
+    return {
+        "InstanceId": aws_id,
+        "State": {"Name": state},
+        "LaunchTime": datetime(2026, 1, 1, tzinfo=timezone.utc),
+        "PublicIpAddress": f"10.0.0.{aws_id[-1]}",
+    }
+
+
+def _page(*instances, next_token=None):
+    page = {"Reservations": [{"Instances": list(instances)}]}
+    if next_token:
+        page["NextToken"] = next_token
+    return page
+
+
+@pytest.fixture
+def ec2_client():
+    client = boto3.client(
+        "ec2",
+        region_name="eu-west-1",
+        aws_access_key_id="key",
+        aws_secret_access_key="secret",
+    )
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+def test_aws_states_are_read_in_pages_per_batch(unlimited, ec2_client):
+    client, stubber = ec2_client
+    ids = ["i-1", "i-2", "i-3"]
+    stubber.add_response(
+        "describe_instances",
+        _page(_instance("i-1"), next_token="t"),
+        {"InstanceIds": ids},
+    )
+    stubber.add_response(
+        "describe_instances",
+        _page(_instance("i-3", "stopped")),
+        {"InstanceIds": ids, "NextToken": "t"},
+    )
+
+    # duplicates are asked for once
+    live = pulumi.fetch_aws_info_bulk(client, ids + ["i-1", ""])
+
+    assert live == {
+        "i-1": {
+            "public_ip": "10.0.0.1",
+            "launch_time": "2026-01-01T00:00:00+00:00",
+            "state": "running",
+        },
+        # not returned: not found
+        "i-2": None,
+        "i-3": {
+            "public_ip": "10.0.0.3",
+            "launch_time": "2026-01-01T00:00:00+00:00",
+            "state": "stopped",
+        },
+    }
+
+
+def test_unknown_aws_id_retries_the_batch_with_filters(unlimited, ec2_client):
+    client, stubber = ec2_client
+    ids = ["i-1", "i-gone"]
+    stubber.add_client_error(
+        "describe_instances",
+        "InvalidInstanceID.NotFound",
+        expected_params={"InstanceIds": ids},
+    )
+    stubber.add_response(
+        "describe_instances",
+        _page(_instance("i-1")),
+        {"Filters": [{"Name": "instance-id", "Values": ids}]},
+    )
+
+    live = pulumi.fetch_aws_info_bulk(client, ids)
+
+    assert live["i-1"]["state"] == "running"
+    assert live["i-gone"] is None
+
+
+def test_other_aws_errors_fail_the_batch(unlimited, ec2_client):
+    client, stubber = ec2_client
+    stubber.add_client_error("describe_instances", "UnauthorizedOperation")
+
+    with pytest.raises(ClientError):
+        pulumi.fetch_aws_info_bulk(client, ["i-1"])
+
+
+SUB = "00000000-0000-0000-0000-000000000001"
+
+
+def _arm_id(kind, name, rg="rg"):
+    return f"/subscriptions/{SUB}/resourceGroups/{rg}/providers/{kind}/{name}"
+
+
+def _vm(name, power="running", rg="rg"):
+    return SimpleNamespace(
+        id=_arm_id("Microsoft.Compute/virtualMachines", name, rg),
+        name=name,
+        location="westeurope",
+        instance_view=SimpleNamespace(
+            statuses=[
+                SimpleNamespace(
+                    code="ProvisioningState/succeeded", display_status="ok"
+                ),
+                SimpleNamespace(
+                    code=f"PowerState/{power}", display_status=f"VM {power}"
+                ),
+            ]
+        ),
+    )
+
+
+def _nic(name, vm_id, pip=None, primary=False):
+    pip_ref = SimpleNamespace(id=pip) if pip else None
+    return SimpleNamespace(
+        virtual_machine=SimpleNamespace(id=vm_id) if vm_id else None,
+        primary=primary,
+        ip_configurations=[SimpleNamespace(public_ip_address=pip_ref)],
+    )
+
+
+def _pip(name, ip):
+    return SimpleNamespace(
+        id=_arm_id("Microsoft.Network/publicIPAddresses", name), ip_address=ip
+    )
+
+
+def _azure_clients(vms, nics, pips):
+    compute = SimpleNamespace(
+        virtual_machines=SimpleNamespace(list_all=mock.Mock(return_value=vms))
+    )
+    network = SimpleNamespace(
+        network_interfaces=SimpleNamespace(list_all=mock.Mock(return_value=nics)),
+        public_ip_addresses=SimpleNamespace(list_all=mock.Mock(return_value=pips)),
+    )
+    return compute, network
+
+
+def test_azure_states_are_joined_from_three_list_calls(unlimited):
+    web, db, other = _vm("web"), _vm("db", "deallocated"), _vm("other")
+    compute, network = _azure_clients(
+        vms=[web, db, other],
+        nics=[
+            _nic("web-2", web.id, pip=_pip("web-2", "1.1.1.2").id),
+            # the primary NIC wins whatever the listing order
+            _nic("web-1", web.id, pip=_pip("web-1", "1.1.1.1").id, primary=True),
+            _nic("web-3", web.id, pip=_pip("web-3", "1.1.1.3").id),
+            _nic("db", db.id),
+            _nic("loose", None, pip=_pip("loose", "9.9.9.9").id),
+        ],
+        pips=[
+            _pip("web-2", "1.1.1.2"),
+            _pip("web-1", "1.1.1.1"),
+            _pip("loose", "9.9.9.9"),
+        ],
+    )
+    # ARM IDs are case-insensitive; results are keyed by the ID as asked
+    asked_web = web.id.upper()
+    gone = _arm_id("Microsoft.Compute/virtualMachines", "gone")
+
+    live = pulumi.fetch_azure_info_bulk(SUB, [asked_web, db.id, gone], compute, network)
+
+    assert set(live) == {asked_web, db.id, gone}
+    assert live[asked_web] == {
+        "azure_vm_id": web.id,
+        "actual_vm_name": "web",
+        "power_state": "VM running",
+        "public_ip": "1.1.1.1",
+        "subscription_id": SUB,
+        "resource_group_name": "rg",
+        "location": "westeurope",
+    }
+    assert live[db.id]["power_state"] == "VM deallocated"
+    assert live[db.id]["public_ip"] is None
+    assert live[gone] is None
+    compute.virtual_machines.list_all.assert_called_once_with(status_only="true")
+
+
+def test_azure_vm_without_a_power_status_is_unknown(unlimited):
+    vm = _vm("web")
+    vm.instance_view.statuses = vm.instance_view.statuses[:1]
+    compute, network = _azure_clients([vm], [], [])
+
+    live = pulumi.fetch_azure_info_bulk(SUB, [vm.id], compute, network)
+
+    assert live[vm.id]["power_state"] == "unknown"
+
+
+def _prefetch(resources, outputs):
+    return pulumi.prefetch_live_states(resources, outputs, {}, None, {}, {})
+
+
+@pytest.fixture
+def fake_clients():
+    with (
+        mock.patch.object(
+            pulumi.cloud_clients, "ec2", side_effect=lambda region: region
+        ),
+        mock.patch.object(pulumi.cloud_clients, "azure_compute"),
+        mock.patch.object(pulumi.cloud_clients, "azure_network"),
+    ):
+        yield
+
+
+def test_provider_cap_bounds_the_bulk_sweeps(fake_clients):
+    regions = ["eu-west-1", "eu-west-2", "us-east-1", "us-west-2"]
+    resources = []
+    for i, region in enumerate(regions):
+        resource = _resource(name=f"vm{i}")
+        resource.region = region
+        resources.append(resource)
+    outputs = {f"vm{i}-id": f"i-{i}" for i in range(len(regions))}
+    lock, active, peak = threading.Lock(), [0], [0]
+
+    def sweep(region, aws_ids):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return {aws_id: {"state": region} for aws_id in aws_ids}
+
+    with (
+        mock.patch.object(settings, "reconcile_aws_concurrency", 1),
+        mock.patch.object(pulumi, "fetch_aws_info_bulk", side_effect=sweep) as bulk,
+    ):
+        live = _prefetch(resources, outputs)
+
+    assert bulk.call_count == len(regions)
+    assert peak[0] == 1
+    assert live == {f"i-{i}": {"state": region} for i, region in enumerate(regions)}
+
+
+def test_failed_sweep_falls_back_to_one_fetch_per_resource(fake_clients):
+    vm_ids = [_arm_id("Microsoft.Compute/virtualMachines", f"vm{i}") for i in range(3)]
+    resources = [_resource(provider=Provider.azure, name=f"vm{i}") for i in range(3)]
+    resources.append(_resource(name="ec2"))
+    outputs = {f"vm{i}-id": vm_id for i, vm_id in enumerate(vm_ids)}
+    outputs["ec2-id"] = "i-1"
+    boom = RuntimeError("boom")
+    singles = {
+        vm_ids[0]: {"power_state": "VM running"},
+        vm_ids[1]: ResourceNotFoundError("gone"),
+        vm_ids[2]: boom,
+    }
+
+    def single(vm_id, *clients):
+        if isinstance(singles[vm_id], Exception):
+            raise singles[vm_id]
+        return singles[vm_id]
+
+    with (
+        mock.patch.object(
+            pulumi, "fetch_azure_info_bulk", side_effect=RuntimeError("list failed")
+        ),
+        mock.patch.object(pulumi, "fetch_azure_info", side_effect=single) as fetch,
+        mock.patch.object(
+            pulumi, "fetch_aws_info_bulk", return_value={"i-1": {"state": "running"}}
+        ),
+        mock.patch.object(pulumi, "fetch_aws_info", side_effect=AssertionError),
+    ):
+        live = _prefetch(resources, outputs)
+
+    assert fetch.call_count == 3
+    assert live == {
+        "i-1": {"state": "running"},
+        vm_ids[0]: {"power_state": "VM running"},
+        vm_ids[1]: None,
+        vm_ids[2]: boom,
+    }
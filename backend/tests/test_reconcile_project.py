@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import cmp_core.models as models
+from cmp_core.core.config import settings
+from cmp_core.models.base import Base
+from cmp_core.models.resource import Provider, Resource, ResourceState
+from cmp_core.models.stack_state import StackState
+from cmp_core.tasks import pulumi
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with (
+        mock.patch.object(pulumi, "SessionLocal", sessionmaker(engine)),
+        mock.patch.object(pulumi, "reconcile_events"),
+        mock.patch.object(pulumi.cloud_clients, "azure_credential"),
+        mock.patch.object(settings, "pulumi_stack_partitioning", False),
+        mock.patch.object(settings, "pulumi_targeted_updates", True),
+    ):
+        yield pulumi.SessionLocal
+
+
+def _project(session_factory, *states):
+    """A project with one AWS VM per state; VMs past their first up have an ID."""
+    with session_factory() as session:
+        user = models.User(email="ops@example.com", password_hash="x")
+        session.add(user)
+        session.flush()
+        project = models.Project(name="p", owner_id=user.id)
+        session.add(project)
+        session.flush()
+        for i, state in enumerate(states):
+            meta = {"ami": "ami-1", "instance_type": "t3.micro"}
+            if state != ResourceState.PENDING_PROVISION:
+                meta["aws_id"] = f"i-{i}"
+            session.add(
+                Resource(
+                    project_id=project.id,
+                    provider="aws",
+                    resource_type="vm",
+                    name=f"vm{i}",
+                    region="eu-west-1",
+                    state=state,
+                    meta=meta,
+                    created_by=user.id,
+                )
+            )
+        session.commit()
+        return project.id
+
+
+def _reconcile(project_id, live_states, outputs=None, drift_due=False):
+    with (
+        mock.patch.object(pulumi, "_drift_check_due", return_value=drift_due),
+        mock.patch.object(pulumi, "up_stack", return_value=outputs or {}) as up,
+        mock.patch.object(
+            pulumi, "prefetch_live_states", return_value=live_states
+        ) as prefetch,
+        mock.patch.object(pulumi, "_dispatch_auto_heal") as heal,
+    ):
+        pulumi._reconcile_project(project_id, mock.Mock())
+    return up, prefetch, heal
+
+
+def _states(session_factory):
+    with session_factory() as session:
+        return {res.name: res.state for res in session.query(Resource)}
+
+
+def test_settled_project_skips_pulumi_and_syncs_from_meta(db):
+    project_id = _project(db, ResourceState.RUNNING, ResourceState.STOPPED)
+
+    up, prefetch, heal = _reconcile(
+        project_id, {"i-0": {"state": "stopped"}, "i-1": {"state": "stopped"}}
+    )
+
+    up.assert_not_called()
+    resources, outputs = prefetch.call_args.args[:2]
+    assert sorted(res.name for res in resources) == ["vm0", "vm1"]
+    assert outputs == {"vm0-id": "i-0", "vm0-ip": None, "vm1-id": "i-1", "vm1-ip": None}
+    # the live sync still runs: vm0 was stopped outside the platform
+    (_, provider, _, action), _ = heal.call_args
+    assert (provider, action) == ("aws", "start_triggered")
+    assert _states(db) == {"vm0": ResourceState.RUNNING, "vm1": ResourceState.STOPPED}
+    with db() as session:
+        assert session.query(models.PulumiRun).count() == 0
+
+
+def test_drift_check_runs_pulumi_without_pending_work(db):
+    project_id = _project(db, ResourceState.RUNNING)
+
+    up, _, _ = _reconcile(
+        project_id,
+        {"i-0": {"state": "running"}},
+        outputs={"vm0-id": "i-0"},
+        drift_due=True,
+    )
+
+    up.assert_called_once()
+    assert up.call_args.kwargs["targets"] is None
+    assert up.call_args.kwargs["drift_check"] is True
+
+
+def test_terminated_project_needs_no_drift_check(db):
+    project_id = _project(db, ResourceState.TERMINATED)
+
+    up, _, _ = _reconcile(project_id, {}, drift_due=True)
+
+    up.assert_not_called()
+
+
+def test_pending_resource_runs_a_targeted_up(db):
+    project_id = _project(db, ResourceState.RUNNING, ResourceState.PENDING_PROVISION)
+
+    up, prefetch, _ = _reconcile(
+        project_id,
+        {"i-0": {"state": "running"}, "i-new": {"state": "running"}},
+        outputs={"vm0-id": "i-0", "vm1-id": "i-new"},
+    )
+
+    (_, program), kwargs = up.call_args
+    assert sorted(snap.name for snap in program) == ["vm0", "vm1"]
+    assert [snap.name for snap in kwargs["targets"]] == ["vm1"]
+    assert kwargs["targets"][0].state == ResourceState.PROVISIONING
+    assert kwargs["drift_check"] is False
+    assert prefetch.call_args.args[1] == {"vm0-id": "i-0", "vm1-id": "i-new"}
+    with db() as session:
+        (run,) = session.query(models.PulumiRun)
+        assert run.targeted is True
+        # targeted runs do not move the drift cadence
+        assert session.query(StackState).count() == 0
+
+
+@pytest.mark.parametrize(
+    "state, meta, needs_iac",
+    [
+        (ResourceState.RUNNING, {"aws_id": "i-1"}, False),
+        (ResourceState.STOPPED, {"aws_id": "i-1"}, False),
+        (ResourceState.ERROR, {"aws_id": "i-1"}, False),
+        # never got a cloud ID, so Pulumi has not created it yet
+        (ResourceState.RUNNING, {}, True),
+        (ResourceState.TERMINATED, {}, False),
+        (ResourceState.PENDING_UPDATE, {"aws_id": "i-1"}, True),
+        (ResourceState.DEPROVISIONING, {"aws_id": "i-1"}, True),
+        (ResourceState.ERROR_PROVISIONING, {"aws_id": "i-1"}, True),
+    ],
+)
+def test_needs_iac(state, meta, needs_iac):
+    resource = Resource(provider=Provider.aws, name="vm", state=state, meta=meta)
+    assert pulumi._needs_iac(resource) is needs_iac
+
+
+def test_drift_check_is_due_after_the_interval():
+    interval = timedelta(minutes=settings.reconcile_drift_check_interval_minutes)
+    now = datetime.now(timezone.utc)
+
+    assert pulumi._drift_check_due(None)
+    assert pulumi._drift_check_due(StackState(stack_name="s"))
+    assert not pulumi._drift_check_due(
+        StackState(stack_name="s", last_up_at=now - interval + timedelta(minutes=1))
+    )
+    assert pulumi._drift_check_due(
+        StackState(stack_name="s", last_up_at=now - interval)
+    )
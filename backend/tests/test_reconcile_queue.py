@@ -0,0 +1,112 @@
+import time
+from unittest import mock
+
+import fakeredis
+import pytest
+
+from cmp_core.lib import reconcile_queue
+
+PROJECT = "p1"
+
+
+@pytest.fixture
+def redis():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    with mock.patch.object(reconcile_queue, "get_redis", return_value=r):
+        yield r
+
+
+def test_request_while_queued_is_dropped(redis):
+    assert reconcile_queue.request_reconcile(PROJECT) is True
+    assert reconcile_queue.request_reconcile(PROJECT) is False
+    assert reconcile_queue.request_reconcile("p2") is True
+
+
+def test_request_while_running_records_one_follow_up(redis):
+    reconcile_queue.request_reconcile(PROJECT)
+    assert reconcile_queue.begin_reconcile(PROJECT) is True
+
+    # the running one picks these up when it finishes; nothing is dispatched
+    assert reconcile_queue.request_reconcile(PROJECT) is False
+    assert reconcile_queue.request_reconcile(PROJECT) is False
+
+    assert reconcile_queue.finish_reconcile(PROJECT) <= time.time()
+    # the follow-up is the pending request; a new request is still coalesced
+    assert reconcile_queue.request_reconcile(PROJECT) is False
+    assert reconcile_queue.begin_reconcile(PROJECT) is True
+    assert reconcile_queue.finish_reconcile(PROJECT) is None
+
+
+def test_delayed_request_while_running_keeps_its_due_time(redis):
+    assert reconcile_queue.begin_reconcile(PROJECT) is True
+    assert reconcile_queue.request_reconcile(PROJECT, delay=30) is False
+
+    due_at = reconcile_queue.finish_reconcile(PROJECT)
+    assert due_at - time.time() == pytest.approx(30, abs=1)
+
+
+def test_begin_while_running_defers_to_a_single_follow_up(redis):
+    assert reconcile_queue.begin_reconcile(PROJECT) is True
+    # duplicate deliveries of the task while the first run is in progress
+    assert reconcile_queue.begin_reconcile(PROJECT) is False
+    assert reconcile_queue.begin_reconcile(PROJECT) is False
+
+    assert reconcile_queue.finish_reconcile(PROJECT) is not None
+    assert reconcile_queue.begin_reconcile(PROJECT) is True
+    assert reconcile_queue.finish_reconcile(PROJECT) is None
+    assert reconcile_queue.request_reconcile(PROJECT) is True
+
+
+def test_queue_status_reports_due_times_and_running(redis):
+    before = time.time()
+    reconcile_queue.request_reconcile("queued")
+    reconcile_queue.request_reconcile("delayed", delay=60)
+    reconcile_queue.begin_reconcile("running")
+
+    queued, running = reconcile_queue.queue_status(
+        ["queued", "delayed", "running", "idle"]
+    )
+
+    assert set(queued) == {"queued", "delayed"}
+    assert before <= queued["queued"] <= time.time()
+    assert queued["delayed"] - queued["queued"] == pytest.approx(60, abs=1)
+    assert running == {"running"}
+
+
+def test_without_redis_every_request_dispatches():
+    with mock.patch.object(reconcile_queue, "get_redis", return_value=None):
+        assert reconcile_queue.request_reconcile(PROJECT) is True
+        assert reconcile_queue.request_reconcile(PROJECT) is True
+        assert reconcile_queue.begin_reconcile(PROJECT) is True
+        assert reconcile_queue.begin_reconcile(PROJECT) is True
+        assert reconcile_queue.finish_reconcile(PROJECT) is None
+        assert reconcile_queue.queue_status([PROJECT]) is None
+
+
+def test_redis_errors_fall_back_to_dispatching():
+    broken = mock.Mock()
+    broken.eval.side_effect = ConnectionError("down")
+    with mock.patch.object(reconcile_queue, "get_redis", return_value=broken):
+        assert reconcile_queue.request_reconcile(PROJECT) is True
+        assert reconcile_queue.begin_reconcile(PROJECT) is True
+        assert reconcile_queue.finish_reconcile(PROJECT) is None
+
+
+def test_sooner_request_overtakes_a_routine_one(redis):
+    # the scheduler spreads routine runs across its interval
+    assert reconcile_queue.request_reconcile(PROJECT, delay=100) is True
+
+    # a create must not wait behind it
+    assert reconcile_queue.request_reconcile(PROJECT) is True
+    assert reconcile_queue.request_reconcile(PROJECT) is False
+    assert reconcile_queue.request_reconcile(PROJECT, delay=100) is False
+    queued, _ = reconcile_queue.queue_status([PROJECT])
+    assert queued[PROJECT] <= time.time()
+
+
+def test_sooner_request_while_running_moves_the_follow_up_up(redis):
+    assert reconcile_queue.begin_reconcile(PROJECT) is True
+    assert reconcile_queue.request_reconcile(PROJECT, delay=100) is False
+    assert reconcile_queue.request_reconcile(PROJECT) is False
+
+    assert reconcile_queue.finish_reconcile(PROJECT) <= time.time()
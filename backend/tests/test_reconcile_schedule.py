@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import pytest
+
+from cmp_core.core.config import settings
+from cmp_core.lib import reconcile_schedule
+from cmp_core.lib.reconcile_schedule import (
+    PRIORITY_DRIFT,
+    PRIORITY_PENDING,
+    PRIORITY_ROUTINE,
+    ProjectRun,
+    plan_cycle,
+    stretch_for,
+)
+
+NOW = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+INTERVAL = settings.reconcile_schedule_interval_seconds
+
+
+def _run(
+    project_id, started_ago=None, finished=True, drift_ago=None, has_pending=False
+):
+    started = None if started_ago is None else NOW - timedelta(seconds=started_ago)
+    return ProjectRun(
+        project_id=project_id,
+        started_at=started,
+        finished_at=started + timedelta(seconds=5) if started and finished else None,
+        seconds=5.0 if started and finished else None,
+        drift_at=None if drift_ago is None else NOW - timedelta(seconds=drift_ago),
+        has_pending=has_pending,
+    )
+
+
+def _idle():
+    return {}, set()
+
+
+def test_pending_then_drift_then_routine_least_recent_first():
+    runs = [
+        _run("routine-new", started_ago=INTERVAL),
+        _run("drift", started_ago=INTERVAL, drift_ago=60),
+        _run("routine-never"),
+        _run("pending", started_ago=10, has_pending=True),
+        _run("routine-old", started_ago=10 * INTERVAL),
+    ]
+
+    plan = plan_cycle(runs, _idle(), NOW)
+
+    assert [(pid, priority) for pid, _, priority in plan.dispatch] == [
+        ("pending", PRIORITY_PENDING),
+        ("drift", PRIORITY_DRIFT),
+        ("routine-never", PRIORITY_ROUTINE),
+        ("routine-old", PRIORITY_ROUTINE),
+        ("routine-new", PRIORITY_ROUTINE),
+    ]
+    urgent = [countdown for _, countdown, p in plan.dispatch if p != PRIORITY_ROUTINE]
+    assert urgent == [0.0, 0.0]
+    assert plan.stretch == 1.0
+
+
+def test_old_drift_is_routine():
+    drift_window = settings.reconcile_drift_check_interval_minutes * 60
+    plan = plan_cycle(
+        [_run("p", started_ago=INTERVAL, drift_ago=drift_window + 1)], _idle(), NOW
+    )
+    assert plan.dispatch[0][2] == PRIORITY_ROUTINE
+
+
+def test_queued_and_running_projects_are_skipped():
+    runs = [
+        _run("queued", has_pending=True),
+        _run("running", has_pending=True),
+        _run("idle", has_pending=True),
+    ]
+    status = ({"queued": NOW.timestamp()}, {"running"})
+
+    plan = plan_cycle(runs, status, NOW)
+
+    assert [pid for pid, _, _ in plan.dispatch] == ["idle"]
+    assert (plan.queued, plan.running) == (1, 1)
+
+
+def test_without_redis_running_comes_from_the_project_rows():
+    ttl = settings.reconcile_running_ttl_seconds
+    runs = [
+        _run("running", started_ago=30, finished=False, has_pending=True),
+        _run("stale", started_ago=ttl + 1, finished=False, has_pending=True),
+        _run("done", started_ago=30, has_pending=True),
+    ]
+
+    plan = plan_cycle(runs, None, NOW)
+
+    assert [pid for pid, _, _ in plan.dispatch] == ["stale", "done"]
+    assert plan.running == 1
+
+
+def test_queue_lag_stretches_the_routine_interval_up_to_the_cap():
+    lag = 2 * INTERVAL
+    status = ({"behind": NOW.timestamp() - lag}, set())
+    runs = [
+        _run("recent", started_ago=lag - 1),
+        _run("due", started_ago=lag),
+        _run("pending", started_ago=1, has_pending=True),
+    ]
+
+    plan = plan_cycle(runs, status, NOW)
+
+    assert plan.lag_seconds == pytest.approx(lag)
+    assert plan.stretch == pytest.approx(3.0)
+    # pending work is never held back by the stretch
+    assert [pid for pid, _, _ in plan.dispatch] == ["pending", "due"]
+
+    max_stretch = settings.reconcile_schedule_max_stretch
+    assert stretch_for(100 * INTERVAL) == max_stretch
+    capped = plan_cycle(
+        [_run("p", started_ago=(max_stretch - 1) * INTERVAL)],
+        ({"behind": NOW.timestamp() - 100 * INTERVAL}, set()),
+        NOW,
+    )
+    assert capped.stretch == max_stretch
+    assert [pid for pid, _, _ in capped.dispatch] == ["p"]
+
+
+@pytest.mark.parametrize("jitter", [0.0, 0.5, 0.999])
+def test_routine_countdowns_get_one_jittered_slot_each(jitter):
+    runs = [_run(f"p{i}", started_ago=(10 - i) * INTERVAL) for i in range(4)]
+    slot = INTERVAL / len(runs)
+
+    with mock.patch.object(reconcile_schedule.random, "random", return_value=jitter):
+        plan = plan_cycle(runs, _idle(), NOW)
+
+    countdowns = [countdown for _, countdown, _ in plan.dispatch]
+    assert countdowns == pytest.approx([slot * (i + jitter) for i in range(4)])
+    for i, countdown in enumerate(countdowns):
+        assert slot * i <= countdown < slot * (i + 1)
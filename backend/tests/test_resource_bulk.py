@@ -0,0 +1,208 @@
+from unittest import mock
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.sql.dml import Update
+
+import cmp_core.models as models
+from cmp_core.models.base import Base
+from cmp_core.models.resource import Resource, ResourceState, ResourceType
+from cmp_core.schemas.resource import BulkActionRequest
+from cmp_core.services import resource_bulk
+
+VMS = [
+    # name, provider, resource type, state, env label
+    ("web-0", "aws", ResourceType.vm, ResourceState.RUNNING, "dev"),
+    ("web-1", "aws", ResourceType.vm, ResourceState.STOPPED, "dev"),
+    ("web-2", "azure", ResourceType.vm, ResourceState.ERROR_STOPPING, "dev"),
+    ("web-3", "azure", ResourceType.vm, ResourceState.RUNNING, "prod"),
+    ("web-4", "gcp", ResourceType.vm, ResourceState.RUNNING, "dev"),
+    ("web-5", "aws", ResourceType.vm, ResourceState.PENDING_DEPROVISION, "prod"),
+    ("data", "aws", ResourceType.bucket, ResourceState.RUNNING, "dev"),
+]
+
+
+@pytest_asyncio.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as session:
+        user = models.User(email="ops@example.com", password_hash="x")
+        session.add(user)
+        await session.flush()
+        project = models.Project(name="p", owner_id=user.id)
+        session.add(project)
+        await session.flush()
+        for name, provider, resource_type, state, env in VMS:
+            session.add(
+                Resource(
+                    project_id=project.id,
+                    provider=provider,
+                    resource_type=resource_type,
+                    name=name,
+                    region="eu",
+                    state=state,
+                    meta={"labels": {"env": env}},
+                    created_by=user.id,
+                )
+            )
+        await session.commit()
+        with mock.patch.object(resource_bulk.outbox, "enqueue") as enqueue:
+            yield session, project.id, enqueue
+    await engine.dispose()
+
+
+def _results(out):
+    return {item.name: (item.result, item.state) for item in out.items}
+
+
+async def _rows(session):
+    return (await session.execute(Resource.__table__.select())).all()
+
+
+@pytest.mark.asyncio
+async def test_per_item_results_by_name(db):
+    session, project_id, enqueue = db
+    request = BulkActionRequest(
+        action="stop", names=["web-0", "nope", "web-1", "web-4", "data", "web-0"]
+    )
+
+    out = await resource_bulk.bulk_resource_action(session, project_id, request, "u")
+
+    assert out.accepted == 1
+    assert [item.name for item in out.items] == [
+        "web-0",
+        "nope",
+        "web-1",
+        "web-4",
+        "data",
+    ]
+    assert _results(out) == {
+        "web-0": ("accepted", ResourceState.PENDING_STOP),
+        "nope": ("not_found", None),
+        "web-1": ("conflict", ResourceState.STOPPED),
+        "web-4": ("unsupported", ResourceState.RUNNING),
+        "data": ("unsupported", ResourceState.RUNNING),
+    }
+    (resource_id,) = [str(r.id) for r in await _rows(session) if r.name == "web-0"]
+    enqueue.assert_called_once_with(
+        session, resource_bulk.bulk_power_op_task, [resource_id], "u", "stop"
+    )
+
+
+@pytest.mark.asyncio
+async def test_selector_matches_vms_by_label(db):
+    session, project_id, enqueue = db
+    request = BulkActionRequest(action="stop", selector={"labels": {"env": "dev"}})
+
+    out = await resource_bulk.bulk_resource_action(session, project_id, request, "u")
+
+    # the bucket is not a VM, web-3 is prod
+    assert _results(out) == {
+        "web-0": ("accepted", ResourceState.PENDING_STOP),
+        "web-1": ("conflict", ResourceState.STOPPED),
+        "web-2": ("accepted", ResourceState.PENDING_STOP),
+        "web-4": ("unsupported", ResourceState.RUNNING),
+    }
+    assert len(enqueue.call_args.args[2]) == 2
+
+
+@pytest.mark.asyncio
+async def test_rows_changed_meanwhile_are_conflicts(db):
+    session, project_id, enqueue = db
+    execute = session.execute
+
+    async def race(stmt, *args, **kwargs):
+        if isinstance(stmt, Update):
+            # another request stops web-0 between the SELECT and the UPDATE
+            await execute(
+                update(Resource)
+                .where(Resource.name == "web-0")
+                .values(state=ResourceState.STOPPED)
+            )
+        return await execute(stmt, *args, **kwargs)
+
+    request = BulkActionRequest(action="stop", names=["web-0", "web-3"])
+    with mock.patch.object(session, "execute", side_effect=race):
+        out = await resource_bulk.bulk_resource_action(
+            session, project_id, request, "u"
+        )
+
+    assert out.accepted == 1
+    web0, web3 = out.items
+    assert (web0.result, web0.state) == ("conflict", None)
+    assert web0.detail == "State changed while the request was processed"
+    assert (web3.result, web3.state) == ("accepted", ResourceState.PENDING_STOP)
+    states = {r.name: r.state for r in await _rows(session)}
+    assert states["web-0"] == ResourceState.STOPPED
+    assert len(enqueue.call_args.args[2]) == 1
+
+
+@pytest.mark.asyncio
+async def test_delete_and_resize_reconcile_once(db):
+    session, project_id, enqueue = db
+    request = BulkActionRequest(
+        action="delete", names=["web-0", "web-4", "web-5", "data"]
+    )
+
+    out = await resource_bulk.bulk_resource_action(session, project_id, request, "u")
+
+    # any VM can be deleted, whatever its provider, but only once
+    assert _results(out) == {
+        "web-0": ("accepted", ResourceState.PENDING_DEPROVISION),
+        "web-4": ("accepted", ResourceState.PENDING_DEPROVISION),
+        "web-5": ("conflict", ResourceState.PENDING_DEPROVISION),
+        "data": ("unsupported", ResourceState.RUNNING),
+    }
+    enqueue.assert_called_once_with(
+        session, resource_bulk.reconcile_project, str(project_id)
+    )
+
+
+@pytest.mark.asyncio
+async def test_nothing_accepted_dispatches_nothing(db):
+    session, project_id, enqueue = db
+    request = BulkActionRequest(action="start", names=["web-0", "web-3"])
+
+    out = await resource_bulk.bulk_resource_action(session, project_id, request, "u")
+
+    assert out.accepted == 0
+    enqueue.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_selector_is_capped_like_names(db):
+    session, project_id, enqueue = db
+    request = BulkActionRequest(action="stop", selector={"provider": "aws"})
+
+    with mock.patch.object(resource_bulk, "MAX_BULK_ITEMS", 2):
+        with pytest.raises(HTTPException) as raised:
+            await resource_bulk.bulk_resource_action(session, project_id, request, "u")
+        assert raised.value.status_code == 422
+
+        # web-0, web-1: within the cap
+        request.selector.labels = {"env": "dev"}
+        out = await resource_bulk.bulk_resource_action(
+            session, project_id, request, "u"
+        )
+    assert [item.name for item in out.items] == ["web-0", "web-1"]
+
+
+def test_resize_merges_the_provider_size_key_into_meta():
+    stmt = update(Resource).values(meta=resource_bulk._resized_meta("large"))
+    sql = str(
+        stmt.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+    # merged into the stored meta in the UPDATE itself, keeping the other keys
+    assert "CAST(resources.meta AS JSONB) || jsonb_build_object(" in sql
+    assert "WHEN (resources.provider = 'aws') THEN 'instance_type'" in sql
+    assert "WHEN (resources.provider = 'azure') THEN 'vm_size'" in sql
+    assert "ELSE 'size' END, 'large')" in sql
@@ -0,0 +1,125 @@
+import asyncio
+import json
+from unittest import mock
+
+import pytest
+
+from cmp_core.core.config import settings
+from cmp_core.lib import resource_feed
+from cmp_core.lib.resource_feed import RESYNC, ResourceStateFeed
+
+
+def _change(name="vm1", state="running", version=2, project_id="p1"):
+    return {
+        "id": f"id-{name}",
+        "project_id": project_id,
+        "name": name,
+        "provider": "aws",
+        "state": state,
+        "version": version,
+    }
+
+
+def _notify(feed, **change):
+    feed._notify(None, 1, resource_feed.CHANNEL, json.dumps(_change(**change)))
+
+
+def _drain(sub):
+    items = []
+    while not sub.queue.empty():
+        items.append(sub.queue.get_nowait())
+    return items
+
+
+@pytest.fixture
+def feed():
+    feed = ResourceStateFeed()
+    with mock.patch.object(feed, "_ensure_listening"):
+        yield feed
+
+
+def test_changes_go_to_subscribers_of_the_project(feed):
+    mine = feed.subscribe({"p1"})
+    other = feed.subscribe({"p2"})
+
+    _notify(feed, name="vm1")
+    _notify(feed, name="vm2", project_id="p2")
+    feed.unsubscribe(other)
+    _notify(feed, name="vm3", project_id="p2")
+
+    assert [(c["type"], c["name"]) for c in _drain(mine)] == [("state", "vm1")]
+    assert [c["name"] for c in _drain(other)] == ["vm2"]
+
+
+def test_a_subscriber_that_falls_behind_gets_one_resync(feed):
+    with mock.patch.object(settings, "resource_feed_queue_size", 2):
+        sub = feed.subscribe({"p1"})
+    for version in range(5):
+        _notify(feed, version=version)
+
+    # the backlog is replaced, and more changes do not queue behind the resync
+    assert _drain(sub) == [RESYNC]
+
+    _notify(feed, version=9)
+    assert [c["version"] for c in _drain(sub)] == [9]
+
+
+@pytest.mark.asyncio
+async def test_watch_wakes_on_the_first_accepted_change(feed):
+    w = feed.watch("p1", "vm1", until=lambda c: c["state"] == "stopped")
+
+    _notify(feed, state="stopping")
+    _notify(feed, name="vm2", state="stopped")
+    assert not w.event.is_set()
+
+    _notify(feed, state="stopped")
+    await asyncio.wait_for(w.event.wait(), 1)
+
+    feed.unwatch(w)
+    assert feed._watches == {}
+
+
+class _Connection:
+    def __init__(self, alive):
+        self.alive = alive
+        self.listeners = []
+        self.closed = False
+
+    async def add_listener(self, channel, callback):
+        self.listeners.append(channel)
+
+    async def fetchval(self, query):
+        if not self.alive:
+            raise ConnectionError("server closed the connection")
+        await asyncio.Event().wait()
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_reconnect_resyncs_subscribers_and_wakes_watches():
+    feed = ResourceStateFeed()
+    connections = [_Connection(alive=False), _Connection(alive=True)]
+    sleep = asyncio.sleep
+
+    async def no_wait(seconds):
+        await sleep(0)
+
+    with (
+        mock.patch.object(resource_feed.asyncpg, "connect", side_effect=connections),
+        mock.patch.object(resource_feed.asyncio, "sleep", no_wait),
+    ):
+        sub = feed.subscribe({"p1"})
+        w = feed.watch("p1", "vm1", until=lambda c: False)
+        await asyncio.wait_for(w.event.wait(), 1)
+        feed._task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await feed._task
+
+    assert [c.listeners for c in connections] == [[resource_feed.CHANNEL]] * 2
+    assert all(c.closed for c in connections)
+    assert _drain(sub) == [RESYNC]
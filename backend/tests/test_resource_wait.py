@@ -0,0 +1,169 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from cmp_core.core.config import settings
+from cmp_core.lib.resource_feed import CHANNEL, ResourceStateFeed
+from cmp_core.models.resource import ResourceState
+from cmp_core.services import resource_wait
+
+
+class _Resource:
+    """The row behind `fetch`, and the notifications its changes send."""
+
+    def __init__(self, feed):
+        self.feed = feed
+        self.status = ResourceState.PENDING_STOP
+        self.state_version = 1
+        self.reads = 0
+
+    async def fetch(self):
+        self.reads += 1
+        return SimpleNamespace(status=self.status, state_version=self.state_version)
+
+    def change(self, state):
+        self.status = state
+        self.state_version += 1
+        payload = {
+            "id": "r1",
+            "project_id": "p1",
+            "name": "vm1",
+            "provider": "aws",
+            "state": state.value,
+            "version": self.state_version,
+        }
+        self.feed._notify(None, 1, CHANNEL, json.dumps(payload))
+
+
+@pytest.fixture
+def resource():
+    feed = ResourceStateFeed()
+    with (
+        mock.patch.object(feed, "_ensure_listening"),
+        mock.patch.object(resource_wait, "feed", feed),
+        mock.patch.object(settings, "resource_wait_max_seconds", 5),
+    ):
+        yield _Resource(feed)
+    assert feed._watches == {}
+
+
+def _wait(resource, db, **kwargs):
+    return asyncio.create_task(
+        resource_wait.wait_for_resource(db, "p1", "vm1", resource.fetch, **kwargs)
+    )
+
+
+async def _parked():
+    # let the waiter read the row and park on the feed
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_without_a_condition_or_timeout_it_is_a_plain_read(resource):
+    db = mock.Mock(rollback=mock.AsyncMock())
+
+    await resource_wait.wait_for_resource(db, "p1", "vm1", resource.fetch, timeout=5)
+    await resource_wait.wait_for_resource(
+        db, "p1", "vm1", resource.fetch, wait_for=ResourceState.STOPPED
+    )
+
+    assert resource.reads == 2
+    db.rollback.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_wait_for_returns_on_the_requested_state(resource):
+    db = mock.Mock(rollback=mock.AsyncMock())
+    waiter = _wait(resource, db, wait_for=ResourceState.STOPPED, timeout=5)
+    await _parked()
+    # the parked request gave its connection back
+    db.rollback.assert_awaited_once()
+
+    resource.change(ResourceState.STOPPING)
+    await _parked()
+    assert not waiter.done()
+
+    resource.change(ResourceState.STOPPED)
+    out = await asyncio.wait_for(waiter, 1)
+
+    assert out.status == ResourceState.STOPPED
+    assert resource.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_error_state_ends_the_wait(resource):
+    waiter = _wait(
+        resource,
+        mock.Mock(rollback=mock.AsyncMock()),
+        wait_for=ResourceState.STOPPED,
+        timeout=5,
+    )
+    await _parked()
+
+    resource.change(ResourceState.ERROR_STOPPING)
+
+    assert (await asyncio.wait_for(waiter, 1)).status == ResourceState.ERROR_STOPPING
+
+
+@pytest.mark.asyncio
+async def test_since_version_returns_on_any_later_change(resource):
+    waiter = _wait(
+        resource, mock.Mock(rollback=mock.AsyncMock()), since_version=1, timeout=5
+    )
+    await _parked()
+
+    resource.change(ResourceState.STOPPING)
+
+    assert (await asyncio.wait_for(waiter, 1)).state_version == 2
+
+
+@pytest.mark.asyncio
+async def test_already_satisfied_returns_without_parking(resource):
+    db = mock.Mock(rollback=mock.AsyncMock())
+    resource.state_version = 3
+
+    out = await resource_wait.wait_for_resource(
+        db, "p1", "vm1", resource.fetch, since_version=2, timeout=5
+    )
+
+    assert out.state_version == 3
+    db.rollback.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_timeout_returns_the_state_at_that_time(resource):
+    with mock.patch.object(settings, "resource_wait_max_seconds", 0.05):
+        out = await resource_wait.wait_for_resource(
+            mock.Mock(rollback=mock.AsyncMock()),
+            "p1",
+            "vm1",
+            resource.fetch,
+            wait_for=ResourceState.STOPPED,
+            # capped at RESOURCE_WAIT_MAX_SECONDS
+            timeout=60,
+        )
+
+    assert out.status == ResourceState.PENDING_STOP
+    assert resource.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_missed_notifications_are_caught_by_the_recheck(resource):
+    with mock.patch.object(resource_wait, "WAIT_RECHECK_SECONDS", 0.01):
+        waiter = _wait(
+            resource,
+            mock.Mock(rollback=mock.AsyncMock()),
+            wait_for=ResourceState.STOPPED,
+            timeout=5,
+        )
+        await _parked()
+        # committed without a notification reaching this process
+        resource.status = ResourceState.STOPPED
+
+        out = await asyncio.wait_for(waiter, 1)
+
+    assert out.status == ResourceState.STOPPED